@@ -48,9 +48,9 @@ async def _destroy_instance(entity: Entity, parent_alias: str, entity_id_to_dele
         await emit_msg(entity, 'Entity does not exists, use cleanup (bug)')
         return
     entity_to_delete = Entity(entity_id_to_delete)
-    await load_components(entity_to_delete, (SystemComponent, 'instance_of', 'character'))
+    await load_components(entity_to_delete, (SystemComponent, 'instance_of'))
     system_component = entity_to_delete.get_component(SystemComponent)
-    if system_component.character:
+    if system_component.instance_of == 'character':
         await emit_msg(entity, 'Cannot destroy characters with this command')
         return
     if force != '--force':
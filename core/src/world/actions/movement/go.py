@@ -1,16 +1,54 @@
+import typing
+
 from core.src.world.actions.movement.move import speed_component_to_movement_waiting_time
 from core.src.world.actions.movement.movement_messages import MovementMessages
-from core.src.world.actions.movement.schedules import ScheduledMovement
+from core.src.world.actions.movement.schedules import ScheduledMovement, ScheduledPath
+from core.src.world.components.position import PositionComponent
 from core.src.world.utils.messaging import emit_msg, emit_room_msg
 from core.src.world.actions_scheduler.tools import singleton_action, looped_cancellable_scheduled_action_factory
 from core.src.world.domain.entity import Entity
+from core.src.world.utils.entity_utils import load_components
 from core.src.world.utils.world_utils import get_direction, get_room_at_direction
 
 messages = MovementMessages()
 
 
+def parse_destination(value: str) -> typing.Optional[typing.Tuple[int, int]]:
+    try:
+        x, y = (int(v) for v in value.split(','))
+    except ValueError:
+        return None
+    return x, y
+
+
+async def go_to_destination(entity: Entity, x: int, y: int):
+    """
+    Plans the path once, the steps are walked by the scheduler.
+    """
+    from core.src.world.builder import pathfinding_manager
+    await load_components(entity, PositionComponent)
+    position = entity.get_component(PositionComponent)
+    version = pathfinding_manager.get_map_version()
+    path = await pathfinding_manager.find_path(
+        position, PositionComponent().set_list_coordinates([x, y, position.z])
+    )
+    if not path:
+        await emit_msg(entity, path is None and messages.path_not_found() or messages.destination_reached())
+        return
+    await emit_msg(entity, messages.destination_begins(x, y))
+    action = looped_cancellable_scheduled_action_factory(
+        entity,
+        ScheduledPath(entity, path[-1], path, version),
+        wait_for=speed_component_to_movement_waiting_time(1)
+    )
+    await go_entity.schedule(action)
+
+
 @singleton_action
 async def go_entity(entity: Entity, direction: str):
+    destination = parse_destination(direction)
+    if destination:
+        return await go_to_destination(entity, *destination)
     direction = get_direction(direction)
     if not direction:
         await emit_msg(entity, messages.not_recognized_direction())
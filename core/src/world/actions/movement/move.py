@@ -61,6 +61,8 @@ async def do_move_entity(entity, room, direction, reason, emit_message=True, sel
         )
         await getmap(entity)
         await look(entity)
+        return True
+    return False
 
 
 def speed_component_to_movement_waiting_time(entity):
@@ -26,6 +26,15 @@ class MovementMessages:
     def not_recognized_direction(self):
         return 'Non è una direzione valida'
 
+    def path_not_found(self):
+        return 'Non trovi un modo per arrivarci'
+
+    def destination_begins(self, x: int, y: int):
+        return 'inizi a muoverti verso {},{}'.format(x, y)
+
+    def destination_reached(self):
+        return 'sei arrivato a destinazione'
+
     def movement_begins(self, direction):
         return 'inizi a muoverti verso {}'.format(self._direction[direction])
 
@@ -6,7 +6,8 @@ from core.src.world.domain.entity import Entity
 from core.src.world.domain.room import Room
 from core.src.world.utils.messaging import emit_msg
 from core.src.world.utils.world_types import DirectionEnum
-from core.src.world.utils.world_utils import direction_to_coords_delta, apply_delta_to_position, get_room_at_direction
+from core.src.world.utils.world_utils import direction_to_coords_delta, apply_delta_to_position, \
+    get_room_at_direction, coords_delta_to_direction
 
 messages = MovementMessages()
 
@@ -34,6 +35,8 @@ class ScheduledMovement:
         for escape in escapes:
             delta = direction_to_coords_delta(escape)
             target_position = apply_delta_to_position(self.entity.get_room().position, delta)
+            if not await map_repository.is_walkable(target_position):
+                continue
             _room = await map_repository.get_room(target_position, populate=False)
             if _room and await _room.walkable_by(self.entity):
                 rooms.append([escape, _room])
@@ -67,3 +70,62 @@ class ScheduledMovement:
 
     async def impossible(self):
         pass
+
+
+class ScheduledPath:
+    """
+    Walks a path planned by the pathfinding manager, a room per step, without reading the terrains:
+    the path is planned again from the current position if the map changed meanwhile.
+    """
+    def __init__(self, entity: Entity, target: PositionComponent, path: typing.List[PositionComponent], version: int):
+        self.entity = entity
+        self.target = target
+        self.path = path
+        self.version = version
+        self._sem = True
+
+    async def do(self) -> bool:
+        from core.src.world.actions.movement.move import do_move_entity
+        from core.src.world.builder import pathfinding_manager
+        position = self.entity.get_component(PositionComponent)
+        if self.version != pathfinding_manager.get_map_version():
+            self.version = pathfinding_manager.get_map_version()
+            self.path = await pathfinding_manager.find_path(position, self.target)
+            if self.path is None:
+                await emit_msg(self.entity, messages.path_not_found())
+                return False
+        if not self.path:
+            return False
+        step = self.path[0]
+        direction = coords_delta_to_direction((step.x - position.x, step.y - position.y, step.z - position.z))
+        if not direction:
+            await emit_msg(self.entity, messages.invalid_direction())
+            return False
+        not self.entity.get_room() and self.entity.set_room(Room(position))
+        if not await do_move_entity(self.entity, Room(step), direction, "movement", self_emit_message=self._sem):
+            return await self._plan_again(position, step)
+        self.path.pop(0)
+        self._sem = False
+        if not self.path:
+            await emit_msg(self.entity, messages.destination_reached())
+        return bool(self.path)
+
+    async def _plan_again(self, position: PositionComponent, step: PositionComponent) -> bool:
+        """
+        The step was not walked: the path is planned again from the current position, and the walk stops
+        if there is none, or if it goes through the same step.
+        """
+        from core.src.world.builder import pathfinding_manager
+        self.version = pathfinding_manager.get_map_version()
+        self.path = await pathfinding_manager.find_path(position, self.target)
+        if not self.path or self.path[0].list_coordinates == step.list_coordinates:
+            self.path = None
+            await emit_msg(self.entity, messages.path_not_found())
+            return False
+        return True
+
+    async def stop(self):
+        pass
+
+    async def impossible(self):
+        pass
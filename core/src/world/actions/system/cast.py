@@ -17,7 +17,7 @@ async def cast_entity(
         reason=None
 ):
     assert isinstance(position, PositionComponent)
-    from core.src.world.builder import events_subscriber_service, events_publisher_service
+    from core.src.world.builder import events_subscriber_service, events_publisher_service, connected_positions
     loop = asyncio.get_event_loop()
     if update:
         current_position = await get_components_for_entity(entity, (PositionComponent, 'coord'))
@@ -28,14 +28,17 @@ async def cast_entity(
             LOGGER.core.error(
                 'Impossible to cast entity {}'.format(entity.entity_id))
             return
-    area = Area(position).make_coordinates()
-    listeners = await get_eligible_listeners_for_area(area)
-    entity.entity_id in listeners and listeners.remove(entity.entity_id)
+    listeners = []
+    if events_publisher_service.needs_targets:
+        area = Area(position).make_coordinates()
+        listeners = await get_eligible_listeners_for_area(area)
+        entity.entity_id in listeners and listeners.remove(entity.entity_id)
     if on_connect:
+        connected_positions.track(entity.entity_id, position)
         await events_publisher_service.on_entity_appear_position(entity, position, reason, targets=listeners)
         loop.create_task(events_subscriber_service.subscribe_events(entity))
     else:
-        pass
+        connected_positions.update(entity.entity_id, position)
         await events_publisher_service.on_entity_change_position(entity, position, reason, targets=listeners)
     entity.set_component(position)
     return True
@@ -11,9 +11,11 @@ async def disconnect_entity(entity: Entity, msg=True):
     from core.src.world.builder import map_repository
     from core.src.world.builder import websocket_channels_service
     from core.src.world.builder import cmds_observer
+    from core.src.world.builder import connected_positions, connected_map_encodings
     events_publisher = get_events_publisher()
     await load_components(entity, PositionComponent)
-    listeners = await get_eligible_listeners_for_area(entity.get_component(PositionComponent))
+    listeners = events_publisher.needs_targets and \
+        await get_eligible_listeners_for_area(entity.get_component(PositionComponent)) or []
     await events_publisher.on_entity_disappear_position(
         entity, entity.get_component(PositionComponent), "disconnect", listeners
     )
@@ -22,5 +24,7 @@ async def disconnect_entity(entity: Entity, msg=True):
     entity.set_for_update(SystemComponent().connection.set(""))
     if await update_entities(entity):
         await map_repository.remove_entity_from_map(entity.entity_id, entity.get_component(PositionComponent))
+        connected_positions.untrack(entity.entity_id)
+        connected_map_encodings.untrack(entity.entity_id)
         await websocket_channels_service.close_namespace_for_entity_id(entity.entity_id)
         cmds_observer.close_channel(current_channel_id)
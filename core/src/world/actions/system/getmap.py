@@ -1,13 +1,46 @@
+from core.src.world.components.system import SystemComponent
 from core.src.world.domain.area import Area
 from core.src.world.domain.entity import Entity
+from core.src.world.utils.entity_utils import update_entities
 from core.src.world.utils.messaging import emit_sys_msg
+from core.src.world.utils.world_types import MapEncodingEnum
 from core.src.world.utils.world_utils import get_current_room
 
 
-async def getmap(entity: Entity):
+async def get_map_encoding(entity: Entity) -> MapEncodingEnum:
+    """
+    The encoding kept by the worker for the connected entity, read from its SystemComponent the first time.
+    """
+    from core.src.world.builder import world_repository, connected_map_encodings
+    map_encoding = connected_map_encodings.get(entity.entity_id)
+    if map_encoding:
+        return map_encoding
+    components = await world_repository.read_struct_components_for_entity(
+        entity.entity_id, (SystemComponent, 'map_encoding')
+    )
+    encoding = components[SystemComponent.enum].map_encoding.value
+    map_encoding = encoding and MapEncodingEnum(encoding) or MapEncodingEnum.JSON
+    connected_map_encodings.track(entity.entity_id, map_encoding)
+    return map_encoding
+
+
+async def getmap(entity: Entity, encoding: str = None):
+    """
+    getmap [json|base64|binary|rle]: the encoding of the map base is saved for the next maps.
+    """
+    from core.src.world.builder import connected_map_encodings
+    if encoding:
+        try:
+            map_encoding = MapEncodingEnum(encoding)
+        except ValueError:
+            raise TypeError('Unknown map encoding: {}'.format(encoding))
+        await update_entities(Entity(entity.entity_id).set_for_update(SystemComponent().map_encoding.set(encoding)))
+        connected_map_encodings.track(entity.entity_id, map_encoding)
+    else:
+        map_encoding = await get_map_encoding(entity)
     room = await get_current_room(entity, populate=False)
     area = Area(room.position)
-    area_map = await area.get_map_for_entity(entity)
+    area_map = await area.get_map_for_entity(entity, encoding=map_encoding)
     await emit_sys_msg(
         entity,
         "map",
@@ -15,6 +48,7 @@ async def getmap(entity: Entity):
             "event": "map",
             "base": area_map["base"],
             "data": area_map["data"],
-            "shape": [area.size, area.size]  # placeholder for rows, cols
+            "shape": [area.size, area.size],  # placeholder for rows, cols
+            "encoding": map_encoding.value
         }
     )
@@ -4,15 +4,20 @@ import socketio
 
 from core.src.world.actions_scheduler.singleton_actions_scheduler import SingletonActionsScheduler
 from core.src.world.repositories.library_repository import RedisLibraryRepository
+from core.src.world.services.codecs import get_codec
+from core.src.world.services.connected_positions import ConnectedPositionsTable, ConnectedMapEncodingsTable
 from core.src.world.services.redis_pubsub_interface import PubSubManager
-from core.src.world.services.redis_pubsub_publisher_service import RedisPubSubEventsPublisherService
+from core.src.world.services.redis_pubsub_publisher_service import RedisPubSubEventsPublisherService, \
+    get_position_event_key, coalesce_position_events
 from core.src.world.services.redis_pubsub_subscriber_service import RedisPubSubEventsSubscriberService
+from core.src.world.services.subscription_queue import OverflowPolicy
 from core.src.world.services.worker_queue_service import WorkerQueueService
 from core.src.world.systems.commands import commands_observer_factory
 from core.src.world.systems.connect.manager import ConnectionsManager
 from core.src.world.systems.connect.observer import ConnectionsObserver
 from core.src.world.services.redis_pubsub_events_observer import PubSubObserver
 from core.src.world.systems.follow.manager import FollowSystemManager
+from core.src.world.systems.pathfinding.manager import PathfindingManager
 from core.src.world.transport.socketio_interface import SocketioTransportInterface
 from core.src.world.transport.websocket_channels_service import WebsocketChannelsService
 from etc import settings
@@ -23,6 +28,12 @@ from core.src.world.services.redis_queue import RedisMultipleQueuesPublisher, Re
 from core.src.world.services.system_utils import get_redis_factory, RedisType
 from core.src.auth.builder import strict_redis
 from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.packed_data_repository import PackedRedisDataRepository
+from core.src.world.repositories.components_cache import ComponentsCache
+from core.src.world.repositories.entity_types_cache import EntityTypesCache
+from core.src.world.repositories.terrains_cache import TerrainsCache
+from core.src.world.repositories.world_snapshot import WorldSnapshot
+from core.src.world.components.factory import get_component_by_type
 
 if settings.RUNNING_TESTS and not settings.INTEGRATION_TESTS:
     from unittest.mock import Mock
@@ -36,27 +47,62 @@ else:
 WORLD_SYSTEM_PATH = os.getcwd()
 
 library_repository = RedisLibraryRepository(async_redis_data)
-map_repository = RedisMapRepository(async_redis_data)
-world_repository = RedisDataRepository(async_redis_data, library_repository, map_repository)
+messages_codec = get_codec(settings.MESSAGES_CODEC)
+pubsub_manager = PubSubManager(
+    async_redis_queue,
+    serializer=messages_codec.encode,
+    queue_size=settings.PUBSUB_QUEUE_SIZE,
+    overflow=OverflowPolicy(settings.PUBSUB_OVERFLOW),
+    coalesce_key=get_position_event_key,
+    coalesce=coalesce_position_events
+)
+map_repository = RedisMapRepository(
+    async_redis_data,
+    terrains_cache=settings.TERRAINS_CACHE and TerrainsCache(
+        max_chunks=settings.TERRAINS_CACHE_CHUNKS, pubsub_manager=pubsub_manager
+    ) or None,
+    morton_index=settings.MAP_MORTON_INDEX,
+    snapshot=settings.MAP_SNAPSHOT and WorldSnapshot(settings.MAP_SNAPSHOT) or None
+)
+components_cache = settings.COMPONENTS_CACHE_SIZE and ComponentsCache(
+    max_size=settings.COMPONENTS_CACHE_SIZE,
+    components=[get_component_by_type(c) for c in settings.COMPONENTS_CACHE] or None,
+    pubsub_manager=pubsub_manager
+) or None
+world_repository = {
+    'spread': RedisDataRepository,
+    'packed': PackedRedisDataRepository
+}[settings.COMPONENTS_STORAGE](
+    async_redis_data, library_repository, map_repository,
+    merge_updates_per_tick=settings.MERGE_UPDATES_PER_TICK,
+    components_cache=components_cache,
+    entity_types_cache=EntityTypesCache(pubsub_manager=pubsub_manager)
+)
 channels_repository = WebsocketChannelsRepository(strict_redis)
-redis_queues_service = RedisMultipleQueuesPublisher(async_redis_queue, num_queues=settings.WORKERS)
+redis_queues_service = RedisMultipleQueuesPublisher(
+    async_redis_queue, num_queues=settings.WORKERS, serializer=messages_codec.encode
+)
 websocket_channels_service = WebsocketChannelsService(
     channels_repository=channels_repository,
     data_repository=world_repository,
     redis_queue=redis_queues_service
 )
 
-pubsub_manager = PubSubManager(async_redis_queue)
-
-events_subscriber_service = RedisPubSubEventsSubscriberService(pubsub_manager)
-events_publisher_service = RedisPubSubEventsPublisherService(pubsub_manager)
+connected_positions = ConnectedPositionsTable()
+connected_map_encodings = ConnectedMapEncodingsTable()
+events_subscriber_service = RedisPubSubEventsSubscriberService(
+    pubsub_manager, cell_size=settings.PUBSUB_CELL_SIZE or None, positions=connected_positions
+)
+events_publisher_service = RedisPubSubEventsPublisherService(
+    pubsub_manager, cell_size=settings.PUBSUB_CELL_SIZE or None
+)
 
 mgr = socketio.AsyncRedisManager(
     'redis://{}:{}/{}'.format(settings.REDIS_HOST, settings.REDIS_PORT, settings.REDIS_SIO_DB)
 )
 transport = SocketioTransportInterface(socketio.AsyncServer(client_manager=mgr))
 
-pubsub_observer = PubSubObserver(world_repository)
+pubsub_observer = PubSubObserver(world_repository, positions=connected_positions)
 
 async_redis_queues = get_redis_factory(RedisType.QUEUES)
 queue = RedisQueueConsumer(async_redis_queues, 0)
@@ -76,6 +122,8 @@ connections_observer = ConnectionsObserver(
 singleton_actions_scheduler = SingletonActionsScheduler()
 
 follow_system_manager = FollowSystemManager(
-    connections_manager
+    connections_manager,
+    positions=connected_positions
 )
+pathfinding_manager = PathfindingManager(map_repository)
 pubsub_observer.add_observer_for_pov_event('follow', follow_system_manager)
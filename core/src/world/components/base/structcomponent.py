@@ -364,13 +364,22 @@ class StructComponent(ComponentType):
         return self
 
     def _bake_class(self):
-        class MetaEnum(enum.Enum):
-            pass
-
-        self.meta_enum = MetaEnum
-        for i, meta in enumerate(self.meta):
-            setattr(self.meta_enum, meta[0], i)
-            values = {int: b'0', list: [], str: b"", bool: b'0', dict: {}}
+        """
+        The meta enum is baked once per component class, and shared by its instances.
+        """
+        cls = type(self)
+        meta_enum = cls.__dict__.get('_baked_meta_enum')
+        if not meta_enum:
+            class MetaEnum(enum.Enum):
+                pass
+
+            for i, meta in enumerate(self.meta):
+                setattr(MetaEnum, meta[0], i)
+            cls._baked_meta_enum = meta_enum = MetaEnum
+
+        self.meta_enum = meta_enum
+        values = {int: b'0', list: [], str: b"", bool: b'0', dict: {}}
+        for meta in self.meta:
             load_value_in_struct_component(self, meta[0], values[meta[1]])
 
     def __getattr__(self, name):
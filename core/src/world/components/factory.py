@@ -17,6 +17,10 @@ def get_component_by_type(component_type_string) -> typing.Type[ComponentType]:
     }[component_type_string]
 
 
+def get_all_components() -> typing.List[typing.Type[ComponentType]]:
+    return [AttributesComponent, PositionComponent, InventoryComponent, SystemComponent]
+
+
 def get_component_alias_by_enum_value(enum_value: ComponentTypeEnum):
     return {
         ComponentTypeEnum.ATTRIBUTES: 'attributes',
@@ -12,7 +12,8 @@ class SystemComponent(StructComponent):
         ("created_at", int),
         ("receive_events", bool),
         ("instance_by", int),
-        ("instance_of", str)
+        ("instance_of", str),
+        ("map_encoding", str)
     )
     indexes = (
         ("connection", bool),
@@ -8,6 +8,8 @@ from core.src.world.domain import DomainObject
 
 from core.src.world.domain.room import Room
 from core.src.world.domain.entity import Entity
+from core.src.world.utils.serialization import serialize_map_terrains
+from core.src.world.utils.world_types import MapEncodingEnum
 
 
 class Area(DomainObject):
@@ -67,24 +69,22 @@ class Area(DomainObject):
             await self.populate_rooms()
         return self.rooms
 
-    async def get_map(self, pov: Entity=None) -> typing.Dict:
+    async def get_map(self, pov: Entity = None, encoding=MapEncodingEnum.JSON) -> typing.Dict:
+        from core.src.world.builder import map_repository
         start = time.time()
-        rooms = await self.get_rooms()
+        terrains, contents = await map_repository.get_window_terrains(self.center, self.size, self.size)
         LOGGER.websocket_monitor.debug('Rooms fetched in in %s', '{:.4f}'.format(time.time() - start))
-        res = {'base': [], 'data': []}
-        for index, r in enumerate(rooms):
-            res['base'].append(r and r.terrain.value or 0)
-            if r and r.content:
-                for entry in r.content:
-                    if pov and entry.entity_id == pov.entity_id:
-                        continue
-                    payload = {
-                        'type': 0,
-                        'pos': index,
-                        'e_id': entry.entity_id
-                    }
-                    res['data'].append(payload)
-        return res
+        return {
+            'base': serialize_map_terrains(terrains, encoding),
+            'data': [
+                {
+                    'type': 0,
+                    'pos': index,
+                    'e_id': entity_id
+                } for index, entity_ids in contents.items() for entity_id in entity_ids
+                if not pov or entity_id != pov.entity_id
+            ]
+        }
 
     def is_position_inside(self, pos: PositionComponent):
         if pos.z != self.center.z:
@@ -105,19 +105,7 @@ class Area(DomainObject):
         for y in range(self.max_y, self.min_y, -1):
             for x in range(from_x, to_x + 1):
                 self._rooms_coordinates.add((x, y, self.center.z))
-            if map_repository.min_y <= y <= map_repository.max_y:
-                data = await map_repository.get_rooms_on_y(y, from_x, to_x + 1, self.center.z)
-
-                if self.min_x <= map_repository.min_x:
-                    data = ([None] * (self.size - len(data))) + data
-
-                if self.max_x >= map_repository.max_x:
-                    data = data + ([None] * (self.size - len(data)))
-
-                self.rooms.extend(data)
-                assert len(data) == self.size, (len(data), from_x, to_x)
-            else:
-                self.rooms.extend([None] * self.size)
+        self.rooms = await map_repository.get_window(self.center, self.size, self.size)
         return self
 
     def populate_area_content_for_area(self, entity: Entity) -> None:
@@ -130,7 +118,5 @@ class Area(DomainObject):
         self.populate_area_content_for_area(entity)
         return self
 
-    async def get_map_for_entity(self, entity: Entity) -> typing.Dict:
-        await self.populate_rooms()
-        await self.populate_rooms_content(entity)
-        return await self.get_map(pov=entity)
+    async def get_map_for_entity(self, entity: Entity, encoding=MapEncodingEnum.JSON) -> typing.Dict:
+        return await self.get_map(pov=entity, encoding=encoding)
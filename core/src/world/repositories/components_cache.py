@@ -0,0 +1,198 @@
+import typing
+import uuid
+from collections import OrderedDict
+
+from core.src.auth.logging_factory import LOGGER
+from core.src.world.components.base.structcomponent import StructComponent, load_value_in_struct_component, \
+    StructSubtypeIntIncrAction, StructSubtypeIntSetAction, StructSubtypeStrSetAction, StructSubTypeBoolOn, \
+    StructSubTypeBoolOff, StructSubtypeListAction, StructSubTypeDictSetKeyValueAction, \
+    StructSubTypeDictRemoveKeyValueAction
+from core.src.world.repositories.read_plans import ComponentsReadPlan
+
+_MISSING = object()
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return list(value)
+    elif isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class ComponentsCache:
+    """
+    Worker local, size bounded, LRU cache of the struct components values,
+    keyed by (entity_id, component key, field).
+
+    Values are populated by the reads, and written through by the updates.
+    Updates the cache can't apply (i.e. an increment on a not cached value, or a field set to null,
+    which must be read again to load the default) invalidate the key.
+
+    Reads in flight while the cache is written are not cached: a version, bumped when writes start and end,
+    is taken before the read and checked before populating the cache.
+
+    Each worker publishes the keys it writes on the invalidations channel,
+    the other workers drop them from their caches.
+    """
+    invalidations_channel = 'cache:i'
+
+    def __init__(
+            self,
+            max_size=65536,
+            components: typing.Optional[typing.Iterable[typing.Type[StructComponent]]] = None,
+            pubsub_manager=None
+    ):
+        self.max_size = max_size
+        self.components = components is not None and set(c.key for c in components) or None
+        self.pubsub_manager = pubsub_manager
+        self.worker_id = uuid.uuid4().hex
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.version = 0
+
+    def is_cached_component(self, component: typing.Type[StructComponent]) -> bool:
+        return self.components is None or component.key in self.components
+
+    def is_cached_query(self, plan: ComponentsReadPlan) -> bool:
+        return all(self.is_cached_component(c) for c in plan.components)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, entity_id: int, component: typing.Type[StructComponent], field: str):
+        key = (entity_id, component.key, field)
+        value = self._values.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        self._values.move_to_end(key)
+        return _copy(value)
+
+    def set(self, entity_id: int, component: typing.Type[StructComponent], field: str, value):
+        key = (entity_id, component.key, field)
+        self._values[key] = _copy(value)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, entity_id: int, component_key: int, field: str):
+        self.version += 1
+        if self._values.pop((entity_id, component_key, field), _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    def invalidate_entity(self, entity_id: int):
+        self.version += 1
+        for key in [k for k in self._values if k[0] == entity_id]:
+            del self._values[key]
+            self.invalidations += 1
+
+    def get_components(self, plan: ComponentsReadPlan, entity_id: int) -> typing.Optional[typing.Dict]:
+        """
+        Resolve a components query for an entity, as ComponentsReadPlan.resolve_for_entity does,
+        or return None if any of the fields is not cached.
+        """
+        values = []
+        for component, subkey, *_ in plan.entities_reads:
+            value = self.get(entity_id, component, subkey)
+            if value is _MISSING:
+                return None
+            values.append(value)
+        response = {component.enum: component() for component in plan.components}
+        for (component, subkey, *_), value in zip(plan.entities_reads, values):
+            load_value_in_struct_component(response[component.enum], subkey, value)
+        return response
+
+    def get_components_for_entities(
+            self, plan: ComponentsReadPlan, entity_ids: typing.List[int]
+    ) -> typing.Optional[typing.Dict]:
+        response = {}
+        for entity_id in entity_ids:
+            components = self.get_components(plan, entity_id)
+            if components is None:
+                return None
+            response[entity_id] = components
+        return response
+
+    def set_components(self, plan: ComponentsReadPlan, entity_id: int, components: typing.Dict, version: int):
+        if version != self.version:
+            return
+        for component, subkey, *_ in plan.entities_reads:
+            self.set(entity_id, component, subkey, components[component.enum].current_values[subkey].value)
+
+    def begin_write(self):
+        self.version += 1
+
+    def _apply_action(self, entity_id: int, component: typing.Type[StructComponent], field: str, action):
+        key = (entity_id, component.key, field)
+        if isinstance(action, (StructSubtypeIntSetAction, StructSubtypeStrSetAction)):
+            self.set(entity_id, component, field, action.value)
+        elif isinstance(action, (StructSubTypeBoolOn, StructSubTypeBoolOff)):
+            self.set(entity_id, component, field, isinstance(action, StructSubTypeBoolOn))
+        elif isinstance(action, StructSubtypeListAction) and action.type == 'overwrite':
+            self.set(entity_id, component, field, list(action.values))
+        elif key not in self._values:
+            return
+        elif isinstance(action, StructSubtypeIntIncrAction) and self._values[key] is not None:
+            self._values[key] += action.value
+        elif isinstance(action, StructSubtypeListAction) and action.type == 'append':
+            value = self._values[key] or []
+            self._values[key] = value + [v for v in action.values if v not in value]
+        elif isinstance(action, StructSubtypeListAction) and action.type == 'remove':
+            self._values[key] = [v for v in self._values[key] or [] if v not in action.values]
+        elif isinstance(action, StructSubTypeDictSetKeyValueAction):
+            value = dict(self._values[key] or {})
+            value[action.key] = str(int(action.value) if isinstance(action.value, bool) else action.value)
+            self._values[key] = value
+        elif isinstance(action, StructSubTypeDictRemoveKeyValueAction):
+            value = dict(self._values[key] or {})
+            value.pop(action.key, None)
+            self._values[key] = value
+        else:
+            self.invalidate(*key)
+
+    def apply_changes(self, entity_id: int, component: typing.Type[StructComponent], changes: typing.Dict):
+        """
+        Write through the coalesced changes of an executed update.
+        """
+        if not self.is_cached_component(component):
+            return
+        self.version += 1
+        for field, actions in changes.items():
+            for action in actions:
+                self._apply_action(entity_id, component, field, action)
+
+    async def publish_invalidations(self, keys: typing.List[typing.Tuple[int, int, str]]):
+        if not self.pubsub_manager or not keys:
+            return
+        await self.pubsub_manager.publish(self.invalidations_channel, {'w': self.worker_id, 'k': keys})
+
+    async def listen_invalidations(self):
+        """
+        Drop the keys written by the other workers. Runs forever, as the pubsub subscriptions do.
+        """
+        async for message in self.pubsub_manager.subscribe(self.invalidations_channel):
+            try:
+                if message['w'] == self.worker_id:
+                    continue
+                for entity_id, component_key, field in message['k']:
+                    if field is None:
+                        self.invalidate_entity(entity_id)
+                    else:
+                        self.invalidate(entity_id, component_key, field)
+            except Exception:
+                LOGGER.core.exception('ComponentsCache, invalid message: %s', message)
+
+    def stats(self) -> typing.Dict:
+        return {
+            'size': len(self._values),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
@@ -1,19 +1,28 @@
 import asyncio
-import inspect
 import time
 import typing
+import uuid
+
 import aioredis
 from core.src.auth.logging_factory import LOGGER
-from core.src.world.components.base import ComponentTypeEnum
 from core.src.world.components.base.structcomponent import StructSubtypeListAction, StructSubtypeStrSetAction, \
     StructSubtypeIntIncrAction, StructSubtypeIntSetAction, StructSubTypeSetNull, StructSubTypeBoolOn, \
     StructSubTypeBoolOff, StructSubTypeDictSetKeyValueAction, \
-    StructSubTypeDictRemoveKeyValueAction, StructComponent, load_value_in_struct_component
+    StructSubTypeDictRemoveKeyValueAction, StructComponent
+from core.src.world.components.factory import get_all_components
+from core.src.world.components.position import PositionComponent
 from core.src.world.components.system import SystemComponent
 from core.src.world.domain.entity import Entity
+from core.src.world.repositories.components_cache import ComponentsCache
+from core.src.world.repositories.entity_types_cache import EntityTypesCache
+from core.src.world.repositories.entity_ids_allocator import EntityIdsAllocator
 from core.src.world.repositories.library_repository import RedisLibraryRepository
+from core.src.world.repositories.entities_query import EntitiesQuery
+from core.src.world.repositories.lua_scripts import BULK_LOADER_SCRIPT, ENTITIES_QUERY_SCRIPT
 from core.src.world.repositories.map_repository import RedisMapRepository
+from core.src.world.repositories.read_plans import ComponentsReadPlan, normalize_components_query
 from core.src.world.repositories.redis_lua_pipeline import RedisLUAPipeline
+from core.src.world.repositories.unit_of_work import EntitiesUnitOfWork, UpdatesStats
 from core.src.world.utils.world_types import Bit
 
 
@@ -22,47 +31,116 @@ class RedisDataRepository:
             self,
             async_redis_factory,
             library_repository: RedisLibraryRepository,
-            map_repository: RedisMapRepository
+            map_repository: RedisMapRepository,
+            merge_updates_per_tick=False,
+            components_cache: ComponentsCache = None,
+            entity_types_cache: EntityTypesCache = None
     ):
         self._async_redis_factory = async_redis_factory
         self.library_repository = library_repository
         self.map_repository = map_repository
         self.async_lock = asyncio.Lock()
         self._async_redis = None
+        self._read_plans: typing.Dict[tuple, ComponentsReadPlan] = {}
+        self.entities_bitmap_key = 'e:m'
+        self.query_results_ttl = 300
+        self.entity_ids_allocator = EntityIdsAllocator(self.async_redis)
+        self.merge_updates_per_tick = merge_updates_per_tick
+        self._pending_updates = []
+        self.updates_stats = UpdatesStats()
+        self.components_cache = components_cache
+        self.entity_types = entity_types_cache or EntityTypesCache()
 
     async def async_redis(self) -> aioredis.Redis:
         await self.async_lock.acquire()
         try:
             if not self._async_redis:
                 self._async_redis = await self._async_redis_factory()
-                await (await self._async_redis).setbit('e:m', 0, 1)  # ensure the map is 1 based
+                await (await self._async_redis).setbit(self.entities_bitmap_key, 0, 1)  # ensure the map is 1 based
         finally:
             self.async_lock.release()
         return self._async_redis
 
-    async def _allocate_entity_id(self) -> int:
-        script = """
-            local val = redis.call('bitpos', 'e:m', 0)
-            redis.call('setbit', 'e:m', val, 1)
-            return val
-            """
+    async def allocate_entity_ids(self, n=1) -> typing.List[int]:
+        return await self.entity_ids_allocator.allocate(n)
+
+    async def entity_exists(self, entity_id: int) -> bool:
         redis = await self.async_redis()
-        response = await redis.eval(script, ['e:m'])
-        LOGGER.core.debug('EntityRepository.create_entity, response: %s', response)
-        assert response
-        return int(response)
+        return bool(await redis.getbit(self.entities_bitmap_key, entity_id))
 
-    async def entity_exists(self, entity_id):
+    async def entities_exist(self, *entity_ids: int) -> typing.List[bool]:
+        """
+        Check the existence of many entities with a single BITFIELD on the entities bitmap.
+        """
+        if not entity_ids:
+            return []
         redis = await self.async_redis()
-        return bool(await redis.keys('e:{}'.format(entity_id)))
+        args = []
+        for entity_id in entity_ids:
+            args.extend((b'GET', b'u1', entity_id))
+        response = await redis.execute(b'BITFIELD', self.entities_bitmap_key, *args)
+        return [bool(x) for x in response]
 
     async def save_entity(self, entity: Entity) -> Entity:
-        assert not entity.entity_id, 'entity_id: %s, use update, not save.' % entity.entity_id
-        entity_id = await self._allocate_entity_id()
-        entity.entity_id = entity_id
-        await self.update_entities(entity)
+        await self.save_entities(entity)
         return entity
 
+    async def save_entities(self, *entities: Entity) -> typing.Tuple[Entity]:
+        for entity in entities:
+            assert not entity.entity_id, 'entity_id: %s, use update, not save.' % entity.entity_id
+        entity_ids = await self.allocate_entity_ids(len(entities))
+        for i, entity in enumerate(entities):
+            entity.entity_id = entity_ids[i]
+        await self._update_entities(entities, created=True)
+        return entities
+
+    async def delete_entity(self, entity_id: int) -> bool:
+        """
+        Removes the entity components, values and indexes, removes the entity from the map, and frees its id.
+        """
+        components = get_all_components()
+        query = [(PositionComponent, 'coord')]
+        for component in components:
+            subkeys = [meta[0] for meta in component.meta if meta[1] is dict] + \
+                      [index[0] for index in component.indexes if index[1] is str]
+            subkeys and query.append((component, *subkeys))
+        data = await self.read_struct_components_for_entity(entity_id, *query, load_defaults=False)
+        redis = await self.async_redis()
+        pipeline = RedisLUAPipeline(redis)
+        position = data[PositionComponent.enum]
+        position.coord and await self.map_repository.remove_entity_from_map(entity_id, position, pipeline=pipeline)
+        for component in components:
+            values = data.get(component.enum)
+            pipeline.setbit('c:{}:m'.format(component.key), entity_id, Bit.OFF.value)
+            self._remove_component_values(pipeline, entity_id, component, values)
+            for index in component.indexes:
+                pipeline.zrem('i:c:{}:{}'.format(component.key, index[0]), entity_id)
+                if index[1] is str and values.get_value(index[0]):
+                    pipeline.zrem('i:c:{}:{}:{}'.format(component.key, index[0], values.get_value(index[0])), entity_id)
+        self.entity_ids_allocator.free(pipeline, entity_id)
+        self.components_cache and self.components_cache.begin_write()
+        response = await pipeline.execute()
+        self.entity_types.forget(entity_id)
+        asyncio.ensure_future(self.entity_types.publish_deletion(entity_id))
+        if self.components_cache:
+            self.components_cache.invalidate_entity(entity_id)
+            asyncio.ensure_future(self.components_cache.publish_invalidations([(entity_id, None, None)]))
+        LOGGER.core.debug('EntityRepository.delete_entity, response: %s', response)
+        return bool(response)
+
+    @staticmethod
+    def _remove_component_values(pipeline: RedisLUAPipeline, entity_id: int, component, values: StructComponent):
+        pipeline.remove('e:{}:c:{}'.format(entity_id, component.key))
+        for subkey, subtype in component.meta:
+            if subtype is list:
+                pipeline.remove('c:{}:zs:e:{}:{}'.format(component.key, entity_id, subkey))
+            elif subtype is dict:
+                for dict_key in values.get_value(subkey) or {}:
+                    pipeline.hdel('c:{}:d:{}:{}'.format(component.key, subkey, dict_key), entity_id)
+                pipeline.remove('e:{}:c:{}:{}'.format(entity_id, component.key, subkey))
+            else:
+                pipeline.hdel('c:{}:d:{}'.format(component.key, subkey), entity_id)
+
     @staticmethod
     def _check_bounds_for_update(pipeline: RedisLUAPipeline, entity: Entity):
         for bound in entity.bounds():
@@ -72,22 +150,17 @@ class RedisDataRepository:
                 for b in bb:
                     if isinstance(b, StructSubtypeListAction):
                         assert b.type == 'remove'
-                        key = 'c:{}:zs:e:{}:{}'.format(bound.enum, entity.entity_id, k)
-                        values = b.values
-                        if len(values) == 1:
-                            pipeline.allocate_value().zscan(key, cursor=0, match=values[0])
-                            v, check = "[2][1]", str(values[0])
-                        else:
-                            inter_seed = pipeline.zprepareinter(key, values)
-                            pipeline.allocate_value().zfetchinter(inter_seed)
-                            v, check = "", values
-                        pipeline.add_if_equal(check, value_selector=v)
+                        key = 'c:{}:zs:e:{}:{}'.format(bound.key, entity.entity_id, k)
+                        pipeline.zcontains(key, *b.values)
                     else:
                         raise ValueError('Unknown bound')
                 bound.remove_bounds()
 
     @staticmethod
-    def _handle_index_for_struct_component(pipeline, component, k, vv, entity):
+    def _mantain_valued_index(pipeline: RedisLUAPipeline, component, key: str, value: str, entity_id: int):
+        pipeline.mantain_valued_index(component, key, value, entity_id)
+
+    def _handle_index_for_struct_component(self, pipeline, component, k, vv, entity):
         for v in vv:
             v = v.value
             assert isinstance(v, (bool, int, str)), v
@@ -101,15 +174,15 @@ class RedisDataRepository:
             elif index_type == str:
                 if v:
                     pipeline.zadd(index_key, 0, entity.entity_id)
-                    pipeline.mantain_valued_index(component, k, v, entity.entity_id)
+                    self._mantain_valued_index(pipeline, component, k, v, entity.entity_id)
                 else:
                     pipeline.zrem(index_key, entity.entity_id)
                     pipeline.drop_value_from_index(index_key, v, entity.entity_id)
             else:
                 raise ValueError('Unknown index type: %s' % index_type)
 
-    def _update_struct_component(self, pipeline, entity, component):
-        for k, v in component.pending_changes.items():
+    def _update_struct_component(self, pipeline, entity, component, changes: typing.Dict):
+        for k, v in changes.items():
             component.has_index(k) and self._handle_index_for_struct_component(pipeline, component, k, v, entity)
             comp_key = component.enum
             if component.get_subtype(k) == int:
@@ -181,181 +254,145 @@ class RedisDataRepository:
                         raise ValueError('Invalid action type %s' % str(action))
             else:
                 raise ValueError('Invalid type')
-        component.pending_changes = {}
 
     async def update_entities(self, *entities: Entity) -> Entity:
+        return await self._update_entities(entities)
+
+    async def _update_entities(self, entities: typing.Iterable[Entity], created=False):
+        if self.merge_updates_per_tick and not any(entity.bounds() for entity in entities):
+            return await self._enqueue_updates(entities, created)
+        return await self._execute_updates(((entities, created), ))
+
+    async def _enqueue_updates(self, entities: typing.Iterable[Entity], created: bool):
+        """
+        Defer the update to the next event loop tick, so the updates of the commands
+        finishing in the same tick are executed with a single script.
+        Bounded updates are never merged: a failing bound would fail them all.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending_updates.append((entities, created, future))
+        if len(self._pending_updates) == 1:
+            loop.call_soon(lambda: asyncio.ensure_future(self._flush_pending_updates()))
+        return await future
+
+    async def _flush_pending_updates(self):
+        pending_updates, self._pending_updates = self._pending_updates, []
+        try:
+            response = await self._execute_updates([(entities, created) for entities, created, _ in pending_updates])
+        except Exception as exc:
+            for *_, future in pending_updates:
+                future.done() or future.set_exception(exc)
+            return
+        for *_, future in pending_updates:
+            future.done() or future.set_result(response)
+
+    async def _execute_updates(self, updates: typing.Iterable[typing.Tuple[typing.Iterable[Entity], bool]]):
         redis = await self.async_redis()
         pipeline = RedisLUAPipeline(redis)
-        for entity in entities:
-            assert entity.entity_id
-            self._check_bounds_for_update(pipeline, entity)
-        for entity in entities:
-            for component in entity.pending_changes.values():
-                if component.enum == ComponentTypeEnum.POSITION:
-                    self.map_repository.update_map_position_for_entity(component, entity, pipeline)
-                pipeline.setbit(
-                    'c:{}:m'.format(component.key),
-                    entity.entity_id, Bit.ON.value if component.is_active() else Bit.OFF.value
-                )
-                assert component.is_struct
-                self._update_struct_component(pipeline, entity, component)
+        unit_of_work = EntitiesUnitOfWork()
+        for entities, created in updates:
+            for entity in entities:
+                assert entity.entity_id
+                self._check_bounds_for_update(pipeline, entity)
+                unit_of_work.add(entity, created=created)
+        for entity, component in unit_of_work.positions:
+            self.map_repository.update_map_position_for_entity(component, entity, pipeline)
+        written = []
+        for entity, component, changes in unit_of_work.components():
+            pipeline.setbit(
+                'c:{}:m'.format(component.key),
+                entity.entity_id, Bit.ON.value if component.is_active() else Bit.OFF.value
+            )
+            self._update_struct_component(pipeline, entity, component, changes)
+            written.append((entity.entity_id, component, changes))
+        for entity_id in unit_of_work.created:
+            pipeline.setbit(self.entities_bitmap_key, entity_id, Bit.ON.value)
+        self.updates_stats.track(unit_of_work, len(updates))
+        self.components_cache and self.components_cache.begin_write()
         response = await pipeline.execute()
-        for entity in entities:
-            entity.clear_bounds().pending_changes.clear()
+        response and self._cache_entity_types(written)
+        response and self.components_cache and self._write_through_components_cache(written)
+        for entities, _ in updates:
+            for entity in entities:
+                entity.clear_bounds().pending_changes.clear()
         LOGGER.core.debug('EntityRepository.update_entity_components, response: %s', response)
         return response
 
-    @staticmethod
-    def _enqueue_full_struct_component_read_for_entity(primitives, pipeline, component, entity_id):
-        for meta in component.meta:
-            subkey, subtype = meta
-            if subtype in (str, int, bool):
-                if not primitives.get(component):
-                    primitives[component] = []
-                primitives[component].append(subkey)
-            elif subtype == dict:
-                pipeline.hgetall('e:{}:c:{}:{}'.format(entity_id, component.key, subkey))
-            elif subtype == list:
-                pipeline.zrange('c:{}:zs:e:{}:{}'.format(component.key, entity_id, subkey), 0, -1)
-            else:
-                raise ValueError('Unknown type')
+    async def log_updates_stats(self, interval: float):
+        """
+        Logs the write path coalescing counters every interval seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            LOGGER.core.info('Updates stats: %s', self.updates_stats.as_dict())
 
-    @staticmethod
-    def _enqueue_selective_struct_component_read_for_entity(primitives, pipeline, component_query, entity_id):
-        component = component_query[0]
-        keys = component_query[1:]
-        for key in keys:
-            if component.get_subtype(key) in (str, int, bool):
-                if not primitives.get(component):
-                    primitives[component] = []
-                primitives[component].append(key)
-            elif component.get_subtype(key) == dict:
-                pipeline.hgetall('e:{}:c:{}:{}'.format(entity_id, component.key, key))
-            elif component.get_subtype(key) == list:
-                pipeline.zrange('c:{}:zs:e:{}:{}'.format(component.key, entity_id, key), 0, -1)
-            else:
-                raise ValueError('Unknown type: %s' % key)
+    def _cache_entity_types(self, written: typing.List[typing.Tuple[int, StructComponent, typing.Dict]]):
+        for entity_id, component, changes in written:
+            if component.enum == SystemComponent.enum and changes.get('instance_of'):
+                action = changes['instance_of'][-1]
+                isinstance(action, StructSubtypeStrSetAction) and self.entity_types.update({entity_id: action.value})
 
-    def _resolve_full_struct_component_read_for_entity(
-            self, redis_response, response, component, pos: typing.List[int], entity_type: typing.Optional[str]
-    ):
-        if not response.get(component.enum):
-            response[component.enum] = component()
-        for meta in component.meta:
-            subkey, subtype = meta
-            if subtype in (str, int, bool):
-                pass
-            elif subtype == dict:
-                value = self._load_value_or_default(component, subkey, redis_response[pos[0]], entity_type)
-                load_value_in_struct_component(response[component.enum], subkey, value)
-                pos[0] += 1
-            elif subtype == list:
-                value = self._load_value_or_default(component, subkey, redis_response[pos[0]], entity_type)
-                load_value_in_struct_component(response[component.enum], subkey, value)
-                pos[0] += 1
-            else:
-                raise ValueError('Unknown type')
+    def _write_through_components_cache(self, written: typing.List[typing.Tuple[int, StructComponent, typing.Dict]]):
+        invalidations = []
+        for entity_id, component, changes in written:
+            self.components_cache.apply_changes(entity_id, component, changes)
+            invalidations.extend((entity_id, component.key, field) for field in changes)
+        asyncio.ensure_future(self.components_cache.publish_invalidations(invalidations))
 
-    def _resolve_selective_struct_component_read_for_entity(
-            self, redis_response, response, component_query, pos: typing.List[int], entity_type: typing.Optional[str]
-    ):
-        component = component_query[0]
-        keys = component_query[1:]
-        for key in keys:
-            if component.get_subtype(key) in (str, int, bool):
-                pass
-            elif component.get_subtype(key) == dict:
-                if not response.get(component.enum):
-                    response[component.enum] = component()
-                value = self._load_value_or_default(component, key, redis_response[pos[0]], entity_type)
-                load_value_in_struct_component(response[component.enum], key, value)
-                pos[0] += 1
-            elif component.get_subtype(key) == list:
-                if not response.get(component.enum):
-                    response[component.enum] = component()
-                value = self._load_value_or_default(component, key, redis_response[pos[0]], entity_type)
-                load_value_in_struct_component(response[component.enum], key, value)
-                pos[0] += 1
-            else:
-                raise ValueError('Unknown type %s' % key)
-
-    @staticmethod
-    def _enqueue_gather_entity_types_for_defaults(pipeline, entity_ids, components) -> bool:
-        has_defaults = False
-        for comp in components:
-            if isinstance(comp, (tuple, list)):
-                if comp[1] in comp[0].defaults:
-                    has_defaults = True
-                    break
-            elif inspect.isclass(comp) and issubclass(comp, StructComponent):
-                if comp.defaults:
-                    has_defaults = True
-                    break
-            else:
-                raise ValueError('Unknown type')
-        if has_defaults:
-            key = 'c:{}:d:{}'.format(SystemComponent.key, 'instance_of')
-            pipeline.hmget(key, *entity_ids)
-        return has_defaults
-
-    @staticmethod
-    def _resolve_gather_entity_types_for_defaults(redis_result, entity_ids, pos) -> typing.Dict:
-        pos[0] += 1
-        return {
-            entity_ids[i]: v.decode() for i, v in enumerate(redis_result[0])
-        }
+    def _get_read_plan(self, components) -> ComponentsReadPlan:
+        query = normalize_components_query(components)
+        plan = self._read_plans.get(query)
+        if not plan:
+            plan = self._read_plans[query] = ComponentsReadPlan(query)
+        return plan
 
     async def read_struct_components_for_entity(
             self,
             entity_id,
-            *components: typing.Union[typing.Type[StructComponent], typing.Union[tuple, list]]
+            *components: typing.Union[typing.Type[StructComponent], typing.Union[tuple, list]],
+            load_defaults=True
     ):
         """
         This is tailored on the DB to read from the same entity table.
         """
+        plan = self._get_read_plan(components)
+        if not load_defaults:
+            return await self._read_plan_for_entity(plan, entity_id, self._no_default)
+        cache = self.components_cache if self.components_cache and self.components_cache.is_cached_query(plan) else None
+        if cache:
+            response = cache.get_components(plan, entity_id)
+            if response is not None:
+                return response
+            version = cache.version
+        response = await self._read_plan_for_entity(plan, entity_id, self._load_value_or_default)
+        cache and cache.set_components(plan, entity_id, response, version)
+        return response
+
+    def _get_entity_types(self, plan: ComponentsReadPlan, entity_ids: typing.List[int]) -> typing.Dict[int, str]:
+        return plan.has_defaults and self.entity_types.get_many(entity_ids) or {}
+
+    async def _read_plan_for_entity(self, plan: ComponentsReadPlan, entity_id: int, load_default: callable):
+        entity_types = self._get_entity_types(plan, [entity_id])
         redis = await self.async_redis()
         pipeline = redis.pipeline()
-        primitives = {}
-        components_has_defaults = self._enqueue_gather_entity_types_for_defaults(pipeline, [entity_id], components)
-        for component in components:
-            if isinstance(component, (tuple, list)):
-                self._enqueue_selective_struct_component_read_for_entity(primitives, pipeline, component, entity_id)
-            elif issubclass(component, StructComponent):
-                self._enqueue_full_struct_component_read_for_entity(primitives, pipeline, component, entity_id)
-            else:
-                raise ValueError('Unknown type')
-        for comp, v in primitives.items():
-            pipeline.hmget('e:{}:c:{}'.format(entity_id, comp.key), *v)
+        plan.enqueue_for_entity(pipeline, entity_id, entity_types)
         result = await pipeline.execute()
-        response = dict()
-        i = [0]
-        if components_has_defaults:
-            entity_types = self._resolve_gather_entity_types_for_defaults(result, [entity_id], i)
-            entity_type = entity_types and entity_types[entity_id] or None
-        else:
-            entity_type = None
-        for component in components:
-            if isinstance(component, (tuple, list)):
-                self._resolve_selective_struct_component_read_for_entity(
-                    primitives, pipeline, component, i, entity_type
-                )
-            elif issubclass(component, StructComponent):
-                self._resolve_full_struct_component_read_for_entity(
-                    result, response, component, i, entity_type
-                )
-            else:
-                raise ValueError('Unknown type')
-        for component, keys in primitives.items():
-            if not response.get(component.enum):
-                response[component.enum] = component()
-            ki = 0
-            for key in keys:
-                value = self._load_value_or_default(component, key, result[i[0]][ki], entity_type)
-                load_value_in_struct_component(response[component.enum], key, value)
-                ki += 1
-            i[0] += 1
+        response = plan.resolve_for_entity(result, entity_id, load_default, entity_types)
+        self.entity_types.update(entity_types)
         return response
 
+    def _get_cached_components_for_entities(self, plan: ComponentsReadPlan, entity_ids: typing.List[int]):
+        if not self.components_cache or not self.components_cache.is_cached_query(plan):
+            return None, None
+        return self.components_cache.get_components_for_entities(plan, entity_ids), self.components_cache.version
+
+    def _set_cached_components_for_entities(self, plan: ComponentsReadPlan, response: typing.Dict, version: int):
+        if version is None:
+            return
+        for entity_id, components in response.items():
+            self.components_cache.set_components(plan, entity_id, components, version)
+
     async def get_entity_ids_with_valued_components(
         self,
         *components: typing.Tuple[StructComponent, str]
@@ -385,141 +422,87 @@ class RedisDataRepository:
         _ = [entity_ids.extend((int(eid) for eid in r)) for r in res]
         return entity_ids
 
+    async def query_entities(
+            self, query: EntitiesQuery, chunk_size=500
+    ) -> typing.AsyncIterator[typing.List[int]]:
+        """
+        Evaluates the query server side, into a temporary sorted set, and yields the entity ids by chunks.
+        The result is a snapshot: it expires after query_results_ttl seconds, if the iteration is not completed.
+        """
+        keys = []
+        program = query.compile(keys)
+        result_key = 'q:{}'.format(uuid.uuid4().hex)
+        redis = await self.async_redis()
+        size = await ENTITIES_QUERY_SCRIPT.execute(
+            redis, keys=keys + [result_key], args=[self.query_results_ttl] + program
+        )
+        try:
+            for start in range(0, size, chunk_size):
+                yield [int(x) for x in await redis.zrange(result_key, start, start + chunk_size - 1)]
+        finally:
+            await redis.delete(result_key)
+
     async def read_struct_components_for_entities(
         self,
         entity_ids: typing.List[int],
-        *components: typing.Type[typing.Union[tuple, list, StructComponent]]
+        *components: typing.Type[typing.Union[tuple, list, StructComponent]],
+        load_defaults=True
     ):
         """
         This is more effective to mount the same components on multiple entities.
         """
+        return await self._read_components_for_entities(
+            entity_ids, components, self._read_plan_for_entities, load_defaults
+        )
+
+    async def _read_plan_for_entities(self, plan: ComponentsReadPlan, entity_ids: typing.List[int], load_default):
+        entity_types = self._get_entity_types(plan, entity_ids)
         redis = await self.async_redis()
         pipeline = redis.pipeline()
-        components_has_defaults = self._enqueue_gather_entity_types_for_defaults(pipeline, entity_ids, components)
-        for component in components:
-            if isinstance(component, (tuple, list)):
-                self._enqueue_selective_struct_component_read_multiple_entities(pipeline, entity_ids, component)
-            elif inspect.isclass(component) and issubclass(component, StructComponent):
-                self._enqueue_full_struct_component_read_multiple_entities(pipeline, entity_ids, component)
-            else:
-                raise ValueError('Unknown type: %s' % component)
+        plan.enqueue_for_entities(pipeline, entity_ids, entity_types)
         redis_response = await pipeline.execute()
-        response = {entity_id: {} for entity_id in entity_ids}
-        pos = [0]
-        if components_has_defaults:
-            entity_types = self._resolve_gather_entity_types_for_defaults(redis_response, entity_ids, pos)
-        else:
-            entity_types = {}
-        for component in components:
-            if isinstance(component, (tuple, list)):
-                self._resolve_selective_struct_component_read_multiple_entities(
-                    redis_response, response, entity_ids, component, pos, entity_types
-                )
-            elif issubclass(component, StructComponent):
-                self._resolve_full_struct_component_read_multiple_entities(
-                    redis_response, response, entity_ids, component, pos, entity_types
-                )
+        response = plan.resolve_for_entities(redis_response, entity_ids, load_default, entity_types)
+        self.entity_types.update(entity_types)
         return response
 
-    @staticmethod
-    def _enqueue_selective_struct_component_read_multiple_entities(
-            pipeline, entity_ids, component_query: (tuple, list)
+    async def bulk_read_struct_components_for_entities(
+        self,
+        entity_ids: typing.List[int],
+        *components: typing.Type[typing.Union[tuple, list, StructComponent]],
+        load_defaults=True
     ):
-        component = component_query[0]
-        keys = component_query[1:]
-        for key in keys:
-            if component.get_subtype(key) in (str, bool, int):
-                pipeline.hmget('c:{}:d:{}'.format(component.key, key), *entity_ids)
-            elif component.get_subtype(key) == list:
-                for entity_id in entity_ids:
-                    pipeline.zrange('c:{}:zs:e:{}:{}'.format(component.key, entity_id, key), 0, -1)
-            elif component.get_subtype(key) == dict:
-                for entity_id in entity_ids:
-                    pipeline.hgetall('e:{}:c:{}:{}'.format(entity_id, component.key, key))
-            else:
-                raise ValueError('Unknown subtype {}.{}'.format(component, key))
+        """
+        Same as read_struct_components_for_entities, but the read is done server side by the bulk loader script:
+        a single round trip and a single flat reply, regardless of the lists and dicts to be read.
+        """
+        return await self._read_components_for_entities(
+            entity_ids, components, self._bulk_read_plan_for_entities, load_defaults
+        )
+
+    async def _bulk_read_plan_for_entities(self, plan: ComponentsReadPlan, entity_ids: typing.List[int], load_default):
+        redis = await self.async_redis()
+        reply = await BULK_LOADER_SCRIPT.execute(redis, args=plan.loader_args(entity_ids))
+        entity_types = {}
+        response = plan.resolve_loader_reply(reply, entity_ids, load_default, entity_types)
+        self.entity_types.update(entity_types)
+        return response
 
-    def _resolve_selective_struct_component_read_multiple_entities(
-            self, redis_response, response, entity_ids, component_query: (tuple, list), pos, entity_types
+    async def _read_components_for_entities(
+            self, entity_ids: typing.List[int], components: tuple, read: callable, load_defaults: bool
     ):
-        component = component_query[0]
-        keys = component_query[1:]
-        assert keys
-        for key in keys:
-            if component.get_subtype(key) in (str, bool, int):
-                data = redis_response[pos[0]]
-                for i, entity_id in enumerate(entity_ids):
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-                    value = self._load_value_or_default(component, key, data[i], entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], key, value)
-                pos[0] += 1
-            elif component.get_subtype(key) == list:
-                for entity_id in entity_ids:
-                    data = redis_response[pos[0]]
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-
-                    value = self._load_value_or_default(component, key, data, entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], key, value)
-                    pos[0] += 1
-            elif component.get_subtype(key) == dict:
-                for entity_id in entity_ids:
-                    data = redis_response[pos[0]]
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-                    value = self._load_value_or_default(component, key, data, entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], key, value)
-                    pos[0] += 1
-            else:
-                raise ValueError('Unknown subtype {}.{}'.format(component, key))
+        plan = self._get_read_plan(components)
+        if not load_defaults:
+            return await read(plan, entity_ids, self._no_default)
+        response, cache_version = self._get_cached_components_for_entities(plan, entity_ids)
+        if response is not None:
+            return response
+        response = await read(plan, entity_ids, self._load_value_or_default)
+        self._set_cached_components_for_entities(plan, response, cache_version)
+        return response
 
     @staticmethod
-    def _enqueue_full_struct_component_read_multiple_entities(pipeline, entity_ids, component):
-        for meta in component.meta:
-            subkey, subtype = meta
-            if subtype in (bool, str, int):
-                pipeline.hmget('c:{}:d:{}'.format(component.key, subkey), *entity_ids)
-            elif subtype is list:
-                for entity_id in entity_ids:
-                    pipeline.zrange('c:{}:zs:e:{}:{}'.format(component.key, entity_id, subkey), 0, -1)
-            elif subtype is dict:
-                for entity_id in entity_ids:
-                    pipeline.hgetall('e:{}:c:{}:{}'.format(entity_id, component.key, subkey))
-            else:
-                raise ValueError
-
-    def _resolve_full_struct_component_read_multiple_entities(
-            self, redis_response, response, entity_ids, component, pos, entity_types
-    ):
-        for meta in component.meta:
-            subkey, subtype = meta
-            if subtype in (bool, str, int):
-                data = redis_response[pos[0]]
-                for i, entity_id in enumerate(entity_ids):
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-                    value = self._load_value_or_default(component, subkey, data[i], entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], subkey, value)
-                pos[0] += 1
-            elif subtype is list:
-                for entity_id in entity_ids:
-                    data = redis_response[pos[0]]
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-                    value = self._load_value_or_default(component, subkey, data, entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], subkey, value)
-                    pos[0] += 1
-            elif subtype is dict:
-                for entity_id in entity_ids:
-                    data = redis_response[pos[0]]
-                    if not response[entity_id].get(component.enum):
-                        response[entity_id][component.enum] = component()
-                    value = self._load_value_or_default(component, subkey, data, entity_types.get(entity_id))
-                    load_value_in_struct_component(response[entity_id][component.enum], subkey, value)
-                    pos[0] += 1
-            else:
-                raise ValueError
+    def _no_default(component, key, value, entity_type):
+        return value
 
     def _load_value_or_default(self, component, key, value, entity_type):
         if value:
@@ -0,0 +1,71 @@
+import abc
+import typing
+
+from core.src.world.components.base.structcomponent import StructComponent
+
+
+class EntitiesQuery(metaclass=abc.ABCMeta):
+    """
+    A set expression over the components indexes and bitmaps, evaluated server side
+    by RedisDataRepository.query_entities:
+
+        with_value(SystemComponent, 'instance_of', 'character') - with_index(SystemComponent, 'connection')
+
+    & is the intersection, | the union, - the difference.
+    """
+    def __and__(self, other: 'EntitiesQuery') -> 'EntitiesQuery':
+        return _Operation('&', self, other)
+
+    def __or__(self, other: 'EntitiesQuery') -> 'EntitiesQuery':
+        return _Operation('|', self, other)
+
+    def __sub__(self, other: 'EntitiesQuery') -> 'EntitiesQuery':
+        return _Operation('-', self, other)
+
+    @abc.abstractmethod
+    def compile(self, keys: typing.List[str]) -> typing.List:
+        """
+        Returns the postfix program of ENTITIES_QUERY_SCRIPT, adding the terms keys to keys.
+        """
+        pass  # pragma: no cover
+
+
+class _Term(EntitiesQuery):
+    def __init__(self, opcode: str, key: str):
+        self.opcode = opcode
+        self.key = key
+
+    def compile(self, keys: typing.List[str]) -> typing.List:
+        keys.append(self.key)
+        return [self.opcode, len(keys)]
+
+
+class _Operation(EntitiesQuery):
+    def __init__(self, operator: str, left: EntitiesQuery, right: EntitiesQuery):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def compile(self, keys: typing.List[str]) -> typing.List:
+        return self.left.compile(keys) + self.right.compile(keys) + [self.operator]
+
+
+def with_index(component: typing.Type[StructComponent], field: str) -> EntitiesQuery:
+    """
+    The entities with the indexed field valued.
+    """
+    return _Term('z', 'i:c:{}:{}'.format(component.key, field))
+
+
+def with_value(component: typing.Type[StructComponent], field: str, value: str) -> EntitiesQuery:
+    """
+    The entities with the str indexed field set to value.
+    """
+    return _Term('z', 'i:c:{}:{}:{}'.format(component.key, field, value))
+
+
+def with_component(component: typing.Type[StructComponent]) -> EntitiesQuery:
+    """
+    The entities with the component active, from the component bitmap.
+    """
+    return _Term('b', 'c:{}:m'.format(component.key))
@@ -0,0 +1,48 @@
+import asyncio
+import collections
+import typing
+
+from core.src.auth.logging_factory import LOGGER
+from core.src.world.repositories.lua_scripts import LEASE_ENTITY_IDS_SCRIPT
+
+
+class EntityIdsAllocator:
+    """
+    Allocates entity ids from blocks leased to the worker process,
+    so the allocation doesn't need a round trip to Redis in the common case.
+
+    Blocks are leased from the free ids list, populated on entities deletion, and then from never used ids.
+    Leased ids are not marked into the entities bitmap until the entities are saved:
+    ids leased by a worker that stops are lost, as gaps.
+    """
+    def __init__(self, redis_factory: callable, lease_size=128):
+        self.redis_factory = redis_factory
+        self.lease_size = lease_size
+        self.free_ids_key = 'e:f'
+        self.counter_key = 'e:c'
+        self.bitmap_key = 'e:m'
+        self._leased: typing.Deque[int] = collections.deque()
+        self.async_lock = asyncio.Lock()
+
+    async def _lease(self, n: int):
+        redis = await self.redis_factory()
+        response = await LEASE_ENTITY_IDS_SCRIPT.execute(
+            redis, keys=[self.free_ids_key, self.counter_key, self.bitmap_key], args=[n]
+        )
+        LOGGER.core.debug('EntityIdsAllocator._lease, response: %s', response)
+        assert len(response) == n, (n, response)
+        self._leased.extend(int(x) for x in response)
+
+    async def allocate(self, n=1) -> typing.List[int]:
+        async with self.async_lock:
+            if len(self._leased) < n:
+                await self._lease(max(self.lease_size, n - len(self._leased)))
+            return [self._leased.popleft() for _ in range(0, n)]
+
+    def free(self, pipeline, *entity_ids: int):
+        """
+        Unmark the deleted entity ids from the entities bitmap and enqueue them into the free ids list,
+        using the given RedisLUAPipeline. The ids not marked are not enqueued, so they are never freed twice.
+        """
+        for entity_id in entity_ids:
+            pipeline.free_entity_id(self.bitmap_key, self.free_ids_key, entity_id)
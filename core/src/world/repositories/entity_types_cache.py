@@ -0,0 +1,60 @@
+import typing
+from collections import OrderedDict
+
+from core.src.auth.logging_factory import LOGGER
+
+
+class EntityTypesCache:
+    """
+    In memory entity_id -> entity type (SystemComponent.instance_of), used to resolve the library defaults.
+    The type of an entity never changes after the instancing, so it is cached on first read and on save.
+
+    Entity ids are reused after the deletions: the deletions are published on the deletions channel,
+    and the other workers forget the deleted ids.
+    """
+    deletions_channel = 'e:d'
+
+    def __init__(self, max_size=131072, pubsub_manager=None):
+        self.max_size = max_size
+        self.pubsub_manager = pubsub_manager
+        self._types = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._types)
+
+    def get_many(self, entity_ids: typing.Iterable[int]) -> typing.Dict[int, str]:
+        response = {}
+        for entity_id in entity_ids:
+            entity_type = self._types.get(entity_id)
+            if entity_type is None:
+                self.misses += 1
+                continue
+            self.hits += 1
+            self._types.move_to_end(entity_id)
+            response[entity_id] = entity_type
+        return response
+
+    def update(self, entity_types: typing.Dict[int, str]):
+        for entity_id, entity_type in entity_types.items():
+            if not entity_type:
+                continue
+            self._types[entity_id] = entity_type
+            self._types.move_to_end(entity_id)
+        while len(self._types) > self.max_size:
+            self._types.popitem(last=False)
+
+    def forget(self, *entity_ids: int):
+        for entity_id in entity_ids:
+            self._types.pop(entity_id, None)
+
+    async def publish_deletion(self, entity_id: int):
+        self.pubsub_manager and await self.pubsub_manager.publish(self.deletions_channel, entity_id)
+
+    async def listen_deletions(self):
+        async for entity_id in self.pubsub_manager.subscribe(self.deletions_channel):
+            try:
+                self.forget(int(entity_id))
+            except Exception:
+                LOGGER.core.exception('EntityTypesCache, invalid message: %s', entity_id)
@@ -0,0 +1,379 @@
+import hashlib
+
+import aioredis
+
+
+class RedisLUAScript:
+    """
+    A LUA script registered on Redis and executed with EVALSHA.
+    The digest is computed locally, so the script is loaded with SCRIPT LOAD only once, on NOSCRIPT.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def load(self, redis: aioredis.Redis):
+        sha = await redis.script_load(self.source)
+        assert sha == self.sha, (sha, self.sha)
+        return self
+
+    async def execute(self, redis: aioredis.Redis, keys=(), args=()):
+        try:
+            return await redis.evalsha(self.sha, keys=list(keys), args=list(args))
+        except aioredis.errors.ReplyError as exc:
+            if not str(exc).startswith('NOSCRIPT'):
+                raise
+        await self.load(redis)
+        return await redis.evalsha(self.sha, keys=list(keys), args=list(args))
+
+
+# Reads all the requested fields of all the requested entities, in a single flat length-prefixed reply.
+# ARGV: n_entities, entity_id..., n_fields, (component_key, field, field_type)...
+# field_type is 'p' for primitives, 'l' for lists and 'd' for dicts.
+# For every entity and every field, the reply contains the number of values, followed by the values.
+BULK_LOADER_SCRIPT = RedisLUAScript("""
+local n_entities = tonumber(ARGV[1])
+local fields_offset = n_entities + 2
+local n_fields = tonumber(ARGV[fields_offset])
+local reply = {}
+for e = 2, n_entities + 1 do
+    local entity_id = ARGV[e]
+    for f = 0, n_fields - 1 do
+        local component = ARGV[fields_offset + f * 3 + 1]
+        local field = ARGV[fields_offset + f * 3 + 2]
+        local field_type = ARGV[fields_offset + f * 3 + 3]
+        local values
+        if field_type == 'p' then
+            local value = redis.call('hget', 'c:' .. component .. ':d:' .. field, entity_id)
+            if value then values = {value} else values = {} end
+        elseif field_type == 'l' then
+            values = redis.call('zrange', 'c:' .. component .. ':zs:e:' .. entity_id .. ':' .. field, 0, -1)
+        else
+            values = redis.call('hgetall', 'e:' .. entity_id .. ':c:' .. component .. ':' .. field)
+        end
+        reply[#reply + 1] = #values
+        for i = 1, #values do
+            reply[#reply + 1] = values[i]
+        end
+    end
+end
+return reply
+""")
+
+
+# Executes the opcodes stream built by the RedisLUAPipeline.
+# ARGV: return value, then (opcode, n_args, args...) for every operation.
+# Each operation consumes its keys from KEYS in order: 'reindex', 'preindex' and 'free' consume two keys, any
+# other one.
+# 'zcontains' is a bound: if any of the values is not in the sorted set, the script exits returning 0.
+# 'reindex' moves a member of a valued index from the value stored in an hash, to the new value.
+# Packed components are msgpack maps, stored in an hash by component key:
+# 'packed' applies a msgpack list of (field, opcode, value) actions to a packed component,
+# opcodes: s (set), n (null), i (incr), a, r, o (list append, remove, overwrite), ds, dr (dict set, remove key).
+# 'pcontains' is the bound on a packed list, 'preindex' is 'reindex' reading the previous value from a packed field.
+# 'free' clears an entity bit from the entities bitmap and pushes its id to the free ids list, only if it was set.
+PIPELINE_SCRIPT = RedisLUAScript("""
+local function unpack_component(key, component)
+    local blob = redis.call('hget', key, component)
+    if blob then
+        return cmsgpack.unpack(blob)
+    end
+    return {}
+end
+
+local function set_of(values)
+    local s = {}
+    for _, v in ipairs(values) do
+        s[v] = true
+    end
+    return s
+end
+
+local function update_packed_component(key, component, actions)
+    local values = unpack_component(key, component)
+    for _, action in ipairs(cmsgpack.unpack(actions)) do
+        local field, op, value = action[1], action[2], action[3]
+        if op == 's' or op == 'o' then
+            values[field] = value
+        elseif op == 'n' then
+            values[field] = nil
+        elseif op == 'i' then
+            values[field] = (values[field] or 0) + value
+        elseif op == 'a' then
+            local list = values[field] or {}
+            local present = set_of(list)
+            for _, v in ipairs(value) do
+                if not present[v] then
+                    table.insert(list, v)
+                    present[v] = true
+                end
+            end
+            values[field] = list
+        elseif op == 'r' then
+            local removed = set_of(value)
+            local list = {}
+            for _, v in ipairs(values[field] or {}) do
+                if not removed[v] then
+                    table.insert(list, v)
+                end
+            end
+            values[field] = list
+        elseif op == 'ds' then
+            local dict = values[field] or {}
+            dict[value[1]] = value[2]
+            values[field] = dict
+        elseif op == 'dr' then
+            local dict = values[field] or {}
+            dict[value] = nil
+            values[field] = dict
+        else
+            return redis.error_reply('Unknown packed opcode: ' .. op)
+        end
+    end
+    redis.call('hset', key, component, cmsgpack.pack(values))
+end
+
+local commands = {
+    hset = true, hdel = true, hincrby = true, hmset = true, hget = true,
+    zadd = true, zrem = true, zrange = true, setbit = true, del = true, rpush = true
+}
+local k = 1
+local a = 2
+while a <= #ARGV do
+    local op = ARGV[a]
+    local n = tonumber(ARGV[a + 1])
+    local args = {}
+    for i = 1, n do
+        args[i] = ARGV[a + 1 + i]
+    end
+    a = a + 2 + n
+    if op == 'zcontains' then
+        for i = 1, n do
+            if not redis.call('zscore', KEYS[k], args[i]) then
+                return 0
+            end
+        end
+        k = k + 1
+    elseif op == 'pcontains' then
+        local present = set_of(unpack_component(KEYS[k], args[1])[args[2]] or {})
+        for i = 3, n do
+            if not present[tonumber(args[i])] then
+                return 0
+            end
+        end
+        k = k + 1
+    elseif op == 'packed' then
+        local err = update_packed_component(KEYS[k], args[1], args[2])
+        if err then
+            return err
+        end
+        k = k + 1
+    elseif op == 'preindex' then
+        local previous = unpack_component(KEYS[k], args[1])[args[2]]
+        if previous then
+            redis.call('zrem', KEYS[k + 1] .. ':' .. previous, args[4])
+        end
+        redis.call('zadd', KEYS[k + 1] .. ':' .. args[3], 0, args[4])
+        k = k + 2
+    elseif op == 'free' then
+        if redis.call('setbit', KEYS[k], args[1], 0) == 1 then
+            redis.call('rpush', KEYS[k + 1], args[1])
+        end
+        k = k + 2
+    elseif op == 'reindex' then
+        local previous = redis.call('hget', KEYS[k], args[1])
+        if previous then
+            redis.call('zrem', KEYS[k + 1] .. ':' .. previous, args[3])
+        end
+        redis.call('zadd', KEYS[k + 1] .. ':' .. args[2], 0, args[3])
+        k = k + 2
+    elseif commands[op] then
+        redis.call(op, KEYS[k], unpack(args))
+        k = k + 1
+    else
+        return redis.error_reply('Unknown pipeline opcode: ' .. op)
+    end
+end
+return tonumber(ARGV[1])
+""")
+
+
+# Leases a block of free entity ids: first the ids freed by deletions, then never used ids.
+# KEYS: the free ids list, the never used ids counter, the entities bitmap (to initialize the counter).
+# ARGV: the number of ids to lease.
+LEASE_ENTITY_IDS_SCRIPT = RedisLUAScript("""
+local n = tonumber(ARGV[1])
+local ids = {}
+while #ids < n do
+    local id = redis.call('lpop', KEYS[1])
+    if not id then
+        break
+    end
+    ids[#ids + 1] = tonumber(id)
+end
+local missing = n - #ids
+if missing > 0 then
+    if redis.call('exists', KEYS[2]) == 0 then
+        -- ids up to the last bit set into the entities bitmap are considered used.
+        local size = redis.call('strlen', KEYS[3])
+        local last_used = 0
+        if size > 0 then
+            local byte = string.byte(redis.call('getrange', KEYS[3], -1, -1))
+            local offset = 7
+            while offset > 0 and byte % 2 == 0 do
+                byte = math.floor(byte / 2)
+                offset = offset - 1
+            end
+            last_used = (size - 1) * 8 + offset
+        end
+        redis.call('set', KEYS[2], last_used)
+    end
+    local last = redis.call('incrby', KEYS[2], missing)
+    for id = last - missing + 1, last do
+        ids[#ids + 1] = id
+    end
+end
+return ids
+""")
+
+
+# Evaluates an entities query: a set expression over indexes (sorted sets) and components bitmaps.
+# KEYS: the terms keys, then the result key.
+# ARGV: the result TTL, then the postfix program: ('z', n) and ('b', n) push the sorted set / bitmap KEYS[n],
+# '&', '|', '-' pop two operands and push their intersection, union, difference.
+# Bitmaps are combined with BITOP, and turned into sorted sets only when combined with a sorted set by union.
+# The result is stored as a sorted set into the result key, expiring after the TTL. Returns its size.
+ENTITIES_QUERY_SCRIPT = RedisLUAScript("""
+local result_key = KEYS[#KEYS]
+local temps = {}
+
+local function temp_key()
+    local key = result_key .. ':' .. (#temps + 1)
+    table.insert(temps, key)
+    return key
+end
+
+local function zadd_members(key, members)
+    local batch = {}
+    for _, member in ipairs(members) do
+        table.insert(batch, 0)
+        table.insert(batch, member)
+        if #batch >= 1000 then
+            redis.call('zadd', key, unpack(batch))
+            batch = {}
+        end
+    end
+    if #batch > 0 then
+        redis.call('zadd', key, unpack(batch))
+    end
+end
+
+local function as_zset(term)
+    if not term.bitmap then
+        return term.key
+    end
+    local bitmap = redis.call('get', term.key) or ''
+    local members = {}
+    for i = 1, #bitmap do
+        local byte = string.byte(bitmap, i)
+        if byte > 0 then
+            for b = 0, 7 do
+                local entity_id = (i - 1) * 8 + b
+                if entity_id > 0 and bit.band(byte, bit.rshift(128, b)) ~= 0 then
+                    table.insert(members, entity_id)
+                end
+            end
+        end
+    end
+    local key = temp_key()
+    zadd_members(key, members)
+    return key
+end
+
+local function filter(zset, keep)
+    local members = {}
+    for _, member in ipairs(redis.call('zrange', zset, 0, -1)) do
+        if keep(member) then
+            table.insert(members, member)
+        end
+    end
+    local key = temp_key()
+    zadd_members(key, members)
+    return {key = key}
+end
+
+local function in_bitmap(key)
+    return function(member) return redis.call('getbit', key, member) == 1 end
+end
+
+local function not_in_bitmap(key)
+    return function(member) return redis.call('getbit', key, member) == 0 end
+end
+
+local function not_in_zset(key)
+    return function(member) return not redis.call('zscore', key, member) end
+end
+
+local function intersection(left, right)
+    if left.bitmap and right.bitmap then
+        local key = temp_key()
+        redis.call('bitop', 'and', key, left.key, right.key)
+        return {key = key, bitmap = true}
+    elseif left.bitmap then
+        return filter(right.key, in_bitmap(left.key))
+    elseif right.bitmap then
+        return filter(left.key, in_bitmap(right.key))
+    end
+    local key = temp_key()
+    redis.call('zinterstore', key, 2, left.key, right.key)
+    return {key = key}
+end
+
+local function union(left, right)
+    local key = temp_key()
+    if left.bitmap and right.bitmap then
+        redis.call('bitop', 'or', key, left.key, right.key)
+        return {key = key, bitmap = true}
+    end
+    redis.call('zunionstore', key, 2, as_zset(left), as_zset(right))
+    return {key = key}
+end
+
+local function difference(left, right)
+    if left.bitmap and right.bitmap then
+        local common = temp_key()
+        local key = temp_key()
+        redis.call('bitop', 'and', common, left.key, right.key)
+        redis.call('bitop', 'xor', key, left.key, common)
+        return {key = key, bitmap = true}
+    elseif right.bitmap then
+        return filter(as_zset(left), not_in_bitmap(right.key))
+    end
+    return filter(as_zset(left), not_in_zset(right.key))
+end
+
+local operations = {['&'] = intersection, ['|'] = union, ['-'] = difference}
+local stack = {}
+local a = 2
+while a <= #ARGV do
+    local op = ARGV[a]
+    if op == 'z' or op == 'b' then
+        table.insert(stack, {key = KEYS[tonumber(ARGV[a + 1])], bitmap = op == 'b'})
+        a = a + 2
+    elseif operations[op] then
+        local right = table.remove(stack)
+        local left = table.remove(stack)
+        table.insert(stack, operations[op](left, right))
+        a = a + 1
+    else
+        return redis.error_reply('Unknown query opcode: ' .. op)
+    end
+end
+redis.call('del', result_key)
+redis.call('zunionstore', result_key, 1, as_zset(stack[1]))
+redis.call('expire', result_key, ARGV[1])
+if #temps > 0 then
+    redis.call('del', unpack(temps))
+end
+return redis.call('zcard', result_key)
+""")
@@ -1,6 +1,5 @@
 import asyncio
-import binascii
-import os
+import itertools
 import struct
 import time
 import typing
@@ -9,106 +8,417 @@ from core.src.auth.logging_factory import LOGGER
 from core.src.world import exceptions
 from core.src.world.components.position import PositionComponent
 from core.src.world.domain.room import Room
+from core.src.world.repositories.terrains_cache import TerrainsCache, TerrainsChunk, ChunkId
+from core.src.world.repositories.world_snapshot import WorldSnapshot
+from core.src.world.utils import morton
 from core.src.world.utils.world_types import TerrainEnum
+from core.src.world.utils.world_utils import is_terrain_walkable, WALKABLE_TERRAINS
+
+
+MapMetadata = typing.NamedTuple(
+    'MapMetadata',
+    (
+        ('min_x', int),
+        ('min_y', int),
+        ('max_x', int),
+        ('max_y', int),
+        ('layers', typing.Tuple[int, ...]),
+        ('version', int),
+        ('snapshot', str),
+        ('snapshot_version', int)
+    )
+)
 
 
 class RedisMapRepository:
-    def __init__(self, redis_factory: callable):
+    """
+    The terrains are stored in chunks of chunk_size x chunk_size rooms, one string per chunk and z layer,
+    one byte per room, row major: coordinates may be negative, and the Redis values stay small whatever
+    the map size. A row segment is a GETRANGE per chunk crossed, all in the same round trip.
+    The dimensions and the layers are read from the map metadata record, written by the map importer.
+
+    With a TerrainsCache, the chunks are loaded on demand and kept in a bounded LRU:
+    once warm, the terrains are read from memory and only the rooms content is read from Redis.
+    A mapped WorldSnapshot, if any, is the chunks source until the map is written after it.
+    """
+    def __init__(
+            self,
+            redis_factory: callable,
+            terrains_cache: typing.Optional[TerrainsCache] = None,
+            morton_index=False,
+            snapshot: typing.Optional[WorldSnapshot] = None
+    ):
         self.redis_factory = redis_factory
+        self.terrains_cache = terrains_cache
+        self.snapshot = snapshot
+        self.morton_index = morton_index
         self.prefix = 'm'
         self.terrains_suffix = 't'
-        self.z_valued_rooms_data_suffix = 'd'
+        self.metadata_suffix = 'meta'
         self.room_content_suffix = 'c'
 
-        self.terrains_bitmap_key = '{}:{}'.format(self.prefix, self.terrains_suffix)
+        self.chunk_size = 64
+        self.terrains_chunk_key = '{}:{}:{}'.format(self.prefix, self.terrains_suffix, '{}:{}.{}')
         self.room_content_key = '{}:{}:{}'.format(self.prefix, '{}', self.room_content_suffix)
-        self.z_valued_rooms_data_key = '{}:{}'.format(self.prefix, self.z_valued_rooms_data_suffix)
-        self.mul = 10**4
+        self.metadata_key = '{}:{}'.format(self.prefix, self.metadata_suffix)
+
+        # Default spatial index: the entities positions, a hash entity_id -> 'x,y' per bucket of bucket_size^2 rooms.
+        self.buckets_suffix = 'b'
+        self.buckets_key = '{}:{}:{}'.format(self.prefix, self.buckets_suffix, '{}')
+        self.bucket_size = 8
+
+        # Optional spatial index: the positioned entities of each z layer, in a sorted set scored by the
+        # Morton code of their (x, y). Rectangles are read with a few ZRANGEBYSCORE.
+        self.morton_suffix = 'z'
+        self.morton_key = '{}:{}:{}'.format(self.prefix, self.morton_suffix, '{}')
+        # The spatial index built from the rooms contents, rebuilt when it is not the one in use.
+        self.positions_index_key = '{}:{}'.format(self.prefix, 'i')
         self._pipelines = None
         self._redis = None
-
-        self.max_y = 67  # FIXME TODO
-        self.max_x = 131      # FIXME TODO
-        self.min_x = 0
-        self.min_y = 0
+        self.metadata = MapMetadata(
+            min_x=0, min_y=0, max_x=0, max_y=0, layers=(0,), version=0, snapshot='', snapshot_version=0
+        )
         self.async_lock = asyncio.Lock()
 
+    @property
+    def min_x(self) -> int:
+        return self.metadata.min_x
+
+    @property
+    def min_y(self) -> int:
+        return self.metadata.min_y
+
+    @property
+    def max_x(self) -> int:
+        return self.metadata.max_x
+
+    @property
+    def max_y(self) -> int:
+        return self.metadata.max_y
+
     def get_room_key(self, x, y, z):
         if z:
             return self.room_content_key.format('{}.{}.{}'.format(x, y, z))
         else:
             return self.room_content_key.format('{}.{}'.format(x, y))
 
+    def get_bucket_key(self, x: int, y: int, z: int) -> str:
+        return self.buckets_key.format(
+            '{}.{}.{}'.format(x // self.bucket_size, y // self.bucket_size, z)
+        )
+
+    def get_morton_key(self, z: int) -> str:
+        return self.morton_key.format(z)
+
+    def get_chunk_key(self, z: int, cx: int, cy: int) -> str:
+        return self.terrains_chunk_key.format(z, cx, cy)
+
+    def get_chunk_position(self, x: int, y: int, z: int) -> typing.Tuple[ChunkId, int]:
+        """
+        The chunk (z, cx, cy) of the room, and the room offset into it.
+        """
+        cx, local_x = divmod(x, self.chunk_size)
+        cy, local_y = divmod(y, self.chunk_size)
+        return (z, cx, cy), local_y * self.chunk_size + local_x
+
+    def _row_segments(self, y: int, from_x: int, to_x: int, z: int) -> typing.List[typing.Tuple[ChunkId, int, int]]:
+        """
+        The (chunk, offset, length) segments of the rooms from_x..to_x - 1 of the row, split on the chunks edges.
+        """
+        segments = []
+        x = from_x
+        while x < to_x:
+            chunk_id, offset = self.get_chunk_position(x, y, z)
+            length = min(self.chunk_size - x % self.chunk_size, to_x - x)
+            segments.append((chunk_id, offset, length))
+            x += length
+        return segments
+
     async def redis(self) -> aioredis.Redis:
         await self.async_lock.acquire()
         try:
             if not self._redis:
                 self._redis = await self.redis_factory()
+                await self._load_metadata(self._redis)
         finally:
             self.async_lock.release()
         return self._redis
 
-    def _coords_to_int(self, x: int, y: int, bytesize=1) -> int:
-        intcoord = (y * bytesize * self.mul) + x * bytesize
-        return intcoord
+    @staticmethod
+    def _decode_metadata(data: typing.Dict[bytes, bytes]) -> MapMetadata:
+        return MapMetadata(
+            min_x=int(data[b'min_x']),
+            min_y=int(data[b'min_y']),
+            max_x=int(data[b'max_x']),
+            max_y=int(data[b'max_y']),
+            layers=tuple(int(z) for z in data[b'layers'].decode().split(',')),
+            version=int(data.get(b'version', 0)),
+            snapshot=data.get(b'snapshot', b'').decode(),
+            snapshot_version=int(data.get(b'snapshot_version', 0))
+        )
+
+    async def _load_metadata(self, redis):
+        data = await redis.hgetall(self.metadata_key)
+        if data:
+            self.metadata = self._decode_metadata(data)
+        else:
+            LOGGER.core.warning('Map metadata not found, the map is empty')
+
+    async def load_metadata(self) -> MapMetadata:
+        await self._load_metadata(await self.redis())
+        return self.metadata
+
+    async def set_metadata(self, min_x: int, min_y: int, max_x: int, max_y: int, layers=(0,)) -> MapMetadata:
+        """
+        Defines the map dimensions and layers, and bumps the map version.
+        """
+        assert max_x >= min_x and max_y >= min_y and layers, (min_x, min_y, max_x, max_y, layers)
+        redis = await self.redis()
+        pipeline = redis.pipeline()
+        pipeline.hmset_dict(
+            self.metadata_key,
+            {
+                'min_x': min_x,
+                'min_y': min_y,
+                'max_x': max_x,
+                'max_y': max_y,
+                'layers': ','.join(str(z) for z in sorted(set(layers)))
+            }
+        )
+        pipeline.hincrby(self.metadata_key, 'version', 1)
+        pipeline.hgetall(self.metadata_key)
+        result = await pipeline.execute()
+        self.metadata = self._decode_metadata(result[2])
+        await self._on_terrains_written(self.metadata.version, [])
+        return self.metadata
+
+    async def load_terrains(self) -> MapMetadata:
+        """
+        Resets the terrains cache at the current map version: the chunks are then loaded on demand.
+        """
+        metadata = await self.load_metadata()
+        self.terrains_cache.reset(metadata.version)
+        return metadata
+
+    async def listen_terrains_versions(self):
+        """
+        Evicts the chunks written by the other workers, reloads the metadata on the metadata writes
+        and on the missed versions. Runs forever, as the pubsub subscriptions do.
+        """
+        cache = self.terrains_cache
+        async for message in cache.pubsub_manager.subscribe(cache.versions_channel):
+            try:
+                version, chunk_ids = int(message['v']), message['c']
+                chunk_ids = chunk_ids and [tuple(chunk_id) for chunk_id in chunk_ids]
+                reload_metadata = not chunk_ids or version > cache.version + 1
+                cache.on_version(version, chunk_ids) and reload_metadata and await self.load_metadata()
+            except Exception:
+                LOGGER.core.exception('Terrains version failed: %s', message)
+
+    async def _get_chunks(self, chunk_ids: typing.Iterable[ChunkId]) -> typing.Dict[ChunkId, TerrainsChunk]:
+        """
+        The chunks from the terrains cache, the missing ones are read with a single round trip,
+        or from the mapped snapshot while the map is at its version.
+        """
+        cache = self.terrains_cache
+        chunk_ids = set(chunk_ids)
+        response = cache.get_chunks(chunk_ids)
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in response]
+        if missing and self._snapshot_is_current():
+            response.update(
+                cache.set_chunks(
+                    {chunk_id: self.snapshot.get_chunk(*chunk_id, chunk_size=self.chunk_size) for chunk_id in missing},
+                    cache.version
+                )
+            )
+        elif missing:
+            version = cache.version
+            redis = await self.redis()
+            pipeline = redis.pipeline()
+            for chunk_id in missing:
+                pipeline.get(self.get_chunk_key(*chunk_id))
+            response.update(cache.set_chunks(dict(zip(missing, await pipeline.execute())), version))
+        return response
+
+    def _snapshot_is_current(self) -> bool:
+        """
+        The mapped snapshot is the one restored, and the map was not written after the restore.
+        """
+        snapshot, metadata = self.snapshot, self.metadata
+        return bool(snapshot) and metadata.snapshot == snapshot.snapshot_id and \
+            metadata.snapshot_version == self.terrains_cache.version and (
+                snapshot.min_x, snapshot.min_y, snapshot.max_x, snapshot.max_y
+            ) == (self.min_x, self.min_y, self.max_x, self.max_y)
+
+    async def _prepare_terrains(
+            self, pipeline, segments: typing.Iterable[typing.Tuple[ChunkId, int, int]]
+    ) -> typing.Optional[typing.Dict[ChunkId, TerrainsChunk]]:
+        """
+        With a terrains cache returns the segments chunks, else enqueues the segments reads into the pipeline.
+        """
+        if self.terrains_cache:
+            return await self._get_chunks(segment[0] for segment in segments)
+        for chunk_id, offset, length in segments:
+            pipeline.getrange(self.get_chunk_key(*chunk_id), offset, offset + length - 1)
+        return None
 
     @staticmethod
-    def _pack_coords(x: int, y: int, z: int) -> bytes:
-        return struct.pack('>hhh', x, y, z)
+    def _read_terrains(
+            segments: typing.List[typing.Tuple[ChunkId, int, int]],
+            chunks: typing.Optional[typing.Dict[ChunkId, TerrainsChunk]],
+            result: typing.List,
+            pos: int
+    ) -> typing.Tuple[bytes, int]:
+        """
+        The segments terrains zero filled, from the chunks or from the pipeline result at pos, and the next pos.
+        """
+        if chunks is not None:
+            return b''.join(chunks[chunk_id].get_terrains(offset, length) for chunk_id, offset, length in segments), pos
+        return b''.join(
+            result[pos + i].ljust(segment[2], b'\x00') for i, segment in enumerate(segments)
+        ), pos + len(segments)
+
+    async def _on_terrains_written(self, version: int, written: typing.List[typing.Tuple[ChunkId, int, int]]):
+        """
+        written: the (chunk, offset, terrain) of the rooms written with version.
+        """
+        self.metadata = self.metadata._replace(version=version)
+        cache = self.terrains_cache
+        if not cache:
+            return
+        if cache.version == version - 1:
+            for chunk_id, offset, terrain in written:
+                cache.set_terrain(chunk_id, offset, terrain)
+            cache.version = version
+        else:
+            cache.reset(version)
+        await cache.publish_version(version, {w[0] for w in written})
+
+    def enqueue_terrains_row(self, pipeline, x: int, y: int, z: int, terrains: bytes) -> int:
+        """
+        Bulk writes: enqueues the terrains of the rooms from (x, y) eastward, a SETRANGE per chunk crossed,
+        the blank rooms (zero terrains) at the chunks edges are skipped. Returns the commands enqueued.
+        The caches are not updated: announce the writes with terrains_bulk_written once done.
+        """
+        commands = 0
+        pos = 0
+        for chunk_id, offset, length in self._row_segments(y, x, x + len(terrains), z):
+            span = terrains[pos:pos + length].rstrip(b'\x00')
+            pos += length
+            stripped = span.lstrip(b'\x00')
+            if stripped:
+                pipeline.setrange(self.get_chunk_key(*chunk_id), offset + len(span) - len(stripped), stripped)
+                commands += 1
+        return commands
+
+    async def terrains_bulk_written(self) -> int:
+        """
+        Bumps the map version after the bulk writes: the terrains caches are emptied.
+        """
+        redis = await self.redis()
+        version = await redis.hincrby(self.metadata_key, 'version', 1)
+        self.metadata = self.metadata._replace(version=version)
+        if self.terrains_cache:
+            self.terrains_cache.on_version(version, None)
+            await self.terrains_cache.publish_version(version, None)
+        return version
+
+    def _check_position(self, x: int, y: int, z: int):
+        if (self.min_y > y) or (self.max_y < y):
+            raise exceptions.RoomError
+        if (self.min_x > x) or (self.max_x < x):
+            raise exceptions.RoomError
+        if z not in self.metadata.layers:
+            raise exceptions.RoomError
 
     def _get_room_content(self, pipeline, x: int, y: int, z: int):
         pipeline.zrange(self.get_room_key(x, y, z))
 
+    def _enqueue_rectangle(self, pipeline, min_x: int, min_y: int, max_x: int, max_y: int, z: int):
+        for start, end in morton.ranges(min_x, min_y, max_x, max_y):
+            pipeline.zrangebyscore(self.get_morton_key(z), start, end, withscores=True)
+
+    @staticmethod
+    def _resolve_rectangle(
+            results, min_x: int, min_y: int, max_x: int, max_y: int
+    ) -> typing.Dict[typing.Tuple[int, int], typing.List[int]]:
+        response = {}
+        for result in results:
+            for entity_id, code in result:
+                x, y = morton.decode(int(code))
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    response.setdefault((x, y), []).append(int(entity_id))
+        return response
+
+    async def get_entity_ids_in_rectangle(
+            self, min_x: int, min_y: int, max_x: int, max_y: int, z: int
+    ) -> typing.Dict[typing.Tuple[int, int], typing.List[int]]:
+        """
+        The entities by room (x, y), from the Morton index. A single round trip.
+        """
+        assert self.morton_index
+        redis = await self.redis()
+        pipeline = redis.pipeline()
+        self._enqueue_rectangle(pipeline, min_x, min_y, max_x, max_y, z)
+        return self._resolve_rectangle(await pipeline.execute(), min_x, min_y, max_x, max_y)
+
+    def _contents_rectangle(self, positions: typing.Sequence[PositionComponent]) -> typing.Optional[typing.Tuple]:
+        """
+        The rectangle (min_x, min_y, max_x, max_y, z) to read the positions contents with, from the Morton index.
+        None if the positions are not on a single layer and close enough: they are read room by room.
+        """
+        if not self.morton_index or not positions or len({p.z for p in positions}) > 1:
+            return None
+        xs, ys = [p.x for p in positions], [p.y for p in positions]
+        if (max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1) > 4 * len(positions):
+            return None
+        return min(xs), min(ys), max(xs), max(ys), positions[0].z
+
     async def get_room_content(self, position):
         redis = await self.redis()
         return [int(x.decode()) for x in await redis.zrange(self.get_room_key(position.x, position.y, position.z))]
 
     async def set_room(self, room: Room):
-        return await self._set_room(room)
+        return (await self.set_rooms(room))[0]
 
-    async def _set_room(self, room: Room, external_pipeline=None):
+    def _set_room(self, pipeline, room: Room) -> typing.Tuple[ChunkId, int, int]:
+        self._check_position(room.position.x, room.position.y, room.position.z)
+        chunk_id, offset = self.get_chunk_position(room.position.x, room.position.y, room.position.z)
+        pipeline.setrange(self.get_chunk_key(*chunk_id), offset, struct.pack('B', room.terrain.value))
+        return chunk_id, offset, room.terrain.value
+
+    async def is_walkable(self, position: PositionComponent) -> bool:
+        """
+        False out of the map. No I/O with the room chunk cached.
+        """
         redis = await self.redis()
-        pipeline = external_pipeline or redis.pipeline()
-        if room.position.z:
-            pipeline.hset(
-                self.z_valued_rooms_data_key,
-                '{}.{}.{}'.format(room.position.x, room.position.y, room.position.z),
-                '{}'.format(room.terrain.value)
-            )
-        else:
-            num = self._coords_to_int(room.position.x, room.position.y)
-            pipeline.setrange(
-                self.terrains_bitmap_key, num, struct.pack('B', room.terrain.value)
-            )
-        not external_pipeline and await pipeline.execute()
-        return room
+        try:
+            self._check_position(position.x, position.y, position.z)
+        except exceptions.RoomError:
+            return False
+        chunk_id, offset = self.get_chunk_position(position.x, position.y, position.z)
+        if self.terrains_cache:
+            return (await self._get_chunks([chunk_id]))[chunk_id].is_walkable(offset)
+        terrain = await redis.getrange(self.get_chunk_key(*chunk_id), offset, offset)
+        return bool(terrain) and is_terrain_walkable(terrain[0])
 
     async def get_room(self, position: PositionComponent, populate=True) -> typing.Optional[Room]:
-        if (self.min_y > position.y) or (self.max_y < position.y):
-            raise exceptions.RoomError
-        if (self.min_x > position.x) or (self.max_x < position.x):
-            raise exceptions.RoomError
-
         redis = await self.redis()
+        self._check_position(position.x, position.y, position.z)
+        chunk_id, offset = self.get_chunk_position(position.x, position.y, position.z)
         pipeline = redis.pipeline()
-        if position.z:
-            pipeline.hget(
-                self.z_valued_rooms_data_key,
-                '{}.{}.{}'.format(position.x, position.y, position.z),
-            )
+        if self.terrains_cache:
+            terrain = (await self._get_chunks([chunk_id]))[chunk_id].get_terrain(offset)
         else:
-            k = self._coords_to_int(position.x, position.y)
-            pipeline.getrange(self.terrains_bitmap_key, k, k)
+            pipeline.getrange(self.get_chunk_key(*chunk_id), offset, offset)
         populate and self._get_room_content(pipeline, position.x, position.y, position.z)
-        result = await pipeline.execute()
-        if not result or not result[0]:
-            LOGGER.core.error('Room Error. Request: %s, Result: %s', position, result)
+        result = (populate or not self.terrains_cache) and await pipeline.execute() or []
+        if not self.terrains_cache:
+            terrain, result = int(struct.unpack('B', result[0])[0]) if result[0] else None, result[1:]
+        if terrain is None:
+            LOGGER.core.error('Room Error. Request: %s, Terrain not found', position)
             raise exceptions.RoomError
-        if position.z:
-            terrain = int(result[0])
-        else:
-            terrain = int(struct.unpack('B', result[0])[0])
-        content = populate and [int(x) for x in result[1]] or []
+        content = populate and [int(x) for x in result[0]] or []
 
         return Room(
             position=position,
@@ -117,37 +427,36 @@ class RedisMapRepository:
         )
 
     async def set_rooms(self, *rooms: Room):
+        """
+        Bumps the map version: the terrains caches are updated.
+        """
         redis = await self.redis()
         pipeline = redis.pipeline()
-        response = await asyncio.gather(*(self._set_room(room, external_pipeline=pipeline) for room in rooms))
-        await pipeline.execute()
-        return response
+        written = [self._set_room(pipeline, room) for room in rooms]
+        pipeline.hincrby(self.metadata_key, 'version', 1)
+        result = await pipeline.execute()
+        await self._on_terrains_written(result[-1], written)
+        return list(rooms)
 
     async def get_rooms(self, *positions: PositionComponent, get_content=True):
         redis = await self.redis()
+        rectangle = get_content and self._contents_rectangle(positions)
+        rooms_content = get_content and not rectangle
         pipeline = redis.pipeline()
         for position in positions:
-            if position.z:
-                pipeline.hget(
-                    self.z_valued_rooms_data_key,
-                    '{}.{}.{}'.format(position.x, position.y, position.z)
-                )
-            else:
-                k = self._coords_to_int(position.x, position.y)
-                pipeline.getrange(self.terrains_bitmap_key, k, k)
-            get_content and self._get_room_content(
+            self._check_position(position.x, position.y, position.z)
+        segments = [(*self.get_chunk_position(p.x, p.y, p.z), 1) for p in positions]
+        chunks = await self._prepare_terrains(pipeline, segments)
+        for position in positions:
+            rooms_content and self._get_room_content(
                 pipeline, position.x, position.y, position.z
             )
-        result = await pipeline.execute()
-        i = 0
+        rectangle and self._enqueue_rectangle(pipeline, *rectangle)
+        result = (get_content or chunks is None) and await pipeline.execute() or []
+        terrains, i = self._read_terrains(segments, chunks, result, 0)
         response = []
-        for position in positions:
-            if position.z:
-                terrain = int(result[i])
-            else:
-                terrain = int(struct.unpack('B', result[i])[0])
-            i += 1
-            if get_content:
+        for d, position in enumerate(positions):
+            if rooms_content:
                 content = [int(x) for x in result[i]]
                 i += 1
             else:
@@ -155,50 +464,130 @@ class RedisMapRepository:
             response.append(
                 Room(
                     position=position,
-                    terrain=TerrainEnum(terrain),
+                    terrain=TerrainEnum(terrains[d]),
                     entity_ids=content
                 )
             )
+        if rectangle:
+            contents = self._resolve_rectangle(result[i:], *rectangle[:4])
+            for room in response:
+                room.add_entity_ids(*contents.get((room.position.x, room.position.y), []))
         return response
 
     async def get_rooms_on_y(self, y: int, from_x: int, to_x: int, z: int, get_content=True):
         assert to_x > from_x
         redis = await self.redis()
+        self._check_position(from_x, y, z)
+        self._check_position(to_x - 1, y, z)
         pipeline = redis.pipeline()
-        if z:
-            packed_coordinates = (self._pack_coords(x, y, z) for x in range(from_x, to_x))
-            pipeline.hmget(self.z_valued_rooms_data_key, *packed_coordinates)
-        else:
-            k = self._coords_to_int(from_x, y)
-            pipeline.getrange(self.terrains_bitmap_key, k, k + ((to_x - from_x) - 1))
+        segments = self._row_segments(y, from_x, to_x, z)
+        chunks = await self._prepare_terrains(pipeline, segments)
         get_content and [self._get_room_content(pipeline, x, y, z) for x in range(from_x, to_x)]
+        result = (get_content or chunks is None) and await pipeline.execute() or []
+        terrains, pos = self._read_terrains(segments, chunks, result, 0)
+        contents = result[pos:]
         response = []
-        i = 0
-        result = await pipeline.execute()
-        if z:
-            res = result[0]
-            d = 0
-            for key, value in res[0].items():
-                terrain = int(value)
-                response.append(
-                    Room(
-                        position=PositionComponent().set_list_coordinates([from_x + d, y, z]),
-                        terrain=TerrainEnum(terrain),
-                    )
+        for d in range(0, to_x - from_x):
+            response.append(
+                Room(
+                    position=PositionComponent().set_list_coordinates([from_x + d, y, z]),
+                    terrain=TerrainEnum(terrains[d]),
+                    entity_ids=get_content and [int(x) for x in contents[d]] or []
                 )
-                d += 1
-            for res in result[i+1]:
-                response[i].add_entity_ids(list(res))
-        else:
-            terrains = struct.unpack('B' * (to_x - from_x), result[0])
-            for d in range(0, to_x - from_x):
+            )
+        return response
+
+    async def get_window_terrains(
+            self, center: PositionComponent, width: int, height: int, z: int = None, get_content=True
+    ) -> typing.Tuple[bytes, typing.Dict[int, typing.List[int]]]:
+        """
+        The terrains of the width x height rectangle centered on center, one byte per room,
+        row major from the top left room, zero filled out of the map,
+        and the content of the not empty rooms, by room index.
+        A single round trip, plus one to load the missing chunks into the terrains cache.
+        """
+        z = center.z if z is None else z
+        redis = await self.redis()
+        from_x, top_y = center.x - width // 2, center.y + height // 2
+        min_x, max_x = max(from_x, self.min_x), min(from_x + width - 1, self.max_x)
+        min_y, max_y = max(top_y - height + 1, self.min_y), min(top_y, self.max_y)
+        if z not in self.metadata.layers or min_x > max_x or min_y > max_y:
+            return bytes(width * height), {}
+        row_size = max_x - min_x + 1
+        rooms_content = get_content and not self.morton_index
+        rows_segments = [self._row_segments(y, min_x, max_x + 1, z) for y in range(max_y, min_y - 1, -1)]
+        pipeline = redis.pipeline()
+        chunks = await self._prepare_terrains(pipeline, sum(rows_segments, []))
+        for y in range(max_y, min_y - 1, -1):
+            rooms_content and [self._get_room_content(pipeline, x, y, z) for x in range(min_x, max_x + 1)]
+        get_content and self.morton_index and self._enqueue_rectangle(pipeline, min_x, min_y, max_x, max_y, z)
+        result = (get_content or chunks is None) and await pipeline.execute() or []
+        left_padding, right_padding = bytes(min_x - from_x), bytes(from_x + width - 1 - max_x)
+        rows = [bytes(width * (top_y - max_y))]
+        pos = 0
+        for segments in rows_segments:
+            terrains, pos = self._read_terrains(segments, chunks, result, pos)
+            rows.append(left_padding + terrains + right_padding)
+        rows.append(bytes(width * (min_y - top_y + height - 1)))
+        contents = {}
+        if rooms_content:
+            for y in range(max_y, min_y - 1, -1):
+                index = (top_y - y) * width + min_x - from_x
+                for d, content in enumerate(result[pos:pos + row_size]):
+                    if content:
+                        contents[index + d] = [int(x) for x in content]
+                pos += row_size
+        elif get_content:
+            rectangle = self._resolve_rectangle(result[pos:], min_x, min_y, max_x, max_y)
+            contents = {
+                (top_y - y) * width + x - from_x: entity_ids for (x, y), entity_ids in sorted(
+                    rectangle.items(), key=lambda item: (-item[0][1], item[0][0])
+                )
+            }
+        return b''.join(rows), contents
+
+    async def get_walkable_grid(self, min_x: int, min_y: int, max_x: int, max_y: int, z: int) -> bytes:
+        """
+        The walkable mask of the rectangle, one byte per room, row major from (min_x, min_y), zero out of the map.
+        A single round trip, none at all with the chunks cached.
+        """
+        assert max_x >= min_x and max_y >= min_y
+        redis = await self.redis()
+        if z not in self.metadata.layers:
+            return bytes((max_x - min_x + 1) * (max_y - min_y + 1))
+        rows_segments = [self._row_segments(y, min_x, max_x + 1, z) for y in range(min_y, max_y + 1)]
+        pipeline = redis.pipeline()
+        chunks = await self._prepare_terrains(pipeline, itertools.chain.from_iterable(rows_segments))
+        result = chunks is None and await pipeline.execute() or []
+        rows, pos = [], 0
+        for segments in rows_segments:
+            terrains, pos = self._read_terrains(segments, chunks, result, pos)
+            rows.append(terrains)
+        return b''.join(rows).translate(WALKABLE_TERRAINS)
+
+    async def get_window(
+            self, center: PositionComponent, width: int, height: int, z: int = None, get_content=True
+    ) -> typing.List[typing.Optional[Room]]:
+        """
+        The rooms of the width x height rectangle centered on center, row major from the top left room,
+        None out of the map.
+        """
+        z = center.z if z is None else z
+        terrains, contents = await self.get_window_terrains(center, width, height, z, get_content=get_content)
+        from_x, top_y = center.x - width // 2, center.y + height // 2
+        response = []
+        for i, terrain in enumerate(terrains):
+            x, y = from_x + i % width, top_y - i // width
+            if self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y and z in self.metadata.layers:
                 response.append(
                     Room(
-                        position=PositionComponent().set_list_coordinates([from_x + d, y, z]),
-                        terrain=TerrainEnum(terrains[d]),
-                        entity_ids=get_content and [int(x) for x in result[d+1]] or []
+                        position=PositionComponent().set_list_coordinates([x, y, z]),
+                        terrain=TerrainEnum(terrain),
+                        entity_ids=contents.get(i, [])
                     )
                 )
+            else:
+                response.append(None)
         return response
 
     async def remove_entity_from_map(self, entity_id: int, position: PositionComponent, pipeline=None):
@@ -209,6 +598,10 @@ class RedisMapRepository:
             p = pipeline
         p.zrem(self.get_room_key(position.x, position.y, position.z), '{}'.format(entity_id))
         p.hdel('positions', entity_id)
+        if self.morton_index:
+            p.zrem(self.get_morton_key(position.z), entity_id)
+        else:
+            p.hdel(self.get_bucket_key(position.x, position.y, position.z), entity_id)
         if not pipeline:
             res = await p.execute()
             return bool(res[1])
@@ -221,20 +614,122 @@ class RedisMapRepository:
                 position.previous_position.z
             )
             pipeline.zrem(prev_set_name, entity.entity_id)
+            if self.morton_index:
+                (not position.coord or position.previous_position.z != position.z) and \
+                    pipeline.zrem(self.get_morton_key(position.previous_position.z), entity.entity_id)
+            else:
+                pipeline.hdel(
+                    self.get_bucket_key(
+                        position.previous_position.x,
+                        position.previous_position.y,
+                        position.previous_position.z
+                    ),
+                    entity.entity_id
+                )
         if position.coord:
             new_set_name = self.get_room_key(position.x, position.y, position.z)
             pipeline.zadd(new_set_name, int(time.time()*100000), entity.entity_id)
+            if self.morton_index:
+                pipeline.zadd(self.get_morton_key(position.z), morton.encode(position.x, position.y), entity.entity_id)
+            else:
+                pipeline.hset(
+                    self.get_bucket_key(position.x, position.y, position.z),
+                    entity.entity_id,
+                    '{},{}'.format(position.x, position.y)
+                )
 
-    async def get_all_entity_ids_in_area(self, area):
+    @property
+    def positions_index(self) -> str:
+        return 'morton' if self.morton_index else 'buckets'
+
+    def _parse_room_key(self, key: bytes) -> typing.Optional[typing.Tuple[int, int, int]]:
+        coordinates = key.decode()[len(self.prefix) + 1:-len(self.room_content_suffix) - 1].split('.')
+        try:
+            coordinates = [int(c) for c in coordinates]
+        except ValueError:
+            return None
+        if len(coordinates) == 2:
+            coordinates.append(0)
+        return len(coordinates) == 3 and tuple(coordinates) or None
+
+    async def rebuild_positions_index(self, batch_size=1000) -> int:
+        """
+        Drops both the spatial indexes, and builds the one in use from the rooms contents, batch_size rooms
+        per round trip. Returns the number of indexed entities.
+        """
+        redis = await self.redis()
+        stale = []
+        for pattern in (self.buckets_key.format('*'), self.morton_key.format('*')):
+            async for key in redis.iscan(match=pattern, count=batch_size):
+                stale.append(key)
+        for i in range(0, len(stale), batch_size):
+            await redis.delete(*stale[i:i + batch_size])
+        indexed = 0
+
+        async def index(rooms):
+            nonlocal indexed
+            pipeline = redis.pipeline()
+            for _, key in rooms:
+                pipeline.zrange(key)
+            write = redis.pipeline()
+            for (position, _), entity_ids in zip(rooms, await pipeline.execute()):
+                x, y, z = position
+                for entity_id in entity_ids:
+                    if self.morton_index:
+                        write.zadd(self.get_morton_key(z), morton.encode(x, y), entity_id)
+                    else:
+                        write.hset(self.get_bucket_key(x, y, z), entity_id, '{},{}'.format(x, y))
+                    indexed += 1
+            await write.execute()
+
+        rooms = []
+        async for key in redis.iscan(match=self.room_content_key.format('*'), count=batch_size):
+            position = self._parse_room_key(key)
+            position and rooms.append((position, key))
+            if len(rooms) >= batch_size:
+                await index(rooms)
+                rooms = []
+        rooms and await index(rooms)
+        await redis.set(self.positions_index_key, self.positions_index)
+        LOGGER.core.info('Positions index %s rebuilt, %s entities', self.positions_index, indexed)
+        return indexed
+
+    async def check_positions_index(self) -> bool:
+        """
+        Rebuilds the spatial index if it is not the one built last: the map_morton_index flag changed,
+        or the map was populated before the index existed. Returns True if rebuilt.
+        """
+        redis = await self.redis()
+        built = await redis.get(self.positions_index_key)
+        if built and built.decode() == self.positions_index:
+            return False
+        await self.rebuild_positions_index()
+        return True
+
+    async def get_all_entity_ids_in_area(self, area) -> typing.List[int]:
+        """
+        The entities in the area rooms and peripherals: the overlapping spatial buckets
+        (or the Morton index ranges) are read in a single round trip, and the entities are filtered by position.
+        """
+        coordinates = area.make_coordinates().rooms_and_peripherals_coordinates
+        if not coordinates:
+            return []
+        z = area.center.z
+        xs, ys = [c[0] for c in coordinates], [c[1] for c in coordinates]
+        if self.morton_index:
+            rooms = await self.get_entity_ids_in_rectangle(min(xs), min(ys), max(xs), max(ys), z)
+            return [
+                entity_id for (x, y), entity_ids in rooms.items() if (x, y, z) in coordinates
+                for entity_id in entity_ids
+            ]
         redis = await self.redis()
         pipeline = redis.pipeline()
-        key = binascii.hexlify(os.urandom(8)).decode()
-        pipeline.zunionstore(
-            'temp:{}'.format(key), *(
-                self.get_room_key(r[0], r[1], r[2]) for r in area.make_coordinates().rooms_and_peripherals_coordinates
-            )
-        )
-        pipeline.zrange('temp:{}'.format(key), 0, -1)
-        pipeline.delete('temp:{}'.format(key))
-        result = await pipeline.execute()
-        return result[1]
+        for bucket_x in range(min(xs) // self.bucket_size, max(xs) // self.bucket_size + 1):
+            for bucket_y in range(min(ys) // self.bucket_size, max(ys) // self.bucket_size + 1):
+                pipeline.hgetall(self.buckets_key.format('{}.{}.{}'.format(bucket_x, bucket_y, z)))
+        response = []
+        for bucket in await pipeline.execute():
+            for entity_id, position in bucket.items():
+                x, y = position.split(b',')
+                (int(x), int(y), z) in coordinates and response.append(int(entity_id))
+        return response
@@ -0,0 +1,157 @@
+import typing
+
+import msgpack
+
+from core.src.world.components.base.structcomponent import StructSubtypeListAction, StructSubtypeIntIncrAction, \
+    StructSubtypeIntSetAction, StructSubtypeStrSetAction, StructSubTypeSetNull, StructSubTypeBoolOn, \
+    StructSubTypeBoolOff, StructSubTypeDictSetKeyValueAction, StructSubTypeDictRemoveKeyValueAction, \
+    StructComponent, load_value_in_struct_component
+from core.src.world.components.system import SystemComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.read_plans import ComponentsReadPlan
+from core.src.world.repositories.redis_lua_pipeline import RedisLUAPipeline
+
+
+def _dict_value(value):
+    return str(int(value) if isinstance(value, bool) else value)
+
+
+def pack_action(field: str, action) -> typing.Tuple:
+    """
+    Turns a struct component action into a packed component opcode, see PIPELINE_SCRIPT.
+    Dict values are stored as strings, as the spread storage does.
+    """
+    if isinstance(action, (StructSubtypeIntSetAction, StructSubtypeStrSetAction)):
+        return field, 's', action.value
+    elif isinstance(action, StructSubtypeIntIncrAction):
+        return field, 'i', action.value
+    elif isinstance(action, StructSubTypeBoolOn):
+        return field, 's', True
+    elif isinstance(action, StructSubTypeBoolOff):
+        return field, 's', False
+    elif isinstance(action, StructSubTypeSetNull):
+        return field, 'n', None
+    elif isinstance(action, StructSubtypeListAction):
+        opcode = {'append': 'a', 'remove': 'r', 'overwrite': 'o'}.get(action.type)
+        if not opcode:
+            raise ValueError('Invalid action type')
+        return field, opcode, list(action.values)
+    elif isinstance(action, StructSubTypeDictSetKeyValueAction):
+        return field, 'ds', [action.key, _dict_value(action.value)]
+    elif isinstance(action, StructSubTypeDictRemoveKeyValueAction):
+        return field, 'dr', action.key
+    raise ValueError('Invalid action type %s' % str(action))
+
+
+def pack_values(component: typing.Type[StructComponent], values: typing.Dict) -> typing.Optional[bytes]:
+    """
+    Pack the values of a component, skipping the empty ones. None if all the values are empty.
+    """
+    packed = {}
+    for field, subtype in component.meta:
+        value = values.get(field)
+        if value is None or (subtype in (list, dict) and not value):
+            continue
+        packed[field] = {k: _dict_value(v) for k, v in value.items()} if subtype is dict else value
+    return packed and msgpack.packb(packed, use_bin_type=True) or None
+
+
+def unpack_values(blob: typing.Optional[bytes]) -> typing.Dict:
+    # LUA packs empty tables as arrays.
+    return blob and msgpack.unpackb(blob, raw=False) or {}
+
+
+class PackedRedisDataRepository(RedisDataRepository):
+    """
+    Alternative storage engine: each component of an entity is a msgpack map, stored in the entity hash
+    e:{entity_id}:p by component key, so reading all the components of an entity touches a single key.
+
+    The updates are applied by the LUA pipeline, server side, to the packed components.
+    Components bitmaps and the indexes declared into the components `indexes` are maintained as by the
+    default storage, so the queries on them are the same.
+    """
+    packed_key_template = 'e:{}:p'
+
+    def _packed_key(self, entity_id: int) -> str:
+        return self.packed_key_template.format(entity_id)
+
+    def _check_bounds_for_update(self, pipeline: RedisLUAPipeline, entity: Entity):
+        for bound in entity.bounds():
+            assert bound.is_struct
+            assert bound.bounds
+            for k, bb in bound.bounds.items():
+                for b in bb:
+                    if isinstance(b, StructSubtypeListAction):
+                        assert b.type == 'remove'
+                        pipeline.packed_contains(self._packed_key(entity.entity_id), bound.key, k, *b.values)
+                    else:
+                        raise ValueError('Unknown bound')
+                bound.remove_bounds()
+
+    def _mantain_valued_index(self, pipeline: RedisLUAPipeline, component, key: str, value: str, entity_id: int):
+        pipeline.mantain_packed_valued_index(self._packed_key(entity_id), component, key, value, entity_id)
+
+    def _update_struct_component(self, pipeline, entity, component, changes: typing.Dict):
+        actions = []
+        for k, v in changes.items():
+            component.has_index(k) and self._handle_index_for_struct_component(pipeline, component, k, v, entity)
+            actions.extend(pack_action(k, action) for action in v)
+        actions and pipeline.packed_update(
+            self._packed_key(entity.entity_id), component.key, msgpack.packb(actions, use_bin_type=True)
+        )
+
+    def _remove_component_values(self, pipeline: RedisLUAPipeline, entity_id: int, component, values):
+        pipeline.hdel(self._packed_key(entity_id), component.key)
+
+    @staticmethod
+    def _packed_fields(plan: ComponentsReadPlan, read_entity_types: bool) -> typing.List[int]:
+        fields = [component.key for component in plan.components]
+        if read_entity_types and SystemComponent.key not in fields:
+            fields.append(SystemComponent.key)
+        return fields
+
+    def _resolve_packed_components(
+            self,
+            plan: ComponentsReadPlan,
+            fields: typing.List[int],
+            blobs: typing.List,
+            load_default: callable,
+            entity_type: typing.Optional[str]
+    ) -> typing.Tuple[typing.Dict, typing.Optional[str]]:
+        packed = {field: unpack_values(blob) for field, blob in zip(fields, blobs)}
+        if plan.has_defaults and not entity_type:
+            entity_type = packed[SystemComponent.key].get('instance_of')
+        response = {component.enum: component() for component in plan.components}
+        for component, subkey, subtype, has_default, _ in plan.entities_reads:
+            value = packed[component.key].get(subkey)
+            if subtype is list:
+                value = value or []
+            elif subtype is dict:
+                value = value or {}
+            if has_default and not value:
+                value = load_default(component, subkey, value, entity_type)
+            load_value_in_struct_component(response[component.enum], subkey, value)
+        return response, entity_type
+
+    async def _read_plan_for_entity(self, plan: ComponentsReadPlan, entity_id: int, load_default: callable):
+        return (await self._read_plan_for_entities(plan, [entity_id], load_default))[entity_id]
+
+    async def _read_plan_for_entities(self, plan: ComponentsReadPlan, entity_ids: typing.List[int], load_default):
+        entity_types = self._get_entity_types(plan, entity_ids)
+        fields = self._packed_fields(plan, plan.has_defaults and len(entity_types) < len(entity_ids))
+        redis = await self.async_redis()
+        pipeline = redis.pipeline()
+        for entity_id in entity_ids:
+            pipeline.hmget(self._packed_key(entity_id), *fields)
+        response = await pipeline.execute()
+        components = {}
+        for i, entity_id in enumerate(entity_ids):
+            components[entity_id], entity_type = self._resolve_packed_components(
+                plan, fields, response[i], load_default, entity_types.get(entity_id)
+            )
+            entity_type and entity_types.setdefault(entity_id, entity_type)
+        self.entity_types.update(entity_types)
+        return components
+
+    _bulk_read_plan_for_entities = _read_plan_for_entities
@@ -0,0 +1,228 @@
+import inspect
+import typing
+
+from core.src.world.components.base.structcomponent import StructComponent, load_value_in_struct_component
+from core.src.world.components.system import SystemComponent
+
+
+def normalize_components_query(components) -> tuple:
+    """
+    Turns a components query into a hashable key: selective queries may be passed as lists.
+    """
+    return tuple(tuple(c) if isinstance(c, list) else c for c in components)
+
+
+class ComponentsReadPlan:
+    """
+    A components query, i.e. ((SystemComponent, 'connection'), PositionComponent), compiled once
+    into the flat list of reads to enqueue into a pipeline and to resolve from its response.
+
+    The type dispatch (selective vs full queries, subtypes, defaults) is done at compile time,
+    so the per-call cost is the I/O and the values loading.
+    """
+    instance_of_key = 'c:{}:d:{}'.format(SystemComponent.key, 'instance_of')
+
+    def __init__(self, components: tuple):
+        self.query = components
+        self.components: typing.List[typing.Type[StructComponent]] = []
+        self.has_defaults = False
+
+        # Multiple entities: one entry per (component, subkey), in query order.
+        # (component, subkey, subtype, has_default, key or key template)
+        self.entities_reads = []
+
+        # Single entity: collections are read key by key, primitives with one hmget per component.
+        # (component, subkey, subtype, has_default, key template)
+        self.entity_collections_reads = []
+        # (component, subkeys, has_defaults, key template)
+        self.entity_primitives_reads = []
+
+        # Bulk loader script: n_fields, (component_key, subkey, field_type)...
+        self.loader_spec = []
+        self._compile(components)
+
+    def _compile(self, components):
+        primitives = {}
+        for query in components:
+            if isinstance(query, (tuple, list)):
+                component, subkeys = query[0], query[1:]
+                assert subkeys, query
+            elif inspect.isclass(query) and issubclass(query, StructComponent):
+                component, subkeys = query, tuple(meta[0] for meta in query.meta)
+            else:
+                raise ValueError('Unknown type: %s' % str(query))
+            if component not in self.components:
+                self.components.append(component)
+            for subkey in subkeys:
+                subtype = component.get_subtype(subkey)
+                has_default = subkey in component.defaults
+                self.has_defaults = self.has_defaults or has_default
+                if subtype in (str, int, bool):
+                    self.entities_reads.append(
+                        (component, subkey, subtype, has_default, 'c:{}:d:{}'.format(component.key, subkey))
+                    )
+                    primitives.setdefault(component, []).append((subkey, has_default))
+                elif subtype is list:
+                    key_template = 'c:{}:zs:e:{}:{}'.format(component.key, '{}', subkey)
+                    self.entities_reads.append((component, subkey, subtype, has_default, key_template))
+                    self.entity_collections_reads.append((component, subkey, subtype, has_default, key_template))
+                elif subtype is dict:
+                    key_template = 'e:{}:c:{}:{}'.format('{}', component.key, subkey)
+                    self.entities_reads.append((component, subkey, subtype, has_default, key_template))
+                    self.entity_collections_reads.append((component, subkey, subtype, has_default, key_template))
+                else:
+                    raise ValueError('Unknown subtype {}.{}'.format(component, subkey))
+        loader_fields = self.has_defaults and [SystemComponent.key, 'instance_of', 'p'] or []
+        for component, subkey, subtype, _, _ in self.entities_reads:
+            loader_fields.extend([component.key, subkey, {list: 'l', dict: 'd'}.get(subtype, 'p')])
+        self.loader_spec = [len(loader_fields) // 3] + loader_fields
+        for component, values in primitives.items():
+            self.entity_primitives_reads.append(
+                (
+                    component,
+                    [v[0] for v in values],
+                    [v[1] for v in values],
+                    'e:{}:c:{}'.format('{}', component.key)
+                )
+            )
+
+    @staticmethod
+    def _decode_entity_types(entity_ids, redis_result) -> typing.Dict:
+        return {entity_ids[i]: v.decode() for i, v in enumerate(redis_result) if v}
+
+    def _unknown_entity_types(self, entity_ids: typing.List[int], entity_types: typing.Dict) -> typing.List[int]:
+        """
+        The entities whose type must be read to resolve the defaults.
+        The known types must be the same for enqueue and resolve: pass the same dict.
+        """
+        return [entity_id for entity_id in entity_ids if entity_id not in entity_types] if self.has_defaults else []
+
+    def enqueue_for_entity(self, pipeline, entity_id: int, entity_types: typing.Optional[typing.Dict] = None):
+        self._unknown_entity_types([entity_id], entity_types or {}) and \
+            pipeline.hmget(self.instance_of_key, entity_id)
+        for read in self.entity_collections_reads:
+            if read[2] is list:
+                pipeline.zrange(read[4].format(entity_id), 0, -1)
+            else:
+                pipeline.hgetall(read[4].format(entity_id))
+        for read in self.entity_primitives_reads:
+            pipeline.hmget(read[3].format(entity_id), *read[1])
+
+    def resolve_for_entity(
+            self,
+            redis_response,
+            entity_id: int,
+            load_default: callable,
+            entity_types: typing.Optional[typing.Dict] = None
+    ) -> typing.Dict:
+        """
+        The entity types read are added to entity_types.
+        """
+        pos = 0
+        entity_types = {} if entity_types is None else entity_types
+        if self._unknown_entity_types([entity_id], entity_types):
+            entity_types.update(self._decode_entity_types([entity_id], redis_response[0]))
+            pos += 1
+        entity_type = entity_types.get(entity_id)
+        response = {component.enum: component() for component in self.components}
+        for component, subkey, _, has_default, _ in self.entity_collections_reads:
+            value = redis_response[pos]
+            if has_default and not value:
+                value = load_default(component, subkey, value, entity_type)
+            load_value_in_struct_component(response[component.enum], subkey, value)
+            pos += 1
+        for component, subkeys, has_defaults, _ in self.entity_primitives_reads:
+            values = redis_response[pos]
+            instance = response[component.enum]
+            for i, subkey in enumerate(subkeys):
+                value = values[i]
+                if has_defaults[i] and not value:
+                    value = load_default(component, subkey, value, entity_type)
+                load_value_in_struct_component(instance, subkey, value)
+            pos += 1
+        return response
+
+    def enqueue_for_entities(
+            self, pipeline, entity_ids: typing.List[int], entity_types: typing.Optional[typing.Dict] = None
+    ):
+        unknown_types = self._unknown_entity_types(entity_ids, entity_types or {})
+        unknown_types and pipeline.hmget(self.instance_of_key, *unknown_types)
+        for read in self.entities_reads:
+            subtype, key = read[2], read[4]
+            if subtype is list:
+                for entity_id in entity_ids:
+                    pipeline.zrange(key.format(entity_id), 0, -1)
+            elif subtype is dict:
+                for entity_id in entity_ids:
+                    pipeline.hgetall(key.format(entity_id))
+            else:
+                pipeline.hmget(key, *entity_ids)
+
+    def resolve_for_entities(
+            self,
+            redis_response,
+            entity_ids: typing.List[int],
+            load_default: callable,
+            entity_types: typing.Optional[typing.Dict] = None
+    ):
+        pos = 0
+        entity_types = {} if entity_types is None else entity_types
+        unknown_types = self._unknown_entity_types(entity_ids, entity_types)
+        if unknown_types:
+            entity_types.update(self._decode_entity_types(unknown_types, redis_response[0]))
+            pos += 1
+        response = {
+            entity_id: {component.enum: component() for component in self.components} for entity_id in entity_ids
+        }
+        for component, subkey, subtype, has_default, _ in self.entities_reads:
+            if subtype is list or subtype is dict:
+                values = redis_response[pos:pos + len(entity_ids)]
+                pos += len(entity_ids)
+            else:
+                values = redis_response[pos]
+                pos += 1
+            for i, entity_id in enumerate(entity_ids):
+                value = values[i]
+                if has_default and not value:
+                    value = load_default(component, subkey, value, entity_types.get(entity_id))
+                load_value_in_struct_component(response[entity_id][component.enum], subkey, value)
+        return response
+
+    def loader_args(self, entity_ids: typing.List[int]) -> typing.List:
+        return [len(entity_ids)] + list(entity_ids) + self.loader_spec
+
+    def resolve_loader_reply(
+            self,
+            reply,
+            entity_ids: typing.List[int],
+            load_default: callable,
+            entity_types: typing.Optional[typing.Dict] = None
+    ) -> typing.Dict:
+        """
+        The loader always reads the entity types: they are added to entity_types.
+        """
+        response = {}
+        pos = 0
+        entity_types = {} if entity_types is None else entity_types
+        for entity_id in entity_ids:
+            entity_type = None
+            if self.has_defaults:
+                size = reply[pos]
+                entity_type = size and reply[pos + 1].decode() or None
+                entity_type and entity_types.setdefault(entity_id, entity_type)
+                pos += 1 + size
+            components = response[entity_id] = {component.enum: component() for component in self.components}
+            for component, subkey, subtype, has_default, _ in self.entities_reads:
+                size = reply[pos]
+                pos += 1
+                if subtype is list:
+                    value = reply[pos:pos + size]
+                elif subtype is dict:
+                    value = dict(zip(reply[pos:pos + size:2], reply[pos + 1:pos + size:2]))
+                else:
+                    value = size and reply[pos] or None
+                pos += size
+                if has_default and not value:
+                    value = load_default(component, subkey, value, entity_type)
+                load_value_in_struct_component(components[component.enum], subkey, value)
+        return response
@@ -1,103 +1,104 @@
-import binascii
-import os
+from core.src.auth.logging_factory import LOGGER
+from core.src.world.repositories.lua_scripts import PIPELINE_SCRIPT
 
 
 class RedisLUAPipeline:
     """
     A "Value Bounded" pipeline reimplementation of the Redis Pipeline component.
-    It produces a LUA script to use a Pipeline while adding conditions to be verified before the execution.
-    Something like a SELECT FOR UPDATE.
+    Operations are collected as an opcodes stream, and executed with a single preloaded LUA script,
+    after the bounds (conditions) are verified. Something like a SELECT FOR UPDATE.
+
+    Keys and values are passed as KEYS and ARGV, so the script is compiled by Redis only once.
     """
     def __init__(self, redis):
-        self.value = ""
         self.redis = redis
+        self.keys = []
+        self.args = []
 
-    def allocate_value(self, key='value'):
-        self.value += "local {} = ".format(key)
+    def _add(self, opcode, keys, *args):
+        self.keys.extend(keys)
+        self.args.extend((opcode, len(args)))
+        self.args.extend(args)
         return self
 
-    def add_if_equal(self, expected_value, value_name='value', value_selector=""):
-        if isinstance(expected_value, int):
-            expected_value = expected_value
-            self.value += "if {}{} ~= {} then\nreturn 0\nend\n".format(value_name, value_selector, expected_value)
-        elif isinstance(expected_value, str):
-            self.value += "if {}{} ~= '{}' then\nreturn 0\nend\n".format(value_name, value_selector, expected_value)
-        elif isinstance(expected_value, list):
-            lua_table = '{' + ', '.join([str(x) for x in expected_value]) + '}'
-            self.value += "if table.concat({}{}) ~= table.concat({}) then\nreturn 0\nend\n".format(
-                value_selector, value_name, lua_table
-            )
-        return self
+    def zcontains(self, key, *values):
+        """
+        Bound: the script exits, returning 0, if any of the values is not a member of the sorted set.
+        """
+        return self._add('zcontains', (key, ), *values)
 
     def hget(self, key, value):
-        self.value += "redis.call('hget', '{}', '{}')\n".format(key, value)
+        return self._add('hget', (key, ), value)
 
     def setbit(self, key, bit, value):
-        self.value += "redis.call('setbit', '{}', {}, {})\n".format(key, bit, value)
+        return self._add('setbit', (key, ), bit, value)
 
     def zadd(self, key, *payload):
-        ppload = ", ".join(["{}".format(str(p)) for p in payload])
-        self.value += "redis.call('zadd', '{}', {})\n".format(key, ppload)
+        return self._add('zadd', (key, ), *payload)
 
     def remove(self, key):
-        self.value += "redis.call('del', '{}')\n".format(key)
+        return self._add('del', (key, ))
+
+    delete = remove
 
     def zrem(self, key, *payload):
-        ppload = ", ".join(["'{}'".format(str(p)) for p in payload])
-        self.value += "redis.call('zrem', '{}', {})\n".format(key, ppload)
+        return self._add('zrem', (key, ), *payload)
 
     def hset(self, key, subkey, value):
-        self.value += "redis.call('hset', '{}', '{}', '{}')\n".format(key, subkey, value)
+        return self._add('hset', (key, ), subkey, value)
 
     def hincrby(self, key, subkey, value):
-        self.value += "redis.call('hincrby', '{}', '{}', {})\n".format(key, subkey, value)
+        return self._add('hincrby', (key, ), subkey, value)
 
     def hmset_dict(self, key, value):
-        values = ""
+        payload = []
         for k, v in value.items():
-            values += "'{}', '{}',".format(k, v)
-        values = values.rstrip(',')
-        self.value += "redis.call('hmset', '{}', {})\n".format(key, values)
+            payload.extend((k, v))
+        return self._add('hmset', (key, ), *payload)
 
-    def hdel(self, key, *values):
-        value = ', '.join(["'{}'".format(str(v)) for v in values])
-        self.value += "redis.call('hdel', '{}', {})\n".format(key, value)
-
-    def zscan(self, key, cursor=0, match=None):
-        assert all((key, match)), (key, cursor, match)
-        self.value += "redis.call('zscan', '{}', {}, 'match', '{}')\n".format(key, cursor, match)
+    def rpush(self, key, *values):
+        return self._add('rpush', (key, ), *values)
 
-    def zrange(self, key, min_value, max_value):
-        self.value += "redis.call('zrange', '{}', {}, {})\n".format(key, min_value, max_value)
+    def free_entity_id(self, bitmap_key: str, free_ids_key: str, entity_id: int):
+        """
+        Clears the entity bit and pushes its id to the free ids list, only if the bit was set.
+        """
+        return self._add('free', (bitmap_key, free_ids_key), entity_id)
 
-    def zprepareinter(self, key, values_to_inter):
-        seed = binascii.hexlify(os.urandom(8)).decode()
-        values = ', '.join(["0, '{}'".format(value) for value in values_to_inter])
-        self.value += "redis.call('zadd', 'temp:{}:1', {})\n".format(seed, values)
-        self.value += "redis.call('zinterstore', 'temp:{0}:2', 2, '{1}', 'temp:{0}:1')\n".format(seed, key)
-        return seed
+    def hdel(self, key, *values):
+        return self._add('hdel', (key, ), *values)
 
-    def zfetchinter(self, seed):
-        self.value += "redis.call('zrange', 'temp:{}:2', 0, -1)\n".format(seed)
-        self.value += "redis.call('del', 'temp:{0}:2', 'temp:{0}:1')\n".format(seed)
+    def zrange(self, key, min_value, max_value):
+        return self._add('zrange', (key, ), min_value, max_value)
 
     def mantain_valued_index(self, component, key: str, value: (str, int), entity_id: int):
-        c_key = 'c:{}:e:{}'.format(component.key, entity_id)
+        c_key = 'e:{}:c:{}'.format(entity_id, component.key)
         i_key_prefix = 'i:c:{}:{}'.format(component.key, key)
-        self.value += "local mvi_val = redis.call('hget', '{}', '{}')\n".format(c_key, key)
-        self.value += "if mvi_val then redis.call('zrem', '{}:' .. mvi_val, {}) end \n".format(i_key_prefix, entity_id)
-        self.value += "redis.call('zadd', '{}:{}', 0, {})\n".format(i_key_prefix, value, entity_id)
+        return self._add('reindex', (c_key, i_key_prefix), key, value, entity_id)
 
-    def drop_value_from_index(self, index_prefix: str, value: (str, int), entity_id: int):
-        self.value += "redis.call('zdel', '{}:{}', {})\n".format(index_prefix, value, entity_id)
+    def packed_update(self, key, component_key: int, actions: bytes):
+        """
+        Apply the msgpack encoded actions [(field, opcode, value), ...] to the packed component,
+        see PIPELINE_SCRIPT for the opcodes.
+        """
+        return self._add('packed', (key, ), component_key, actions)
 
-    def return_exit(self, value_key=None):
-        self.value += "return {}".format(value_key or 0)
+    def packed_contains(self, key, component_key: int, field: str, *values):
+        """
+        Bound: the script exits, returning 0, if any of the values is not in the packed component list field.
+        """
+        return self._add('pcontains', (key, ), component_key, field, *values)
+
+    def mantain_packed_valued_index(self, key, component, field: str, value: (str, int), entity_id: int):
+        i_key_prefix = 'i:c:{}:{}'.format(component.key, field)
+        return self._add('preindex', (key, i_key_prefix), component.key, field, value, entity_id)
+
+    def drop_value_from_index(self, index_prefix: str, value: (str, int), entity_id: int):
+        return self._add('zrem', ('{}:{}'.format(index_prefix, value), ), entity_id)
 
     async def execute(self, return_value_at_exit=1):
-        self.return_exit(value_key=return_value_at_exit)
         try:
-            return await self.redis.eval(self.value)
+            return await PIPELINE_SCRIPT.execute(self.redis, keys=self.keys, args=[return_value_at_exit] + self.args)
         except:
-            print('Exception with LUA script: %s' % self.value)
+            LOGGER.core.exception('Exception with LUA pipeline. KEYS: %s, ARGV: %s', self.keys, self.args)
             raise
@@ -0,0 +1,129 @@
+import typing
+from collections import OrderedDict
+
+from core.src.world.utils.world_utils import WALKABLE_TERRAINS
+
+
+ChunkId = typing.Tuple[int, int, int]
+
+
+class TerrainsChunk:
+    """
+    The terrains of a chunk, laid out as its Redis string (row major, one byte per room),
+    plus its walkable mask.
+    """
+    __slots__ = ('terrains', 'walkable')
+
+    def __init__(self, terrains: bytes):
+        self.terrains = bytearray(terrains)
+        self.walkable = self.terrains.translate(WALKABLE_TERRAINS)
+
+    def get_terrain(self, offset: int) -> typing.Optional[int]:
+        """
+        None if the room was never written.
+        """
+        return self.terrains[offset] if offset < len(self.terrains) else None
+
+    def get_terrains(self, offset: int, length: int) -> bytes:
+        """
+        Zero filled.
+        """
+        return bytes(self.terrains[offset:offset + length]).ljust(length, b'\x00')
+
+    def is_walkable(self, offset: int) -> bool:
+        return offset < len(self.walkable) and bool(self.walkable[offset])
+
+    def set_terrain(self, offset: int, terrain: int):
+        if offset >= len(self.terrains):
+            self.terrains.extend(bytes(offset + 1 - len(self.terrains)))
+            self.walkable.extend(bytes(offset + 1 - len(self.walkable)))
+        self.terrains[offset] = terrain
+        self.walkable[offset] = WALKABLE_TERRAINS[terrain]
+
+
+class TerrainsCache:
+    """
+    Worker local LRU of the terrains chunks, keyed by (z, cx, cy), loaded on demand by RedisMapRepository:
+    the worker memory is bounded by max_chunks, whatever the map size.
+
+    Each terrains write bumps the map version and announces it on the versions channel, with the chunks written:
+    the writer applies its own changes, the other workers evict the written chunks, or all of them if they
+    missed a version. Chunks read while the version changes are not cached.
+    """
+    versions_channel = 'm:v'
+
+    def __init__(self, max_chunks: int = 4096, pubsub_manager=None):
+        assert max_chunks > 0
+        self.max_chunks = max_chunks
+        self.pubsub_manager = pubsub_manager
+        self.version = 0
+        self._chunks: typing.Dict[ChunkId, TerrainsChunk] = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, chunk_id: ChunkId):
+        return chunk_id in self._chunks
+
+    def reset(self, version: int):
+        self._chunks.clear()
+        self.version = version
+
+    def get_chunks(self, chunk_ids: typing.Iterable[ChunkId]) -> typing.Dict[ChunkId, TerrainsChunk]:
+        """
+        The cached chunks among chunk_ids, marked as recently used.
+        """
+        response = {}
+        for chunk_id in chunk_ids:
+            chunk = self._chunks.get(chunk_id)
+            if chunk is not None:
+                self._chunks.move_to_end(chunk_id)
+                response[chunk_id] = chunk
+        return response
+
+    def set_chunks(
+            self, chunks: typing.Dict[ChunkId, typing.Optional[bytes]], version: int
+    ) -> typing.Dict[ChunkId, TerrainsChunk]:
+        """
+        chunks were read from Redis while the cache was at version: they are cached only if it still is.
+        """
+        response = {chunk_id: TerrainsChunk(data or b'') for chunk_id, data in chunks.items()}
+        self.loads += len(response)
+        if version != self.version:
+            return response
+        self._chunks.update(response)
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+            self.evictions += 1
+        return response
+
+    def set_terrain(self, chunk_id: ChunkId, offset: int, terrain: int):
+        """
+        Writes through the cached chunk, if any.
+        """
+        chunk = self._chunks.get(chunk_id)
+        chunk is not None and chunk.set_terrain(offset, terrain)
+
+    def on_version(self, version: int, chunk_ids: typing.Optional[typing.Iterable[ChunkId]]) -> bool:
+        """
+        Applies a terrains write announce, returns False if it was already known.
+        chunk_ids is None for the bulk writes: all the chunks are evicted.
+        """
+        if version <= self.version:
+            return False
+        if version == self.version + 1 and chunk_ids is not None:
+            for chunk_id in chunk_ids:
+                self._chunks.pop(chunk_id, None)
+        else:
+            self._chunks.clear()
+        self.version = version
+        return True
+
+    async def publish_version(self, version: int, chunk_ids: typing.Optional[typing.Iterable[ChunkId]] = ()):
+        self.pubsub_manager and await self.pubsub_manager.publish(
+            self.versions_channel,
+            {'v': version, 'c': None if chunk_ids is None else [list(chunk_id) for chunk_id in chunk_ids]}
+        )
@@ -0,0 +1,155 @@
+import typing
+from collections import OrderedDict
+
+from core.src.world.components.base import ComponentTypeEnum
+from core.src.world.components.base.structcomponent import StructSubtypeListAction, StructSubtypeIntIncrAction, \
+    StructSubtypeIntSetAction, StructSubTypeSetNull, StructComponent
+from core.src.world.domain.entity import Entity
+
+
+def _coalesce_int_actions(actions: typing.List) -> typing.List:
+    result = None
+    for action in actions:
+        if not isinstance(action, StructSubtypeIntIncrAction) or result is None:
+            result = action
+        elif isinstance(result, StructSubtypeIntIncrAction):
+            result = StructSubtypeIntIncrAction(result.value + action.value)
+        elif isinstance(result, StructSubtypeIntSetAction):
+            result = StructSubtypeIntSetAction(result.value + action.value)
+        else:
+            # HINCRBY on a deleted field starts from 0
+            result = StructSubtypeIntSetAction(action.value)
+    return [result]
+
+
+def _coalesce_dict_actions(actions: typing.List) -> typing.List:
+    last_action_by_key = OrderedDict()
+    for action in actions:
+        last_action_by_key.pop(action.key, None)
+        last_action_by_key[action.key] = action
+    return list(last_action_by_key.values())
+
+
+def _coalesce_list_actions(actions: typing.List) -> typing.List:
+    overwrite = None
+    appended, removed = OrderedDict(), OrderedDict()
+    for action in actions:
+        if isinstance(action, StructSubTypeSetNull):
+            overwrite = []
+        elif action.type == 'overwrite':
+            overwrite = list(action.values)
+        elif action.type == 'append':
+            if overwrite is not None:
+                overwrite.extend(v for v in action.values if v not in overwrite)
+            else:
+                for v in action.values:
+                    removed.pop(v, None)
+                    appended[v] = True
+        elif action.type == 'remove':
+            if overwrite is not None:
+                overwrite = [v for v in overwrite if v not in action.values]
+            else:
+                for v in action.values:
+                    appended.pop(v, None)
+                    removed[v] = True
+        else:
+            raise ValueError('Invalid action type')
+    if overwrite is not None:
+        return [StructSubtypeListAction('overwrite', overwrite)]
+    result = []
+    removed and result.append(StructSubtypeListAction('remove', list(removed)))
+    appended and result.append(StructSubtypeListAction('append', list(appended)))
+    return result
+
+
+def coalesce_actions(subtype: type, actions: typing.List) -> typing.List:
+    """
+    Coalesce the pending actions on a struct component field, preserving the final stored value:
+    last write wins for sets, increments are summed, list appends and removes are merged.
+    """
+    if len(actions) < 2:
+        return actions
+    if subtype is int:
+        return _coalesce_int_actions(actions)
+    elif subtype in (str, bool):
+        return [actions[-1]]
+    elif subtype is dict:
+        return _coalesce_dict_actions(actions)
+    elif subtype is list:
+        return _coalesce_list_actions(actions)
+    raise ValueError('Invalid type')
+
+
+class EntitiesUnitOfWork:
+    """
+    Collects the pending changes of the entities to update, merged by entity and component,
+    and emits them coalesced by field.
+    Entities may be added more than once, i.e. by different commands.
+    """
+    def __init__(self):
+        self._components = OrderedDict()
+        self.positions: typing.List[typing.Tuple[Entity, StructComponent]] = []
+        self.created: typing.List[int] = []
+        self.actions_received = 0
+        self.actions_emitted = 0
+
+    def add(self, entity: Entity, created=False):
+        for component in entity.pending_changes.values():
+            assert component.is_struct
+            if component.enum == ComponentTypeEnum.POSITION:
+                self.positions.append((entity, component))
+            key = (entity.entity_id, component.enum)
+            entry = self._components.get(key)
+            if not entry:
+                entry = self._components[key] = [entity, component, OrderedDict()]
+            entry[1] = component
+            for field, actions in component.pending_changes.items():
+                entry[2].setdefault(field, []).extend(actions)
+                self.actions_received += len(actions)
+            component.pending_changes = {}
+        created and self.created.append(entity.entity_id)
+        return self
+
+    def components(self) -> typing.Iterator[typing.Tuple[Entity, StructComponent, typing.Dict]]:
+        for entity, component, changes in self._components.values():
+            coalesced = OrderedDict()
+            for field, actions in changes.items():
+                coalesced[field] = coalesce_actions(component.get_subtype(field), actions)
+                self.actions_emitted += len(coalesced[field])
+            yield entity, component, coalesced
+
+
+class UpdatesStats:
+    """
+    Counters on the write path coalescing.
+    Actions are the components fields changes: each one is written with at least two Redis operations.
+    """
+    def __init__(self):
+        self.actions_received = 0
+        self.actions_emitted = 0
+        self.updates_requested = 0
+        self.scripts_executed = 0
+
+    def track(self, unit_of_work: EntitiesUnitOfWork, updates_requested: int):
+        self.actions_received += unit_of_work.actions_received
+        self.actions_emitted += unit_of_work.actions_emitted
+        self.updates_requested += updates_requested
+        self.scripts_executed += 1
+
+    @property
+    def actions_saved(self) -> int:
+        return self.actions_received - self.actions_emitted
+
+    @property
+    def scripts_saved(self) -> int:
+        return self.updates_requested - self.scripts_executed
+
+    def as_dict(self) -> typing.Dict:
+        return {
+            'actions_received': self.actions_received,
+            'actions_emitted': self.actions_emitted,
+            'actions_saved': self.actions_saved,
+            'updates_requested': self.updates_requested,
+            'scripts_executed': self.scripts_executed,
+            'scripts_saved': self.scripts_saved
+        }
@@ -0,0 +1,159 @@
+import contextlib
+import hashlib
+import mmap
+import struct
+import typing
+
+
+MAGIC = b'PMWS'
+FORMAT_VERSION = 1
+
+# magic, format version, min_x, min_y, max_x, max_y, map version, sections table offset
+HEADER = struct.Struct('<4sHiiiiQQ')
+# tag, z, offset, length
+SECTION = struct.Struct('<4siQQ')
+# key length, value length
+RECORD = struct.Struct('<HI')
+
+TERRAINS_TAG = b'TERR'
+# Keys sections, their records are the DUMP payloads of the keys.
+KEYS_TAGS = {
+    'rooms': b'ROOM',
+    'library': b'LIBR',
+    'entities': b'ENTS'
+}
+
+
+def pack_record(key: bytes, value: bytes) -> bytes:
+    return RECORD.pack(len(key), len(value)) + key + value
+
+
+class WorldSnapshotWriter:
+    """
+    Writes a world snapshot sequentially: the header, the sections, then the sections table.
+
+    The terrains of each z layer are a section with the raw grid of the map bounds, one byte per room,
+    row major from (min_x, min_y). The keys sections are sequences of (key, value) records.
+    """
+    def __init__(self, filename: str, min_x: int, min_y: int, max_x: int, max_y: int, map_version: int):
+        self.min_x, self.min_y, self.max_x, self.max_y = min_x, min_y, max_x, max_y
+        self.map_version = map_version
+        self._sections = []
+        self._file = open(filename, 'wb')
+        self._file.write(self._header(0))
+
+    def _header(self, table_offset: int) -> bytes:
+        return HEADER.pack(
+            MAGIC, FORMAT_VERSION, self.min_x, self.min_y, self.max_x, self.max_y, self.map_version, table_offset
+        )
+
+    @contextlib.contextmanager
+    def section(self, tag: bytes, z: int = 0):
+        """
+        Yields the write function of the section.
+        """
+        start = self._file.tell()
+        yield self._file.write
+        self._sections.append((tag, z, start, self._file.tell() - start))
+
+    def close(self):
+        table_offset = self._file.tell()
+        self._file.write(struct.pack('<I', len(self._sections)))
+        for section in self._sections:
+            self._file.write(SECTION.pack(*section))
+        self._file.seek(0)
+        self._file.write(self._header(table_offset))
+        self._file.close()
+
+
+class WorldSnapshot:
+    """
+    A world snapshot, memory mapped: the terrains are read straight from the file, the pages are loaded
+    by the OS on demand and shared by the workers mapping the same file.
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)
+        self._grids = {}
+        magic, version, self.min_x, self.min_y, self.max_x, self.max_y, self.map_version, table_offset = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError('Unsupported world snapshot: {}'.format(filename))
+        size = struct.unpack_from('<I', self.data, table_offset)[0]
+        self._sections = [
+            SECTION.unpack_from(self.data, table_offset + 4 + i * SECTION.size) for i in range(0, size)
+        ]
+        self._grids = {
+            z: self.data[offset:offset + length] for tag, z, offset, length in self._sections if tag == TERRAINS_TAG
+        }
+        self.layers = tuple(sorted(self._grids))
+        self._snapshot_id = None
+
+    @property
+    def snapshot_id(self) -> str:
+        """
+        The hash of the map bounds and terrains: the restore saves it into the map metadata, the workers map
+        the snapshot only if it is the one restored.
+        """
+        if not self._snapshot_id:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(HEADER.pack(MAGIC, FORMAT_VERSION, self.min_x, self.min_y, self.max_x, self.max_y, 0, 0))
+            for z in self.layers:
+                digest.update(z.to_bytes(4, 'little', signed=True))
+                digest.update(self._grids[z])
+            self._snapshot_id = digest.hexdigest()
+        return self._snapshot_id
+
+    @property
+    def width(self) -> int:
+        return self.max_x - self.min_x + 1
+
+    @property
+    def tags(self) -> typing.Set[bytes]:
+        return {section[0] for section in self._sections}
+
+    def get_terrains(self, y: int, from_x: int, to_x: int, z: int) -> bytes:
+        """
+        The terrains of the rooms from_x..to_x - 1, zero filled out of the map.
+        """
+        if z not in self._grids or not self.min_y <= y <= self.max_y:
+            return bytes(to_x - from_x)
+        start, end = max(from_x, self.min_x), min(to_x, self.max_x + 1)
+        if start >= end:
+            return bytes(to_x - from_x)
+        offset = (y - self.min_y) * self.width - self.min_x
+        return bytes(start - from_x) + bytes(self._grids[z][offset + start:offset + end]) + bytes(to_x - end)
+
+    def get_chunk(self, z: int, cx: int, cy: int, chunk_size: int = 64) -> bytes:
+        """
+        The terrains chunk, laid out as by RedisMapRepository, trailing blank rooms stripped.
+        """
+        return b''.join(
+            self.get_terrains(cy * chunk_size + local_y, cx * chunk_size, (cx + 1) * chunk_size, z)
+            for local_y in range(0, chunk_size)
+        ).rstrip(b'\x00')
+
+    def iter_records(self, tag: bytes) -> typing.Iterator[typing.Tuple[bytes, memoryview]]:
+        """
+        The values are views on the mapped file: release them before closing the snapshot.
+        """
+        for section_tag, _, offset, length in self._sections:
+            if section_tag != tag:
+                continue
+            pos, end = offset, offset + length
+            while pos < end:
+                key_length, value_length = RECORD.unpack_from(self.data, pos)
+                pos += RECORD.size + key_length
+                yield bytes(self.data[pos - key_length:pos]), self.data[pos:pos + value_length]
+                pos += value_length
+
+    def close(self):
+        for grid in self._grids.values():
+            grid.release()
+        self._grids = {}
+        self.data.release()
+        self._mmap.close()
+        self._file.close()
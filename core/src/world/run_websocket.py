@@ -1,7 +1,8 @@
 import socketio
 from aiohttp import web
-from core.src.world.builder import websocket_channels_service, async_redis_queue, world_repository
+from core.src.world.builder import websocket_channels_service, async_redis_queue, world_repository, messages_codec
 from core.src.world.services.redis_pubsub_interface import PubSubManager
+from core.src.world.services.subscription_queue import OverflowPolicy
 from core.src.world.transport.redis_pubsub_subscriber_service import RedisPubSubSystemEventsSubscriberService
 from core.src.world.transport.websocket_namespace_main import build_public_namespace
 from core.src.world.transport.websocket_system_events_observer import TransportSystemEventsObserver
@@ -22,7 +23,12 @@ sio.attach(app)
 
 system_events_observer = TransportSystemEventsObserver()
 system_events_observer.add_transport_service(websocket_channels_service)
-pubsub = PubSubManager(async_redis_queue)
+pubsub = PubSubManager(
+    async_redis_queue,
+    serializer=messages_codec.encode,
+    queue_size=settings.PUBSUB_QUEUE_SIZE,
+    overflow=OverflowPolicy(settings.PUBSUB_OVERFLOW)
+)
 system_events_subscribe = RedisPubSubSystemEventsSubscriberService(pubsub)
 system_events_subscribe.add_observer_for_topic('system.transport', system_events_observer)
 
@@ -34,5 +40,10 @@ if __name__ == '__main__':
     loop.create_task(websocket_channels_service.start())
     loop.create_task(pubsub.start())
     loop.create_task(system_events_subscribe.subscribe_transport_system_messages())
+    world_repository.entity_types.pubsub_manager = pubsub
+    loop.create_task(world_repository.entity_types.listen_deletions())
+    if world_repository.components_cache:
+        world_repository.components_cache.pubsub_manager = pubsub
+        loop.create_task(world_repository.components_cache.listen_invalidations())
     build_public_namespace(sio, world_repository, websocket_channels_service)
     web.run_app(app, host=settings.SOCKETIO_HOSTNAME, port=settings.SOCKETIO_PORT)
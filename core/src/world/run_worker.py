@@ -1,5 +1,6 @@
 from core.src.world.builder import events_subscriber_service, library_repository, \
-    pubsub_observer, worker_queue_manager, cmds_observer, connections_observer, pubsub_manager
+    pubsub_observer, worker_queue_manager, cmds_observer, connections_observer, pubsub_manager, components_cache, \
+    world_repository, map_repository, pathfinding_manager, connected_positions
 from core.src.world.utils.entity_utils import check_entities_connection_status
 from core.src.world.utils.world_utils import clean_rooms_from_stales_instances
 
@@ -11,6 +12,8 @@ worker_queue_manager.add_queue_observer('cmd', cmds_observer)
 async def main(entities):
     await library_repository.build()
     if entities:
+        for entity_data in entities:
+            connected_positions.track(entity_data['entity_id'], entity_data['position'])
         await events_subscriber_service.bootstrap_subscribes(entities)
         for entity_data in entities:
             events_subscriber_service.add_observer_for_entity_data(entity_data, pubsub_observer)
@@ -20,10 +23,23 @@ async def main(entities):
 if __name__ == '__main__':
     from core.src.auth.logging_factory import LOGGER
     import asyncio
+    from etc import settings
 
     loop = asyncio.get_event_loop()
     LOGGER.core.debug('Starting Worker')
+    if map_repository.terrains_cache:
+        loop.create_task(map_repository.listen_terrains_versions())
+        loop.run_until_complete(map_repository.load_terrains())
+    else:
+        loop.run_until_complete(map_repository.load_metadata())
+    loop.run_until_complete(pathfinding_manager.load())
+    loop.run_until_complete(map_repository.check_positions_index())
     loop.run_until_complete(clean_rooms_from_stales_instances())
     online_entities = loop.run_until_complete(check_entities_connection_status())
     loop.create_task(pubsub_manager.start())
+    components_cache and loop.create_task(components_cache.listen_invalidations())
+    loop.create_task(world_repository.entity_types.listen_deletions())
+    settings.UPDATES_STATS_INTERVAL and loop.create_task(
+        world_repository.log_updates_stats(settings.UPDATES_STATS_INTERVAL)
+    )
     loop.run_until_complete(main(online_entities))
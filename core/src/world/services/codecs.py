@@ -0,0 +1,86 @@
+import json
+import typing
+
+import msgpack
+
+# The keys of the events and queues messages, packed as their index by the compact codecs.
+# Append only: the index of a key is part of the format of the tag it is packed with.
+MESSAGES_KEYS = (
+    'en', 'entity_type', 'reason', 'ev', 'curr', 'prev', 'p', 'target',
+    'n', 'e_id', 'd', 't', 'c', 'w', 'k', 'v'
+)
+
+
+class JsonCodec:
+    """
+    The untagged JSON messages, as published before the codecs: a JSON text never starts with a tag byte.
+    """
+    tag = None
+
+    @staticmethod
+    def encode(message) -> bytes:
+        return json.dumps(message).encode()
+
+    @staticmethod
+    def decode(data: bytes):
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """
+    msgpack messages, prefixed by the tag byte. The keys of the dict messages are packed as their index into
+    MESSAGES_KEYS, and their own int keys as an INT_KEY ext, so they are never taken for an index.
+    """
+    tag = b'\x01'
+    INT_KEY = 1
+
+    def __init__(self):
+        self._indexes = {key: i for i, key in enumerate(MESSAGES_KEYS)}
+
+    def encode(self, message) -> bytes:
+        if isinstance(message, dict):
+            indexes = self._indexes
+            message = {self._pack_key(k, indexes): v for k, v in message.items()}
+        return self.tag + msgpack.packb(message, use_bin_type=True)
+
+    def _pack_key(self, key, indexes):
+        if isinstance(key, int):
+            return msgpack.ExtType(self.INT_KEY, msgpack.packb(key))
+        return indexes.get(key, key)
+
+    def _unpack_key(self, key):
+        if isinstance(key, int):
+            return MESSAGES_KEYS[key]
+        if isinstance(key, msgpack.ExtType) and key.code == self.INT_KEY:
+            return msgpack.unpackb(key.data)
+        return key
+
+    def decode(self, data: bytes):
+        message = msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+        if isinstance(message, dict):
+            message = {self._unpack_key(k): v for k, v in message.items()}
+        return message
+
+
+CODECS = {
+    'json': JsonCodec(),
+    'msgpack': MsgpackCodec()
+}
+_CODECS_BY_TAG = {codec.tag[0]: codec for codec in CODECS.values() if codec.tag}
+
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError('Unknown messages codec %s' % name)
+
+
+def decode_message(data: typing.Union[bytes, str]):
+    """
+    Decodes a message of any codec, by its tag byte: untagged messages are JSON.
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    codec = data and _CODECS_BY_TAG.get(data[0])
+    return codec.decode(data) if codec else json.loads(data)
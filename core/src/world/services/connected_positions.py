@@ -0,0 +1,68 @@
+import typing
+
+from core.src.world.components.position import PositionComponent
+from core.src.world.utils.world_types import MapEncodingEnum
+
+
+class ConnectedPositionsTable:
+    """
+    The positions of the entities connected to the worker, tracked from their connection and updated by their
+    casts, so the events interest of the listeners is evaluated without reading their positions.
+    """
+    def __init__(self):
+        self._positions: typing.Dict[int, typing.List[int]] = {}
+
+    def __contains__(self, entity_id: int) -> bool:
+        return entity_id in self._positions
+
+    @property
+    def size(self) -> int:
+        return len(self._positions)
+
+    def track(self, entity_id: int, position: PositionComponent):
+        if position and position.list_coordinates:
+            self._positions[entity_id] = list(position.list_coordinates)
+
+    def update(self, entity_id: int, position: PositionComponent):
+        """
+        Updates the position of a tracked entity, the others are not connected to the worker.
+        """
+        self.update_coordinates(entity_id, position.list_coordinates)
+
+    def update_coordinates(self, entity_id: int, coordinates: typing.List[int]):
+        if entity_id in self._positions:
+            self._positions[entity_id] = list(coordinates)
+
+    def untrack(self, entity_id: int):
+        self._positions.pop(entity_id, None)
+
+    def get_coordinates(self, entity_id: int) -> typing.Optional[typing.List[int]]:
+        """
+        The coordinates of a tracked entity, not to be changed.
+        """
+        return self._positions.get(entity_id)
+
+    def get(self, entity_id: int) -> typing.Optional[PositionComponent]:
+        coordinates = self._positions.get(entity_id)
+        return coordinates and PositionComponent().set_list_coordinates(list(coordinates))
+
+
+class ConnectedMapEncodingsTable:
+    """
+    The map encodings negotiated by the entities connected to the worker, so their maps are sent without
+    reading the encoding at each move.
+    """
+    def __init__(self):
+        self._encodings: typing.Dict[int, MapEncodingEnum] = {}
+
+    def __contains__(self, entity_id: int) -> bool:
+        return entity_id in self._encodings
+
+    def track(self, entity_id: int, encoding: MapEncodingEnum):
+        self._encodings[entity_id] = encoding
+
+    def untrack(self, entity_id: int):
+        self._encodings.pop(entity_id, None)
+
+    def get(self, entity_id: int) -> typing.Optional[MapEncodingEnum]:
+        return self._encodings.get(entity_id)
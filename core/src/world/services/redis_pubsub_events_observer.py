@@ -8,6 +8,7 @@ from core.src.world.components.position import PositionComponent
 from core.src.world.components.system import SystemComponent
 from core.src.world.domain.area import Area
 from core.src.world.domain.entity import Entity
+from core.src.world.services.connected_positions import ConnectedPositionsTable
 from core.src.world.services.redis_pubsub_publisher_service import PubSubEventType
 from core.src.world.utils.entity_utils import load_components
 from core.src.world.utils.messaging import emit_sys_msg
@@ -20,9 +21,10 @@ class InterestType(Enum):
 
 
 class PubSubObserver:
-    def __init__(self, repository, loop=asyncio.get_event_loop()):
+    def __init__(self, repository, loop=asyncio.get_event_loop(), positions: ConnectedPositionsTable = None):
         self.loop = loop
         self.repository = repository
+        self.positions = positions
         self.postprocessed_events_observers = {}
 
     def add_observer_for_pov_event(self, event_type: str, observer):
@@ -102,10 +104,14 @@ class PubSubObserver:
         )
 
     async def on_event(self, entity_id: int, message: typing.Dict, room: typing.Tuple, transport_id: str):
-        room = PositionComponent(coord='{},{},{}'.format(*room))
+        room = PositionComponent().set_list_coordinates(list(room))
         entity = Entity(entity_id).set_component(SystemComponent().connection.set(transport_id))
-        await load_components(entity, PositionComponent)
-        curr_pos = entity.get_component(PositionComponent)
+        curr_pos = self.positions and self.positions.get(entity_id)
+        if curr_pos:
+            entity.set_component(curr_pos)
+        else:
+            await load_components(entity, PositionComponent)
+            curr_pos = entity.get_component(PositionComponent)
         interest_type = await self._get_message_interest_type(entity, room, curr_pos)
         if not interest_type.value:
             return
@@ -11,27 +11,42 @@ import aioredis
 import typing
 
 from core.src.auth.logging_factory import LOGGER
+from core.src.world.services.codecs import decode_message
+from core.src.world.services.subscription_queue import SubscriptionQueue, OverflowPolicy, ChannelStats
 
 
 class PubSubManager:
+    """
+    Each subscription gets its messages by a SubscriptionQueue bounded to queue_size messages (0 is unbounded),
+    by the overflow policy: a blocked subscription holds the reader, and so all the others.
+    """
     # pylint: disable=R0902, too-many-instance-attributes
     _TERMINATE = "EXTERMINATE"
 
     def __init__(self,
                  redis: callable,
                  serializer=json.dumps,
-                 deserializer=json.loads) -> None:
+                 deserializer=decode_message,
+                 queue_size: int = 0,
+                 overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+                 coalesce_key: typing.Optional[callable] = None,
+                 coalesce: typing.Optional[callable] = None) -> None:
 
         self._redis_factory = redis
         self.serializer = serializer
         self.deserializer = deserializer
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.coalesce_key = coalesce_key
+        self.coalesce = coalesce
+        self._stats: typing.Dict[str, ChannelStats] = {}
 
         self._lock = asyncio.Lock()
         self._mpsc = aioredis.pubsub.Receiver()
         self._reader_fut: typing.Optional[asyncio.Future] = None
         self._registry: typing.Dict[
             aioredis.abc.AbcChannel,
-            typing.Set[asyncio.Queue],
+            typing.Set[SubscriptionQueue],
         ] = {}
         self._redis = None
         self.async_lock = asyncio.Lock()
@@ -85,11 +100,28 @@ class PubSubManager:
         serialized = self.serializer(message)
         await redis.publish(channel, serialized)
 
+    async def publish_many(self, channels: typing.Iterable[str], message):
+        """
+        Publishes the same message on many channels: serialized once, the PUBLISH commands sent in a pipeline.
+        """
+        channels = list(channels)
+        if not channels:
+            return
+        if len(channels) == 1:
+            return await self.publish(channels[0], message)
+        redis = await self.redis()
+        # pylint: disable=E1102, not-callable
+        serialized = self.serializer(message)
+        pipeline = redis.pipeline()
+        for channel in channels:
+            pipeline.publish(channel, serialized)
+        await pipeline.execute()
+
     @async_generator.asynccontextmanager
     async def _subscribe(self,
                          channel: str,
                          is_pattern: bool
-                         ) -> typing.AsyncGenerator[asyncio.Queue, None]:
+                         ) -> typing.AsyncGenerator[SubscriptionQueue, None]:
         """
         Async context manager that provides a multi-consumer proxy for aioredis'
         pubsub single-consumer.
@@ -98,7 +130,11 @@ class PubSubManager:
         async with self._lock:
             handler = self._mpsc.pattern if is_pattern else self._mpsc.channel
             registration = handler(channel)
-            subscription: asyncio.Queue = asyncio.Queue()
+            stats = self._stats.setdefault(channel, ChannelStats())
+            subscription = SubscriptionQueue(
+                self.queue_size, self.overflow, self.coalesce_key, self.coalesce, stats=stats
+            )
+            stats.subscriptions.add(subscription)
 
             if registration not in self._registry:
                 if is_pattern:
@@ -115,6 +151,8 @@ class PubSubManager:
         finally:
             async with self._lock:
                 self._registry[registration].remove(subscription)
+                stats.subscriptions.discard(subscription)
+                stats.subscriptions or self._stats.pop(channel, None)
                 if not self._registry[registration]:
                     if is_pattern:
                         method, name = redis.punsubscribe, 'pattern'
@@ -137,6 +175,12 @@ class PubSubManager:
                 else:
                     yield value
 
+    def get_channels_stats(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        """
+        The subscribers, queued messages, and dropped and coalesced messages counters of the subscribed channels.
+        """
+        return {channel: stats.as_dict() for channel, stats in self._stats.items()}
+
     async def unsubscribe(self, channel):
         redis = await self.redis()
         await redis.unsubscribe(channel)
@@ -13,14 +13,77 @@ class PubSubEventType(Enum):
     ENTITY_QUIT = 5
 
 
+def get_cell_channel(x: int, y: int, z: int, cell_size: int) -> str:
+    return 'cell:{}.{}.{}'.format(x // cell_size, y // cell_size, z)
+
+
+def get_position_event_cells_channels(msg: typing.Dict, cell_size: int) -> typing.List[str]:
+    """
+    The channels of the cells of the event rooms, current and previous, without repetitions.
+    """
+    channels = [get_cell_channel(*msg['curr'], cell_size)]
+    if msg.get('prev'):
+        previous = get_cell_channel(*msg['prev'], cell_size)
+        previous != channels[0] and channels.append(previous)
+    return channels
+
+
+def get_cells_channels_in_square(x: int, y: int, z: int, radius: int, cell_size: int) -> typing.Set[str]:
+    """
+    The channels of the cells holding any room of the square of side 2 * radius + 1 centered on x, y.
+    """
+    return {
+        'cell:{}.{}.{}'.format(cx, cy, z)
+        for cx in range((x - radius) // cell_size, (x + radius) // cell_size + 1)
+        for cy in range((y - radius) // cell_size, (y + radius) // cell_size + 1)
+    }
+
+
+def get_position_event_key(message) -> typing.Optional[int]:
+    """
+    The events of an entity share its key: the subscriptions queues coalesce its pending position changes,
+    up to its next event of another type.
+    """
+    if isinstance(message, dict):
+        return message.get('en')
+    return None
+
+
+def coalesce_position_events(pending: typing.Dict, message: typing.Dict) -> typing.Optional[typing.Dict]:
+    if pending.get('ev') != PubSubEventType.ENTITY_CHANGE_POS.value or \
+            message.get('ev') != PubSubEventType.ENTITY_CHANGE_POS.value:
+        return None
+    return dict(message, prev=pending['prev'])
+
+
 class RedisPubSubEventsPublisherService:
-    def __init__(self, pubsub: PubSubManager):
+    """
+    Publishes the position events once per listener, on its channel, or with cell_size once on the channels
+    of the spatial cells (cell_size x cell_size rooms of a z layer) of the event rooms, current and previous,
+    for the workers to fan them out to their connected entities. The entity own channel gets the event as well,
+    for its worker to follow its cells.
+    """
+    def __init__(self, pubsub: PubSubManager, cell_size: typing.Optional[int] = None):
         self.pubsub = pubsub
+        self.cell_size = cell_size
         self._redis = None
 
+    @property
+    def needs_targets(self) -> bool:
+        return not self.cell_size
+
     def _eid_to_key(self, entity_id: int):
         return 'chan:{}'.format(entity_id)
 
+    async def _publish_position_event(self, msg: typing.Dict, targets: typing.Iterable[int], moved=True):
+        if self.cell_size:
+            channels = get_position_event_cells_channels(msg, self.cell_size)
+            moved and channels.append(self._eid_to_key(msg['en']))
+        else:
+            channels = [self._eid_to_key(target) for target in targets]
+        LOGGER.core.debug('Publishing Message %s on channels %s', msg, channels)
+        await self.pubsub.publish_many(channels, msg)
+
     async def on_entity_change_position(self, entity, room_position, reason, targets=[]):
         """
         MUST be fired AFTER the the entity position is changed.
@@ -33,11 +96,7 @@ class RedisPubSubEventsPublisherService:
             "curr": room_position.list_coordinates,
             "prev": room_position.previous_position.list_coordinates
         }
-        for target in targets:
-            k = self._eid_to_key(target)
-            LOGGER.core.debug('Publishing Message %s on channel %s', msg, k)
-            await self.pubsub.publish(k, msg)
-            LOGGER.core.debug('Published Message %s on channel %s', msg, k)
+        await self._publish_position_event(msg, targets)
 
     async def on_entity_appear_position(self, entity, room_position, reason, targets):
         msg = {
@@ -47,10 +106,7 @@ class RedisPubSubEventsPublisherService:
             "ev": PubSubEventType.ENTITY_APPEAR.value,
             "curr": room_position.list_coordinates
         }
-        for target in targets:
-            k = self._eid_to_key(target)
-            LOGGER.core.debug('Publishing Message %s on channels %s', msg, k)
-            await self.pubsub.publish(k, msg)
+        await self._publish_position_event(msg, targets)
 
     async def on_entity_disappear_position(self, entity, room_position, reason, targets):
         msg = {
@@ -60,10 +116,7 @@ class RedisPubSubEventsPublisherService:
             "ev": PubSubEventType.ENTITY_DISAPPEAR.value,
             "curr": room_position.list_coordinates
         }
-        for target in targets:
-            k = self._eid_to_key(target)
-            LOGGER.core.debug('Publishing Message %s on channels %s', msg, k)
-            await self.pubsub.publish(k, msg)
+        await self._publish_position_event(msg, targets, moved=False)
 
     async def on_entity_do_public_action(
             self, entity, room_position, action_public_payload: typing.Dict, target: int
@@ -3,11 +3,27 @@ import typing
 from core.src.auth.logging_factory import LOGGER
 from core.src.world.components.system import SystemComponent
 from core.src.world.domain.entity import Entity
+from core.src.world.services.connected_positions import ConnectedPositionsTable
 from core.src.world.services.redis_pubsub_interface import PubSubManager
+from core.src.world.services.redis_pubsub_publisher_service import PubSubEventType, get_cells_channels_in_square, \
+    get_position_event_cells_channels
 
 
 class RedisPubSubEventsSubscriberService:
-    def __init__(self, pubsub: PubSubManager, loop=asyncio.get_event_loop()):
+    """
+    Subscribes the channel of each connected entity and, with cell_size, the channels of the spatial cells
+    its view (view_radius rooms around it, the area plus its peripheral ring) overlaps. The cells events are
+    fanned out, once, to the entities seeing the current or the previous event room. The entities positions are
+    read from the connected positions table, that their own position events keep current.
+    """
+    def __init__(
+            self,
+            pubsub: PubSubManager,
+            loop=asyncio.get_event_loop(),
+            cell_size: typing.Optional[int] = None,
+            view_radius=5,
+            positions: ConnectedPositionsTable = None
+    ):
         self.pubsub = pubsub
         self._redis = None
         self._current_subscriptions_by_entity_id = dict()
@@ -15,6 +31,12 @@ class RedisPubSubEventsSubscriberService:
         self.loop = loop
         self._observers_by_entity_id = dict()
         self._transports_by_entity_id = dict()
+        self.cell_size = cell_size
+        self.view_radius = view_radius
+        self.positions = positions
+        self._cells_by_entity_id = dict()
+        self._entities_by_cell = dict()
+        self._cells_tasks = dict()
 
     async def _subscribe_entity(self, entity: Entity):
         if not self._current_subscriptions_by_entity_id.get(entity.entity_id):
@@ -33,7 +55,56 @@ class RedisPubSubEventsSubscriberService:
             except Exception as e:
                 raise e
 
+    def _set_entity_cells(self, entity_id: int, position: typing.Optional[typing.List[int]]):
+        if position:
+            cells = get_cells_channels_in_square(*position, self.view_radius, self.cell_size)
+        else:
+            cells = set()
+        current_cells = self._cells_by_entity_id.pop(entity_id, set())
+        if cells:
+            self._cells_by_entity_id[entity_id] = cells
+        for cell in current_cells - cells:
+            self._entities_by_cell[cell].discard(entity_id)
+            if not self._entities_by_cell[cell]:
+                del self._entities_by_cell[cell]
+                self._cells_tasks.pop(cell).cancel()
+        for cell in cells - current_cells:
+            if cell not in self._entities_by_cell:
+                self._entities_by_cell[cell] = set()
+                self._cells_tasks[cell] = self.loop.create_task(self._subscribe_pubsub_cell(cell))
+            self._entities_by_cell[cell].add(entity_id)
+
+    async def _subscribe_pubsub_cell(self, cell: str):
+        async for message in self.pubsub.subscribe(cell):
+            try:
+                self._on_new_cell_message(cell, message)
+            except Exception:
+                LOGGER.core.exception('Cell %s message failed: %s', cell, message)
+
+    def _in_view(self, position: typing.List[int], room: typing.Optional[typing.List[int]]) -> bool:
+        return bool(room) and position[2] == room[2] and \
+            max(abs(position[0] - room[0]), abs(position[1] - room[1])) <= self.view_radius
+
+    def _on_new_cell_message(self, cell: str, message):
+        channels = get_position_event_cells_channels(message, self.cell_size)
+        for entity_id in list(self._entities_by_cell.get(cell, ())):
+            if entity_id == message['en']:
+                continue
+            # An entity subscribed to more cells of the event gets it from the first one only.
+            entity_cells = self._cells_by_entity_id[entity_id]
+            if next(channel for channel in channels if channel in entity_cells) != cell:
+                continue
+            position = self.positions.get_coordinates(entity_id)
+            if position and (self._in_view(position, message['curr']) or self._in_view(position, message.get('prev'))):
+                self._on_new_message(entity_id, message)
+
     def _on_new_message(self, entity_id, message):
+        if self.cell_size and message.get('en') == entity_id and message.get('ev') in (
+            PubSubEventType.ENTITY_CHANGE_POS.value, PubSubEventType.ENTITY_APPEAR.value
+        ):
+            self.positions.update_coordinates(entity_id, message['curr'])
+            self._set_entity_cells(entity_id, self.positions.get_coordinates(entity_id))
+            return
         for observer in self._observers_by_entity_id.get(entity_id, []):
             LOGGER.core.debug('MESSAGE for entity_id %s: %s', entity_id, message)
             self.loop.create_task(
@@ -46,9 +117,14 @@ class RedisPubSubEventsSubscriberService:
             )
 
     async def subscribe_events(self, entity: Entity):
+        """
+        With cell_size, the entity position must be tracked into the positions table.
+        """
         connection = entity.get_component(SystemComponent).connection
         assert connection.value
         self._transports_by_entity_id[entity.entity_id] = connection.value
+        if self.cell_size:
+            self._set_entity_cells(entity.entity_id, self.positions.get_coordinates(entity.entity_id))
         await asyncio.gather(self._subscribe_entity(entity))
 
     async def bootstrap_subscribes(self, data: typing.List[typing.Dict]):
@@ -59,6 +135,7 @@ class RedisPubSubEventsSubscriberService:
 
     async def unsubscribe_all(self, entity: Entity):
         self._transports_by_entity_id.pop(entity.entity_id, None)
+        self.cell_size and self._set_entity_cells(entity.entity_id, None)
         await self._unsubscribe_entity(entity.entity_id)
 
     async def _unsubscribe_entity(self, entity_id: int):
@@ -4,10 +4,13 @@ import json
 import typing
 from aioredis import Redis
 
+from core.src.world.services.codecs import decode_message
+
 
 class RedisMultipleQueuesPublisher:
-    def __init__(self, redis_factory: callable, num_queues: int):
+    def __init__(self, redis_factory: callable, num_queues: int, serializer=json.dumps):
         self.redis_factory = redis_factory
+        self.serializer = serializer
         self._redis = None
         self.num_queues = num_queues
         self.queue_prefix = 'rmq'
@@ -22,12 +25,13 @@ class RedisMultipleQueuesPublisher:
 
         queue = int.from_bytes(hashlib.sha256(entity_id.encode()).digest(), 'little') % self.num_queues
         redis = await self.redis()
-        await redis.rpush(self.queue_prefix + str(queue), json.dumps(message))
+        await redis.rpush(self.queue_prefix + str(queue), self.serializer(message))
 
 
 class RedisQueueConsumer:
-    def __init__(self,  redis_factory: callable, queue_id):
+    def __init__(self,  redis_factory: callable, queue_id, deserializer=decode_message):
         self.redis_factory = redis_factory
+        self.deserializer = deserializer
         self._redis = None
         self.queue_key = 'rmq' + str(queue_id)
 
@@ -45,7 +49,7 @@ class RedisQueueConsumer:
 
         if item:
             item = item[1]
-        return item and json.loads(item)
+        return item and self.deserializer(item)
 
     async def qsize(self):
         redis = await self.redis()
@@ -0,0 +1,114 @@
+import asyncio
+import collections
+import enum
+import typing
+
+
+class OverflowPolicy(enum.Enum):
+    # The producer waits for room into the queue.
+    BLOCK = 'block'
+    # The oldest message is dropped to make room.
+    DROP_OLDEST = 'drop_oldest'
+    # Over maxsize, a message is merged into the pending one with the same coalesce key, the others wait for room.
+    COALESCE = 'coalesce'
+
+
+class ChannelStats:
+    """
+    The subscriptions of a channel, with the counters they share.
+    """
+    __slots__ = ('subscriptions', 'dropped', 'coalesced')
+
+    def __init__(self):
+        self.subscriptions: typing.Set['SubscriptionQueue'] = set()
+        self.dropped = 0
+        self.coalesced = 0
+
+    def as_dict(self) -> typing.Dict[str, int]:
+        depths = [subscription.qsize() for subscription in self.subscriptions]
+        return {
+            'subscribers': len(depths),
+            'depth': sum(depths),
+            'max_depth': max(depths, default=0),
+            'dropped': self.dropped,
+            'coalesced': self.coalesced
+        }
+
+
+class SubscriptionQueue:
+    """
+    A FIFO of the messages of a subscription, bounded to maxsize messages (0 is unbounded) by its overflow policy.
+
+    With the COALESCE policy, coalesce_key returns the key of a message, or None for the messages that are never
+    coalesced. The pending message of a key is the last one queued with it, so the messages of a key keep their
+    order. On a full queue, coalesce merges a message into the pending one with its same key, that keeps its place
+    in the queue, or returns None if they can't be merged.
+    """
+    def __init__(
+            self,
+            maxsize: int = 0,
+            policy: OverflowPolicy = OverflowPolicy.BLOCK,
+            coalesce_key: typing.Optional[callable] = None,
+            coalesce: typing.Optional[callable] = None,
+            stats: typing.Optional[ChannelStats] = None
+    ):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.coalesce_key = coalesce_key
+        self.coalesce = coalesce or (lambda pending, message: message)
+        self.stats = stats or ChannelStats()
+        # Slots are [key, message] lists, so the coalesced messages are replaced in place.
+        self._slots: typing.Deque[typing.List] = collections.deque()
+        self._pending: typing.Dict[typing.Any, typing.List] = {}
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def qsize(self) -> int:
+        return len(self._slots)
+
+    def full(self) -> bool:
+        return bool(self.maxsize) and len(self._slots) >= self.maxsize
+
+    def _coalesce(self, key, message) -> bool:
+        slot = key is not None and self._pending.get(key)
+        if not slot:
+            return False
+        merged = self.coalesce(slot[1], message)
+        if merged is None:
+            return False
+        slot[1] = merged
+        self.stats.coalesced += 1
+        return True
+
+    async def put(self, message):
+        key = None
+        if self.policy == OverflowPolicy.COALESCE and self.coalesce_key:
+            key = self.coalesce_key(message)
+        while self.full():
+            if self.policy == OverflowPolicy.DROP_OLDEST:
+                self._pop()
+                self.stats.dropped += 1
+                break
+            if self.policy == OverflowPolicy.COALESCE and self._coalesce(key, message):
+                return
+            self._not_full.clear()
+            await self._not_full.wait()
+        slot = [key, message]
+        self._slots.append(slot)
+        if key is not None:
+            self._pending[key] = slot
+        self._not_empty.set()
+
+    def _pop(self):
+        slot = self._slots.popleft()
+        if slot[0] is not None and self._pending.get(slot[0]) is slot:
+            del self._pending[slot[0]]
+        self._not_full.set()
+        return slot[1]
+
+    async def get(self):
+        while not self._slots:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self._pop()
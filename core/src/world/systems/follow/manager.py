@@ -8,12 +8,14 @@ from core.src.world.components.system import SystemComponent
 
 from core.src.world.domain.entity import Entity
 from core.src.world.domain.room import Room
+from core.src.world.services.connected_positions import ConnectedPositionsTable
 from core.src.world.utils.entity_utils import load_components
 
 
 class FollowSystemManager:
-    def __init__(self, transports_manager, loop=asyncio.get_event_loop()):
+    def __init__(self, transports_manager, loop=asyncio.get_event_loop(), positions: ConnectedPositionsTable = None):
         self.transports_manager = transports_manager
+        self.positions = positions
         self._follows_by_target: typing.Dict[int, typing.List] = {}
         self._follow_by_follower: typing.Dict[int, int] = {}
         self.loop = loop
@@ -68,7 +70,11 @@ class FollowSystemManager:
         if current_followed_id != event['entity']['id']:
             LOGGER.core.error('Error on follow system')
             return
-        entity = await load_components(Entity(follower_id), SystemComponent, PositionComponent)
+        position = self.positions and self.positions.get(follower_id)
+        if position:
+            entity = (await load_components(Entity(follower_id), SystemComponent)).set_component(position)
+        else:
+            entity = await load_components(Entity(follower_id), SystemComponent, PositionComponent)
         if entity.get_component(PositionComponent).list_coordinates != event['from']:
             LOGGER.core.error('Error on follow system')
             return
@@ -0,0 +1,145 @@
+import typing
+from array import array
+from collections import OrderedDict
+
+from core.src.world.components.position import PositionComponent
+from core.src.world.utils.pathfinding import label_components, find_path
+
+
+class WalkableGrid:
+    """
+    The walkable mask of a rectangle of a z layer, with its connected components labels.
+    """
+    def __init__(self, z: int, min_x: int, min_y: int, max_x: int, max_y: int, walkable: bytes):
+        self.z = z
+        self.min_x, self.min_y, self.max_x, self.max_y = min_x, min_y, max_x, max_y
+        self.width = max_x - min_x + 1
+        self.walkable = walkable
+        self.labels: array = label_components(walkable, self.width)
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y
+
+    def index(self, x: int, y: int) -> int:
+        return (y - self.min_y) * self.width + x - self.min_x
+
+    def coordinates(self, index: int) -> typing.Tuple[int, int]:
+        return self.min_x + index % self.width, self.min_y + index // self.width
+
+    def are_connected(self, start: int, goal: int) -> bool:
+        return bool(self.labels[start]) and self.labels[start] == self.labels[goal]
+
+
+class PathfindingManager:
+    """
+    Plans the paths between the rooms of a z layer over the walkable grid of a region holding both the ends:
+    the whole map while it is at most max_region_size rooms, else the ends bounding box plus margin rooms.
+
+    The grids are labelled with their connected components when loaded, so the unreachable targets are rejected
+    without searching. A search expands at most max_expanded rooms, by default an eighth of max_region_size, not to
+    stall the event loop: the farther targets are not found. Grids and paths are kept in LRUs, emptied when the map
+    version changes.
+    """
+    def __init__(
+            self,
+            map_repository,
+            max_paths=1024,
+            max_grids=8,
+            max_region_size=512 * 512,
+            margin=32,
+            max_expanded: typing.Optional[int] = None
+    ):
+        self.map_repository = map_repository
+        self.max_expanded = max_expanded or max_region_size // 8
+        self.max_paths = max_paths
+        self.max_grids = max_grids
+        self.max_region_size = max_region_size
+        self.margin = margin
+        self.version = None
+        self._grids: typing.Dict[typing.Tuple, WalkableGrid] = OrderedDict()
+        self._paths: typing.Dict[typing.Tuple, typing.Optional[typing.List[typing.Tuple[int, int]]]] = OrderedDict()
+
+    def get_map_version(self) -> int:
+        repository = self.map_repository
+        return repository.terrains_cache.version if repository.terrains_cache else repository.metadata.version
+
+    def _check_version(self) -> int:
+        version = self.get_map_version()
+        if version != self.version:
+            self._grids.clear()
+            self._paths.clear()
+            self.version = version
+        return version
+
+    @staticmethod
+    def _set(lru: typing.Dict, key, value, max_size: int):
+        lru[key] = value
+        while len(lru) > max_size:
+            lru.popitem(last=False)
+
+    def _get_region(self, start: PositionComponent, goal: PositionComponent) -> typing.Optional[typing.Tuple]:
+        repository = self.map_repository
+        bounds = repository.min_x, repository.min_y, repository.max_x, repository.max_y
+        if (bounds[2] - bounds[0] + 1) * (bounds[3] - bounds[1] + 1) <= self.max_region_size:
+            return bounds
+        region = (
+            max(min(start.x, goal.x) - self.margin, bounds[0]),
+            max(min(start.y, goal.y) - self.margin, bounds[1]),
+            min(max(start.x, goal.x) + self.margin, bounds[2]),
+            min(max(start.y, goal.y) + self.margin, bounds[3])
+        )
+        if (region[2] - region[0] + 1) * (region[3] - region[1] + 1) > self.max_region_size:
+            return None
+        return region
+
+    async def get_grid(self, z: int, min_x: int, min_y: int, max_x: int, max_y: int) -> WalkableGrid:
+        version = self._check_version()
+        key = (z, min_x, min_y, max_x, max_y)
+        grid = self._grids.get(key)
+        if grid:
+            self._grids.move_to_end(key)
+            return grid
+        walkable = await self.map_repository.get_walkable_grid(min_x, min_y, max_x, max_y, z)
+        grid = WalkableGrid(z, min_x, min_y, max_x, max_y, walkable)
+        version == self.get_map_version() and self._set(self._grids, key, grid, self.max_grids)
+        return grid
+
+    async def load(self):
+        """
+        Loads and labels the grids of all the map layers, if the map fits a region.
+        """
+        repository = self.map_repository
+        if (repository.max_x - repository.min_x + 1) * (repository.max_y - repository.min_y + 1) \
+                > self.max_region_size:
+            return
+        for z in repository.metadata.layers:
+            await self.get_grid(z, repository.min_x, repository.min_y, repository.max_x, repository.max_y)
+
+    async def find_path(
+            self, start: PositionComponent, goal: PositionComponent
+    ) -> typing.Optional[typing.List[PositionComponent]]:
+        """
+        The positions from start, excluded, to goal. None if goal is not reachable from start within their region,
+        or is not found expanding max_expanded rooms.
+        """
+        version = self._check_version()
+        if start.z != goal.z:
+            return None
+        key = (start.z, start.x, start.y, goal.x, goal.y)
+        if key in self._paths:
+            self._paths.move_to_end(key)
+            path = self._paths[key]
+        else:
+            path = None
+            region = self._get_region(start, goal)
+            grid = region and await self.get_grid(start.z, *region)
+            if grid and grid.contains(start.x, start.y) and grid.contains(goal.x, goal.y):
+                start_index, goal_index = grid.index(start.x, start.y), grid.index(goal.x, goal.y)
+                if grid.are_connected(start_index, goal_index):
+                    indexes = find_path(grid.walkable, grid.width, start_index, goal_index, self.max_expanded)
+                    if indexes is not None:
+                        path = [grid.coordinates(i) for i in indexes]
+            version == self.get_map_version() and self._set(self._paths, key, path, self.max_paths)
+        if path is None:
+            return None
+        return [PositionComponent().set_list_coordinates([x, y, start.z]) for x, y in path]
@@ -56,7 +56,9 @@ def get_entity_data_from_raw_data_input(
 
 async def populate_container(container: InventoryComponent, *components):
     container._raw_populated = [Entity(x) for x in container.content]
-    container._raw_populated and await batch_load_components(*components, entities=container._raw_populated)
+    container._raw_populated and await batch_load_components(
+        *components, entities=container._raw_populated, bulk=True
+    )
     return container
 
 
@@ -272,10 +274,12 @@ async def ensure_same_position(self_entity: Entity, *entities: Entity) -> bool:
     return True
 
 
-async def batch_load_components(*components, entities=()):
+async def batch_load_components(*components, entities=(), bulk=False):
     """
     Load multiple components on multiple entities.
     Useful to load multiple components with a single DB interaction, and reduce DB load.
+    With bulk=True the read is done server side by a single script execution,
+    which is cheaper on many entities or on components with list and dict fields.
     """
     from core.src.world.builder import world_repository
     from core.src.world.components.base.structcomponent import StructComponent
@@ -286,9 +290,9 @@ async def batch_load_components(*components, entities=()):
             query_comp.append(c)
         else:
             raise ValueError
-    comp_res = query_comp and await world_repository.read_struct_components_for_entities(
-        [e.entity_id for e in entities], *query_comp
-    ) or {}
+    read = bulk and world_repository.bulk_read_struct_components_for_entities or \
+        world_repository.read_struct_components_for_entities
+    comp_res = query_comp and await read([e.entity_id for e in entities], *query_comp) or {}
     for entity in entities:
         entity_comps = comp_res.get(entity.entity_id, {})
         for ck, cv in entity_comps.items():
@@ -341,42 +345,30 @@ async def check_entities_connection_status() -> typing.List[typing.Dict]:
     from core.src.world.components.system import SystemComponent
     from core.src.world.builder import channels_repository
     from core.src.world.builder import map_repository, cmds_observer
+    from core.src.world.repositories.entities_query import with_index
 
-    entity_ids_with_connection_component_active = await world_repository.get_entity_ids_with_valued_components(
-        (SystemComponent, 'connection')
-    )
-    if not entity_ids_with_connection_component_active:
-        return []
-    entities = [Entity(eid) for eid in entity_ids_with_connection_component_active]
-
-    await batch_load_components(PositionComponent, (SystemComponent, 'connection'), entities=entities)
-    components_values = []
-    entities_by_id = {}
-    for entity in entities:
-        components_values.append(entity.get_component(SystemComponent).connection.value)
-        entities_by_id[entity.entity_id] = entity
-    to_update = []
     online = []
-    if not components_values:
-        return online
-    channels = channels_repository.get_many(*components_values)
-    for i, ch in enumerate(channels.values()):
-        if not ch:
+    async for entity_ids in world_repository.query_entities(with_index(SystemComponent, 'connection')):
+        entities = [Entity(eid) for eid in entity_ids]
+        await batch_load_components(PositionComponent, (SystemComponent, 'connection'), entities=entities)
+        components_values = [entity.get_component(SystemComponent).connection.value for entity in entities]
+        to_update = []
+        channels = channels_repository.get_many(*components_values)
+        for i, ch in enumerate(channels.values()):
             entity = entities[i]
-            to_update.append(entity)
-            await map_repository.remove_entity_from_map(
-                entity_ids_with_connection_component_active[i],
-                entity.get_component(PositionComponent)
-            )
-        else:
-            cmds_observer.enable_channel(ch.id)
-            online.append(
-                {
-                    'entity_id': entity_ids_with_connection_component_active[i],
-                    'channel_id': ch.id
-                }
-            )
-    await world_repository.update_entities(*to_update)
+            if not ch:
+                to_update.append(entity)
+                await map_repository.remove_entity_from_map(entity.entity_id, entity.get_component(PositionComponent))
+            else:
+                cmds_observer.enable_channel(ch.id)
+                online.append(
+                    {
+                        'entity_id': entity.entity_id,
+                        'channel_id': ch.id,
+                        'position': entity.get_component(PositionComponent)
+                    }
+                )
+        to_update and await world_repository.update_entities(*to_update)
     return online
 
 
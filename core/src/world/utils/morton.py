@@ -0,0 +1,61 @@
+import typing
+
+# Coordinates are biased to be encoded as unsigned 16 bits: -32768..32767.
+BIAS = 2 ** 15
+
+
+def _part(n: int) -> int:
+    n &= 0xFFFF
+    n = (n | (n << 8)) & 0x00FF00FF
+    n = (n | (n << 4)) & 0x0F0F0F0F
+    n = (n | (n << 2)) & 0x33333333
+    n = (n | (n << 1)) & 0x55555555
+    return n
+
+
+def _compact(n: int) -> int:
+    n &= 0x55555555
+    n = (n | (n >> 1)) & 0x33333333
+    n = (n | (n >> 2)) & 0x0F0F0F0F
+    n = (n | (n >> 4)) & 0x00FF00FF
+    n = (n | (n >> 8)) & 0x0000FFFF
+    return n
+
+
+def encode(x: int, y: int) -> int:
+    """
+    The Z-order code of (x, y): the x and y bits interleaved.
+    """
+    return _part(x + BIAS) | (_part(y + BIAS) << 1)
+
+
+def decode(code: int) -> typing.Tuple[int, int]:
+    return _compact(code) - BIAS, _compact(code >> 1) - BIAS
+
+
+def ranges(min_x: int, min_y: int, max_x: int, max_y: int, max_ranges=8) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Inclusive code ranges covering the rectangle, at most max_ranges of them.
+
+    The rectangle is covered with the aligned blocks of 2^level x 2^level rooms, each one a contiguous
+    range of codes, at the smallest level with at most max_ranges merged ranges:
+    the ranges may cover rooms out of the rectangle, the caller filters by position.
+    """
+    assert max_x >= min_x and max_y >= min_y
+    level = 0
+    while True:
+        blocks = sorted(
+            _part(block_x << level) | (_part(block_y << level) << 1)
+            for block_x in range((min_x + BIAS) >> level, ((max_x + BIAS) >> level) + 1)
+            for block_y in range((min_y + BIAS) >> level, ((max_y + BIAS) >> level) + 1)
+        )
+        size = 4 ** level
+        response = []
+        for start in blocks:
+            if response and response[-1][1] == start - 1:
+                response[-1][1] = start + size - 1
+            else:
+                response.append([start, start + size - 1])
+        if len(response) <= max_ranges:
+            return [(start, end) for start, end in response]
+        level += 1
@@ -0,0 +1,78 @@
+import heapq
+import typing
+from array import array
+
+
+def _neighbours(i: int, width: int, size: int) -> typing.Iterator[int]:
+    x = i % width
+    if i >= width:
+        yield i - width
+    if i + width < size:
+        yield i + width
+    if x:
+        yield i - 1
+    if x < width - 1:
+        yield i + 1
+
+
+def label_components(walkable: bytes, width: int) -> array:
+    """
+    The 4-connected components of the walkable cells of a row major grid:
+    a label per cell, 0 for the not walkable cells, else the component number from 1.
+    """
+    size = len(walkable)
+    labels = array('I', bytes(4 * size))
+    label = 0
+    start = walkable.find(1)
+    while start != -1:
+        if not labels[start]:
+            label += 1
+            labels[start] = label
+            stack = [start]
+            while stack:
+                for n in _neighbours(stack.pop(), width, size):
+                    if walkable[n] and not labels[n]:
+                        labels[n] = label
+                        stack.append(n)
+        start = walkable.find(1, start + 1)
+    return labels
+
+
+def find_path(
+        walkable: bytes, width: int, start: int, goal: int, max_expanded: typing.Optional[int] = None
+) -> typing.Optional[typing.List[int]]:
+    """
+    A* over the 4-connected walkable cells of a row major grid, with the Manhattan distance heuristic.
+    The cells from start, excluded, to goal. None if goal is not reached expanding at most max_expanded cells.
+    """
+    if start == goal:
+        return []
+    size = len(walkable)
+    goal_x, goal_y = goal % width, goal // width
+    came_from = {start: start}
+    costs = {start: 0}
+    # Equal estimates are broken by the longest cost, closest to the goal.
+    heap = [(abs(start % width - goal_x) + abs(start // width - goal_y), 0, start)]
+    expanded = 0
+    while heap:
+        _, cost, i = heapq.heappop(heap)
+        if i == goal:
+            path = []
+            while i != start:
+                path.append(i)
+                i = came_from[i]
+            return path[::-1]
+        cost = -cost
+        if cost > costs[i]:
+            continue
+        expanded += 1
+        if max_expanded and expanded > max_expanded:
+            return None
+        for n in _neighbours(i, width, size):
+            if walkable[n] and cost + 1 < costs.get(n, size):
+                costs[n] = cost + 1
+                came_from[n] = i
+                heapq.heappush(
+                    heap, (cost + 1 + abs(n % width - goal_x) + abs(n // width - goal_y), -cost - 1, n)
+                )
+    return None
@@ -1,7 +1,12 @@
+import base64
+import itertools
+import typing
+
 from core.src.world.components.attributes import AttributesComponent
 from core.src.world.components.position import PositionComponent
 from core.src.world.domain.entity import Entity
 from core.src.world.domain.room import Room
+from core.src.world.utils.world_types import MapEncodingEnum
 
 
 def serialize_system_message_item(item, entity):
@@ -31,3 +36,27 @@ def serialize_system_message_item(item, entity):
         return item
     else:
         raise ValueError(item)
+
+
+def run_length_encode(terrains: bytes) -> typing.List[int]:
+    """
+    [terrain, count, terrain, count...]
+    """
+    response = []
+    for terrain, group in itertools.groupby(terrains):
+        response.extend((terrain, sum(1 for _ in group)))
+    return response
+
+
+def serialize_map_terrains(terrains: bytes, encoding: MapEncodingEnum) -> (typing.List[int], str, bytes):
+    """
+    The map base, one byte per room.
+    BINARY is sent by socket.io as a binary attachment.
+    """
+    if encoding == MapEncodingEnum.BINARY:
+        return terrains
+    elif encoding == MapEncodingEnum.BASE64:
+        return base64.b64encode(terrains).decode()
+    elif encoding == MapEncodingEnum.RLE:
+        return run_length_encode(terrains)
+    return list(terrains)
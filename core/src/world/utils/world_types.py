@@ -30,3 +30,11 @@ class DirectionEnum(enum.Enum):
     WEST = 'w'
     UP = 'u'
     DOWN = 'd'
+
+
+@enum.unique
+class MapEncodingEnum(enum.Enum):
+    JSON = 'json'
+    BASE64 = 'base64'
+    BINARY = 'binary'
+    RLE = 'rle'
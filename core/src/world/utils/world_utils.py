@@ -18,6 +18,17 @@ def direction_to_coords_delta(direction: object) -> typing.Tuple:
     }[direction]
 
 
+def coords_delta_to_direction(delta: typing.Tuple[int, int, int]) -> typing.Optional[DirectionEnum]:
+    return {
+        (0, 1, 0): DirectionEnum.NORTH,
+        (0, -1, 0): DirectionEnum.SOUTH,
+        (1, 0, 0): DirectionEnum.EAST,
+        (-1, 0, 0): DirectionEnum.WEST,
+        (0, 0, 1): DirectionEnum.UP,
+        (0, 0, -1): DirectionEnum.DOWN,
+    }.get(tuple(delta))
+
+
 def apply_delta_to_position(room_position: PositionComponent, delta: typing.Tuple[int, int, int]):
     return PositionComponent().set_list_coordinates(
         [
@@ -36,13 +47,21 @@ def get_direction(direction):
         return None
 
 
+# Indexed by terrain value, usable as a bytes.translate table to build the walkable masks.
+WALKABLE_TERRAINS = bytes(
+    int(
+        {
+            TerrainEnum.NULL: False,
+            TerrainEnum.WALL_OF_BRICKS: False,
+            TerrainEnum.PATH: True,
+            TerrainEnum.GRASS: True
+        }.get(terrain, False)
+    ) for terrain in range(256)
+)
+
+
 def is_terrain_walkable(terrain_type: TerrainEnum):
-    return {
-        TerrainEnum.NULL: False,
-        TerrainEnum.WALL_OF_BRICKS: False,
-        TerrainEnum.PATH: True,
-        TerrainEnum.GRASS: True
-    }[terrain_type]
+    return bool(WALKABLE_TERRAINS[terrain_type])
 
 
 async def get_current_room(entity: Entity, populate=True):
@@ -67,29 +86,25 @@ async def get_room_at_direction(entity: Entity, direction_enum, populate=True):
 
 
 async def clean_rooms_from_stales_instances(instance_type='character'):
+    """
+    Disconnects the entities of the given type found into the rooms without a connection.
+    """
     from core.src.world.components.system import SystemComponent
     from core.src.world.builder import world_repository
     from core.src.world.utils.entity_utils import batch_load_components
     from core.src.world.actions.system.disconnect import disconnect_entity
     from core.src.world.builder import map_repository
-    entity_ids_with_connection_component_active = await world_repository.get_entity_ids_with_components_having_value(
-        (SystemComponent, 'instance_of', instance_type)
-    )
-    if not entity_ids_with_connection_component_active:
-        return []
-    entities = [Entity(eid) for eid in entity_ids_with_connection_component_active]
-    await batch_load_components(PositionComponent, SystemComponent, entities=entities)
-    entities_without_connection_component_and_position = [
-        e for e in entities if not e.get_component(SystemComponent).connection
-        and e.get_component(PositionComponent).coord
-    ]
-    rooms = await map_repository.get_rooms(
-        *(e.get_component(PositionComponent) for e in entities_without_connection_component_and_position)
-    )
-    stales = []
-    for i, room in enumerate(rooms):
-        if entities_without_connection_component_and_position[i].entity_id in room.entity_ids:
-            stales.append(entities_without_connection_component_and_position[i])
-    LOGGER.core.error('Error, found stales entities: %s' % str([x.entity_id for x in stales]))
-    for entity in stales:
-        await disconnect_entity(entity, msg=False)
+    from core.src.world.repositories.entities_query import with_value, with_index
+    query = with_value(SystemComponent, 'instance_of', instance_type) - with_index(SystemComponent, 'connection')
+    async for entity_ids in world_repository.query_entities(query):
+        entities = [Entity(eid) for eid in entity_ids]
+        await batch_load_components(PositionComponent, SystemComponent, entities=entities)
+        entities_with_position = [e for e in entities if e.get_component(PositionComponent).coord]
+        rooms = await map_repository.get_rooms(*(e.get_component(PositionComponent) for e in entities_with_position))
+        stales = []
+        for i, room in enumerate(rooms):
+            if entities_with_position[i].entity_id in room.entity_ids:
+                stales.append(entities_with_position[i])
+        stales and LOGGER.core.error('Error, found stales entities: %s' % str([x.entity_id for x in stales]))
+        for entity in stales:
+            await disconnect_entity(entity, msg=False)
@@ -68,3 +68,39 @@ FLUENTD_HANDLER_PORT = config['logging']['fluentd_port']
 REDIS_TEST_DB = INTEGRATION_TESTS and config['database']['redis_test_db'] or NotImplementedError
 
 WORKERS = 1
+
+# Worker local components cache: 0 disables it. Components are the libnames, i.e. position,system. Empty: all.
+COMPONENTS_CACHE_SIZE = config['settings'].getint('components_cache_size', fallback=0)
+COMPONENTS_CACHE = [c.strip() for c in config['settings'].get('components_cache', fallback='').split(',') if c.strip()]
+
+# Components storage engine: spread (a key per field) or packed (a msgpack blob per component).
+COMPONENTS_STORAGE = config['settings'].get('components_storage', fallback='spread')
+
+# Updates of the commands finishing in the same event loop tick written with a single script: a failure fails
+# them all. The write path counters (ops saved) are logged every updates_stats_interval seconds, 0 disables it.
+MERGE_UPDATES_PER_TICK = config['settings'].getboolean('merge_updates_per_tick', fallback=False)
+UPDATES_STATS_INTERVAL = config['settings'].getint('updates_stats_interval', fallback=60)
+
+# Worker local LRU of the map terrains chunks (64x64 rooms, 4KB each), evicted on the map version changes.
+TERRAINS_CACHE = config['settings'].getboolean('terrains_cache', fallback=True)
+TERRAINS_CACHE_CHUNKS = config['settings'].getint('terrains_cache_chunks', fallback=4096)
+
+# World snapshot file (tools/world_snapshot.py) mapped by the workers, to load the terrains chunks from.
+MAP_SNAPSHOT = config['settings'].get('map_snapshot', fallback='')
+
+# Entities positions index: 8x8 rooms buckets, or a Morton ordered sorted set per z layer.
+# Changing it rebuilds the index from the rooms contents at the next worker startup, and drops the other one.
+MAP_MORTON_INDEX = config['settings'].getboolean('map_morton_index', fallback=False)
+
+# Position events published once on the channel of their spatial cell (cell size x cell size rooms of a z layer),
+# instead of once per listener. 0 disables it.
+PUBSUB_CELL_SIZE = config['settings'].getint('pubsub_cell_size', fallback=0)
+
+# Codec of the published events and of the workers queues messages: json or msgpack, with compact keys.
+# The consumers decode both, by the message tag byte, so the producers can be switched one at a time.
+MESSAGES_CODEC = config['settings'].get('messages_codec', fallback='json')
+
+# Pubsub subscriptions queues: at most pubsub_queue_size messages each (0 is unbounded), over it by the
+# pubsub_overflow policy: block, drop_oldest, or coalesce (the pending position changes of an entity).
+PUBSUB_QUEUE_SIZE = config['settings'].getint('pubsub_queue_size', fallback=1024)
+PUBSUB_OVERFLOW = config['settings'].get('pubsub_overflow', fallback='coalesce')
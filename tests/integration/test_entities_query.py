@@ -0,0 +1,59 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock
+
+from core.src.world.components.attributes import AttributesComponent
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.entities_query import with_index, with_value, with_component
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestEntitiesQuery(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.sut = RedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        self.loop.run_until_complete(self._setup())
+
+    async def _setup(self):
+        await (await self.sut.async_redis()).flushdb()
+        # 1..6 characters, 7..10 swords. Even characters are connected, 1..3 and the swords have an inventory.
+        for entity_id in range(1, 11):
+            system = SystemComponent().instance_of.set('character' if entity_id < 7 else 'sword')
+            not entity_id % 2 and entity_id < 7 and system.connection.set('conn-{}'.format(entity_id))
+            entity = Entity(entity_id).set_for_update(system)
+            (entity_id < 4 or entity_id > 6) and entity.set_for_update(InventoryComponent().content.append(99))
+            entity_id == 10 and entity.set_for_update(AttributesComponent().name.set('sword'))
+            await self.sut.update_entities(entity)
+
+    async def _query(self, query, chunk_size=500):
+        result = []
+        async for entity_ids in self.sut.query_entities(query, chunk_size=chunk_size):
+            result.append(sorted(entity_ids))
+        return result
+
+    def test_query(self):
+        self.loop.run_until_complete(self._test_query())
+
+    async def _test_query(self):
+        characters = with_value(SystemComponent, 'instance_of', 'character')
+        connected = with_index(SystemComponent, 'connection')
+        inventories = with_component(InventoryComponent)
+        attributes = with_component(AttributesComponent)
+        self.assertEqual(await self._query(characters - connected), [[1, 3, 5]])
+        self.assertEqual(await self._query(characters & inventories), [[1, 2, 3]])
+        self.assertEqual(await self._query(inventories & connected), [[2]])
+        self.assertEqual(await self._query(inventories - attributes), [[1, 2, 3, 7, 8, 9]])
+        self.assertEqual(await self._query(inventories & attributes), [[10]])
+        self.assertEqual(await self._query(connected | attributes), [[2, 4, 6, 10]])
+        self.assertEqual(
+            await self._query((characters - connected) | (inventories - characters)), [[1, 3, 5, 7, 8, 9, 10]]
+        )
+        self.assertEqual(sorted(sum(await self._query(inventories, chunk_size=3), [])), [1, 2, 3, 7, 8, 9, 10])
+        self.assertEqual(len(await self._query(characters, chunk_size=2)), 3)
+        self.assertEqual(await (await self.sut.async_redis()).keys('q:*'), [])
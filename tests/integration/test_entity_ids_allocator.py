@@ -0,0 +1,50 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock
+
+from core.src.world.components.attributes import AttributesComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestEntityIdsAllocator(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.sut = RedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        self.sut.entity_ids_allocator.lease_size = 10
+        self.loop.run_until_complete(self._flush_redis())
+
+    async def _flush_redis(self):
+        await (await self.sut.async_redis()).flushdb()
+
+    def test(self):
+        self.loop.run_until_complete(self._test())
+
+    async def _test(self):
+        redis = await self.sut.async_redis()
+        self.assertEqual(await self.sut.allocate_entity_ids(3), [1, 2, 3])
+        self.assertEqual(await redis.get('e:c'), b'10')
+        self.assertEqual(await self.sut.allocate_entity_ids(12), list(range(4, 16)))
+        self.assertEqual(await redis.get('e:c'), b'20')
+
+        entities = [Entity().set_for_update(AttributesComponent().name.set('e%s' % i)) for i in range(0, 3)]
+        await self.sut.save_entities(*entities)
+        self.assertEqual([e.entity_id for e in entities], [16, 17, 18])
+        self.assertTrue(await self.sut.entity_exists(17))
+        self.assertTrue(await self.sut.delete_entity(17))
+        self.assertFalse(await self.sut.entity_exists(17))
+        self.assertEqual(await self.sut.entities_exist(16, 17, 18, 19), [True, False, True, False])
+        self.assertFalse(await redis.hget('c:{}:d:name'.format(AttributesComponent.key), 17))
+
+        # Deleting again, or deleting a never allocated id, doesn't free the id twice.
+        self.assertTrue(await self.sut.delete_entity(17))
+        self.assertTrue(await self.sut.delete_entity(999))
+        self.assertEqual(await redis.lrange('e:f', 0, -1), [b'17'])
+
+        self.sut.entity_ids_allocator._leased.clear()
+        self.assertEqual(await self.sut.allocate_entity_ids(2), [17, 21])
+        self.assertEqual(await self.sut.allocate_entity_ids(1), [22])
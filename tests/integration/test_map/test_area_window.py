@@ -0,0 +1,71 @@
+import asyncio
+import random
+from unittest import TestCase
+
+from core.src.world import exceptions
+from core.src.world.builder import map_repository
+from core.src.world.components.position import PositionComponent
+from core.src.world.domain.room import Room
+from core.src.world.repositories.map_repository import RedisMapRepository
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from core.src.world.utils.world_types import TerrainEnum
+from etc import settings
+
+
+class TestAreaWindow(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.max_x, self.max_y = 99, 79
+        self.loop.run_until_complete(self._bake())
+
+    async def _bake(self):
+        redis = await map_repository.redis()
+        await redis.flushdb()
+        await map_repository.set_metadata(0, 0, self.max_x, self.max_y)
+        await map_repository.set_rooms(
+            *(
+                Room(
+                    position=PositionComponent(coord='{},{},0'.format(x, y)),
+                    terrain=random.choice([TerrainEnum.WALL_OF_BRICKS, TerrainEnum.PATH, TerrainEnum.GRASS])
+                )
+                for x in range(0, self.max_x + 1) for y in range(0, self.max_y + 1)
+            )
+        )
+        for entity_id in range(1, 200):
+            x, y = random.randint(0, self.max_x), random.randint(0, self.max_y)
+            await redis.zadd(map_repository.get_room_key(x, y, 0), entity_id, entity_id)
+
+    @staticmethod
+    async def _expected_window(sut, center, size):
+        response = []
+        for y in range(center.y + size // 2, center.y + size // 2 - size, -1):
+            for x in range(center.x - size // 2, center.x - size // 2 + size):
+                try:
+                    response.append(await sut.get_room(PositionComponent(coord='{},{},0'.format(x, y))))
+                except exceptions.RoomError:
+                    response.append(None)
+        return response
+
+    @staticmethod
+    def _rooms_values(rooms):
+        return [r and (r.position.x, r.position.y, r.terrain, sorted(r.entity_ids)) for r in rooms]
+
+    def test_window(self):
+        self.loop.run_until_complete(self._test_window())
+
+    async def _test_window(self):
+        uncached = RedisMapRepository(get_redis_factory(RedisType.DATA))
+        for sut in (map_repository, uncached):
+            for x, y in ((0, 0), (self.max_x, self.max_y), (50, 40), (-3, 20), (20, self.max_y + 4)):
+                for size in (9, 15, 31):
+                    center = PositionComponent(coord='{},{},0'.format(x, y))
+                    window = await sut.get_window(center, size, size)
+                    self.assertEqual(len(window), size * size)
+                    self.assertEqual(
+                        self._rooms_values(window),
+                        self._rooms_values(await self._expected_window(sut, center, size))
+                    )
+            center = PositionComponent(coord='50,40,1')
+            self.assertEqual(await sut.get_window(center, 9, 9), [None] * 81)
@@ -4,10 +4,13 @@ from collections import OrderedDict
 from unittest import TestCase
 import time
 
+from core.src.world import exceptions
 from core.src.world.components.position import PositionComponent
 from core.src.world.services.system_utils import get_redis_factory, RedisType
 from etc import settings
 from core.src.world.repositories.map_repository import RedisMapRepository
+from core.src.world.repositories.terrains_cache import TerrainsCache
+from core.src.world.services.redis_pubsub_interface import PubSubManager
 from core.src.world.domain.room import Room
 from core.src.world.utils.world_types import TerrainEnum
 
@@ -26,8 +29,7 @@ class TestSetGetRooms(TestCase):
         d = {}
         i = 0
         max_x, max_y, max_z = 25, 25, 5
-        sut.max_y = max_y
-        sut.max_x = max_x
+        await sut.set_metadata(0, 0, max_x, max_y, layers=range(0, max_z))
         start = time.time()
         for x in range(0, max_x):
             for y in range(0, max_y):
@@ -122,8 +124,7 @@ class TestBigMap(TestCase):
         sut = RedisMapRepository(get_redis_factory(RedisType.DATA))
         await (await sut.redis()).flushdb()
         max_x, max_y, max_z = 500, 500, 1
-        sut.max_y = max_y
-        sut.max_x = max_x
+        await sut.set_metadata(0, 0, max_x, max_y)
         start = time.time()
         i = 0
         print('\nBaking {}x{} map'.format(max_x, max_y))
@@ -158,8 +159,7 @@ class TestMapLines(TestCase):
         sut = RedisMapRepository(get_redis_factory(RedisType.DATA))
         await (await sut.redis()).flushdb()
         max_x, max_y = 50, 50
-        sut.max_y = max_y
-        sut.max_x = max_x
+        await sut.set_metadata(0, 0, max_x, max_y)
         start = time.time()
         print('\nBaking {}x{} map'.format(max_x, max_y))
         roomz = OrderedDict()
@@ -189,3 +189,92 @@ class TestMapLines(TestCase):
                         [r[req].position.x, r[req].position.y, r[req].position.z],
                         [roomz[k].position.x, roomz[k].position.y, roomz[k].position.z]
                     )
+
+
+class TestMapLayers(TestCase):
+    def test(self):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.asyncio_test())
+
+    async def asyncio_test(self):
+        sut = RedisMapRepository(get_redis_factory(RedisType.DATA))
+        await (await sut.redis()).flushdb()
+        metadata = await sut.set_metadata(-5, -5, 20, 10, layers=(0, 1, -1))
+        self.assertEqual(metadata.layers, (-1, 0, 1))
+        self.assertEqual(metadata.version, 1)
+        terrains = [TerrainEnum.WALL_OF_BRICKS, TerrainEnum.PATH, TerrainEnum.GRASS]
+        await sut.set_rooms(
+            *(
+                Room(position=PositionComponent(coord='{},{},{}'.format(x, 3, z)), terrain=terrains[(x + z) % 3])
+                for x in range(-5, 21) for z in (-1, 0, 1)
+            )
+        )
+        redis = await sut.redis()
+        await redis.zadd(sut.get_room_key(2, 3, 1), 1, 42)
+        for z in (-1, 0, 1):
+            rooms = await sut.get_rooms_on_y(3, -5, 21, z)
+            self.assertEqual([r.position.x for r in rooms], list(range(-5, 21)))
+            self.assertEqual([r.terrain for r in rooms], [terrains[(x + z) % 3] for x in range(-5, 21)])
+            self.assertEqual(rooms[7].entity_ids, z == 1 and [42] or [])
+            # Rooms -5..-1 are in the chunk -1, 0..20 in the chunk 0, the row 3 from the chunk first room.
+            self.assertEqual(await redis.strlen(sut.get_chunk_key(z, -1, 0)), 3 * 64 + 64)
+            self.assertEqual(await redis.strlen(sut.get_chunk_key(z, 0, 0)), 3 * 64 + 21)
+        with self.assertRaises(exceptions.RoomError):
+            await sut.get_room(PositionComponent(coord='0,0,2'))
+        with self.assertRaises(exceptions.RoomError):
+            await sut.get_room(PositionComponent(coord='21,0,0'))
+
+        other = RedisMapRepository(get_redis_factory(RedisType.DATA))
+        self.assertEqual(await other.load_metadata(), metadata)
+        room = await other.get_room(PositionComponent(coord='2,3,1'))
+        self.assertEqual((room.terrain, room.entity_ids), (terrains[0], [42]))
+
+
+class TestTerrainsCache(TestCase):
+    def test(self):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.asyncio_test())
+
+    async def asyncio_test(self):
+        pubsub_manager = PubSubManager(get_redis_factory(RedisType.QUEUES))
+        await pubsub_manager.start()
+        writer = RedisMapRepository(
+            get_redis_factory(RedisType.DATA), terrains_cache=TerrainsCache(pubsub_manager=pubsub_manager)
+        )
+        reader = RedisMapRepository(
+            get_redis_factory(RedisType.DATA), terrains_cache=TerrainsCache(pubsub_manager=pubsub_manager)
+        )
+        await (await writer.redis()).flushdb()
+        await writer.set_metadata(0, 0, 9, 9, layers=(0, 1))
+        await writer.set_rooms(
+            *(
+                Room(position=PositionComponent(coord='{},{},{}'.format(x, y, 1)), terrain=TerrainEnum.PATH)
+                for x in range(0, 10) for y in range(0, 10)
+            )
+        )
+        await reader.load_terrains()
+        listener = asyncio.ensure_future(reader.listen_terrains_versions())
+        await asyncio.sleep(0.1)
+        self.assertTrue(await reader.is_walkable(PositionComponent(coord='5,5,1')))
+        self.assertFalse(await reader.is_walkable(PositionComponent(coord='5,5,0')))
+        self.assertFalse(await reader.is_walkable(PositionComponent(coord='10,5,1')))
+
+        await writer.set_room(Room(position=PositionComponent(coord='5,5,1'), terrain=TerrainEnum.WALL_OF_BRICKS))
+        self.assertEqual(writer.terrains_cache.version, 3)
+        await asyncio.sleep(0.1)
+        self.assertEqual(reader.terrains_cache.version, writer.terrains_cache.version)
+        self.assertNotIn((1, 0, 0), reader.terrains_cache)
+        self.assertIn((0, 0, 0), reader.terrains_cache)
+        self.assertFalse(await reader.is_walkable(PositionComponent(coord='5,5,1')))
+        room = await reader.get_room(PositionComponent(coord='5,5,1'), populate=False)
+        self.assertEqual(room.terrain, TerrainEnum.WALL_OF_BRICKS)
+        rooms = await reader.get_rooms_on_y(5, 3, 8, 1, get_content=False)
+        self.assertEqual(
+            [r.terrain for r in rooms], [TerrainEnum.PATH] * 2 + [TerrainEnum.WALL_OF_BRICKS] + [TerrainEnum.PATH] * 2
+        )
+
+        start = time.time()
+        for _ in range(0, 1000):
+            await reader.get_rooms_on_y(5, 0, 9, 1, get_content=False)
+        print('\nCached line of 9 rooms: {:.6f} ms/read'.format(time.time() - start))
+        listener.cancel()
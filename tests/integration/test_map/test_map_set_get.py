@@ -5,7 +5,7 @@ from core.src.world.builder import map_repository
 from core.src.world.components import PosComponent
 from core.src.world.domain.area import Area
 from core.src.world.services.system_utils import get_redis_factory, RedisType
-from tools.txt_map_to_redis import parse_lines
+from tools.txt_map_to_redis import import_layers
 from etc import settings
 
 
@@ -37,16 +37,17 @@ class TestMapArea(TestCase):
 #.........................................................#
 ###########################################################
 """
-        self.content = parse_lines([x for x in self.map.split('\n') if x])
+        self.lines = [x.encode() for x in self.map.split('\n') if x]
         self.loop.run_until_complete(self.setup_map())
 
     async def setup_map(self):
         await (await get_redis_factory(RedisType.QUEUES)()).flushdb()
-        await map_repository.set_rooms(*self.content)
+        self.assertEqual(await import_layers(map_repository, {0: lambda: self.lines}, pipeline_size=7), 59 * 21)
+        self.assertEqual(
+            (map_repository.min_x, map_repository.min_y, map_repository.max_x, map_repository.max_y), (0, 0, 58, 20)
+        )
 
     async def _get_map(self, x, y):
-        map_repository.max_x = 58
-        map_repository.max_y = 20
         size = 9
         a = Area(center=PosComponent([x, y, 0]), square_size=size)
         q = [(x and x.terrain.value or 0) for x in await a.get_rooms()]
@@ -0,0 +1,111 @@
+import asyncio
+import random
+from unittest import TestCase
+
+from core.src.world.builder import map_repository
+from core.src.world.components.position import PositionComponent
+from core.src.world.domain.area import Area
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.map_repository import RedisMapRepository
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestSpatialIndex(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.morton = RedisMapRepository(get_redis_factory(RedisType.DATA), morton_index=True)
+        self.loop.run_until_complete(self._setup())
+
+    async def _setup(self):
+        await (await map_repository.redis()).flushdb()
+        await map_repository.set_metadata(0, 0, 199, 199, layers=(0, 1))
+        await self.morton.load_metadata()
+        self.positions = {}
+
+    @staticmethod
+    def _position(x, y, z, previous=None):
+        position = PositionComponent().set_list_coordinates([x, y, z])
+        previous and position.add_previous_position(previous)
+        return position
+
+    async def _place(self, entities):
+        pipeline = (await map_repository.redis()).pipeline()
+        for entity_id in range(1, entities + 1):
+            position = self._position(random.randint(0, 199), random.randint(0, 199), random.choice((0, 1)))
+            map_repository.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+            self.morton.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+            self.positions[entity_id] = position
+            if not entity_id % 5000:
+                await pipeline.execute()
+                pipeline = (await map_repository.redis()).pipeline()
+        await pipeline.execute()
+
+    async def _move(self, entity_id, x, y, z):
+        pipeline = (await map_repository.redis()).pipeline()
+        position = self._position(x, y, z, previous=self.positions[entity_id])
+        map_repository.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+        self.morton.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+        self.positions[entity_id] = position
+        await pipeline.execute()
+
+    def _expected(self, area):
+        coordinates = area.make_coordinates().rooms_and_peripherals_coordinates
+        return sorted(e for e, p in self.positions.items() if (p.x, p.y, p.z) in coordinates)
+
+    def test_spatial_index(self):
+        self.loop.run_until_complete(self._test_spatial_index())
+
+    async def _test_spatial_index(self):
+        await self._place(2000)
+        for x, y, z in ((0, 0, 0), (7, 8, 1), (100, 100, 0), (199, 199, 1), (63, 64, 0)):
+            area = Area(self._position(x, y, z))
+            self.assertEqual(sorted(await map_repository.get_all_entity_ids_in_area(area)), self._expected(area))
+            self.assertEqual(sorted(await self.morton.get_all_entity_ids_in_area(area)), self._expected(area))
+            rooms = await self.morton.get_entity_ids_in_rectangle(x - 4, y - 4, x + 4, y + 4, z)
+            for (room_x, room_y), entity_ids in rooms.items():
+                self.assertEqual(
+                    sorted(entity_ids), sorted(await map_repository.get_room_content(self._position(room_x, room_y, z)))
+                )
+        await self._move(1, 100, 100, 0)
+        await self._move(2, 101, 99, 0)
+        await self._move(2, 150, 150, 0)
+        await map_repository.remove_entity_from_map(3, self.positions[3])
+        await self.morton.remove_entity_from_map(3, self.positions.pop(3))
+        await self._move(4, 100, 100, 1)
+        area = Area(self._position(100, 100, 0))
+        response = sorted(await map_repository.get_all_entity_ids_in_area(area))
+        self.assertEqual(response, self._expected(area))
+        self.assertIn(1, response)
+        self.assertNotIn(2, response)
+        self.assertNotIn(4, response)
+        self.assertEqual(sorted(await self.morton.get_all_entity_ids_in_area(area)), response)
+
+    def test_rebuild(self):
+        self.loop.run_until_complete(self._test_rebuild())
+
+    async def _test_rebuild(self):
+        redis = await map_repository.redis()
+        # Entities placed into the rooms only, as before the spatial indexes.
+        for entity_id, (x, y, z) in enumerate(((5, 5, 0), (9, 4, 0), (5, 5, 1), (120, 80, 0)), start=1):
+            await redis.zadd(map_repository.get_room_key(x, y, z), 1, entity_id)
+            self.positions[entity_id] = self._position(x, y, z)
+        area = Area(self._position(6, 5, 0))
+        self.assertEqual(await map_repository.get_all_entity_ids_in_area(area), [])
+
+        self.assertTrue(await map_repository.check_positions_index())
+        self.assertFalse(await map_repository.check_positions_index())
+        self.assertEqual(sorted(await map_repository.get_all_entity_ids_in_area(area)), [1, 2])
+        self.assertEqual(sorted(await map_repository.get_all_entity_ids_in_area(area)), self._expected(area))
+
+        # Switching the flag rebuilds the Morton index and drops the stale buckets.
+        self.assertTrue(await self.morton.check_positions_index())
+        self.assertEqual(sorted(await self.morton.get_all_entity_ids_in_area(area)), [1, 2])
+        self.assertEqual(
+            sorted(await self.morton.get_all_entity_ids_in_area(Area(self._position(120, 80, 0)))), [4]
+        )
+        self.assertFalse([key async for key in redis.iscan(match=map_repository.buckets_key.format('*'))])
+        self.assertTrue(await map_repository.check_positions_index())
+        self.assertFalse([key async for key in redis.iscan(match=map_repository.morton_key.format('*'))])
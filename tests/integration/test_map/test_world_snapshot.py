@@ -0,0 +1,58 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+
+from core.src.world.builder import map_repository
+from core.src.world.repositories.world_snapshot import WorldSnapshot
+from tools.txt_map_to_redis import import_layers, read_lines
+from tools.world_snapshot import export_world, restore_world
+from etc import settings
+
+
+class TestWorldSnapshot(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.filename = tempfile.mktemp()
+
+    def tearDown(self):
+        os.path.exists(self.filename) and os.remove(self.filename)
+
+    def test(self):
+        self.loop.run_until_complete(self.asyncio_test())
+
+    async def asyncio_test(self):
+        redis = await map_repository.redis()
+        await redis.flushdb()
+        await import_layers(map_repository, {z: lambda: read_lines('./tools/mappa_prova_1') for z in (0, 1)})
+        await redis.zadd(map_repository.get_room_key(3, 3, 0), 1, 42)
+        await redis.hset('library', 'sword', '{}')
+        metadata = map_repository.metadata
+        expected = [await map_repository.get_rooms_on_y(y, 0, 132, 1) for y in range(0, 68)]
+
+        await export_world(self.filename, ['rooms', 'library'])
+        await redis.flushdb()
+        await restore_world(self.filename)
+
+        snapshot = WorldSnapshot(self.filename)
+        self.assertEqual(await map_repository.load_metadata(), metadata._replace(
+            version=metadata.version + 1, snapshot=snapshot.snapshot_id, snapshot_version=metadata.version + 1
+        ))
+        for y in range(0, 68):
+            rooms = await map_repository.get_rooms_on_y(y, 0, 132, 1)
+            self.assertEqual([r.terrain for r in rooms], [r.terrain for r in expected[y]])
+        self.assertEqual(await redis.zrange(map_repository.get_room_key(3, 3, 0)), [b'42'])
+        self.assertEqual(await redis.hget('library', 'sword'), b'{}')
+
+        self.assertEqual(snapshot.layers, (0, 1))
+        self.assertEqual(
+            snapshot.get_terrains(67, 0, 132, 1), bytes(r.terrain.value for r in expected[67])
+        )
+        snapshot.close()
+
+        await import_layers(map_repository, {0: lambda: read_lines('./tools/mappa_prova_1')})
+        version = map_repository.metadata.version
+        await restore_world(self.filename)
+        self.assertEqual((await map_repository.load_metadata()).version, version + 1)
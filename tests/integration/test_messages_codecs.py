@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from core.src.world.services.codecs import get_codec, decode_message
+from core.src.world.services.redis_pubsub_publisher_service import PubSubEventType
+
+MESSAGES = {
+    'change_pos': {
+        "en": 1024, "entity_type": 0, "reason": "movement", "ev": PubSubEventType.ENTITY_CHANGE_POS.value,
+        "curr": [120, 43, 0], "prev": [120, 42, 0]
+    },
+    'appear': {
+        "en": 1024, "entity_type": 0, "reason": "connect", "ev": PubSubEventType.ENTITY_APPEAR.value,
+        "curr": [120, 43, 0]
+    },
+    'disappear': {
+        "en": 1024, "entity_type": 0, "reason": "disconnect", "ev": PubSubEventType.ENTITY_DISAPPEAR.value,
+        "curr": [120, 43, 0]
+    },
+    'public_action': {
+        "p": {"event": "emote", "text": "sorride"}, "entity_type": 0, "en": 1024,
+        "ev": PubSubEventType.ENTITY_DO_PUBLIC_ACTION.value, "target": 2048, "curr": [120, 43, 0]
+    },
+    'quit': {"en": 1024, "ev": PubSubEventType.ENTITY_QUIT.value},
+    'cmd': {
+        'n': 'ba5e2c0e-77f5-4a6e-9a1c-6f2f3c1a9e01', 'e_id': 1024, 'd': 'look spada', 't': 1580000000, 'c': 'cmd'
+    }
+}
+
+
+class TestMessagesCodecs(TestCase):
+    """
+    The events and the 'cmd' queue messages, JSON and msgpack with compact keys.
+    """
+    def test(self):
+        for name, message in MESSAGES.items():
+            json_data, msgpack_data = get_codec('json').encode(message), get_codec('msgpack').encode(message)
+            self.assertEqual(decode_message(json_data), message)
+            self.assertEqual(decode_message(msgpack_data), message)
+            self.assertLess(len(msgpack_data), len(json_data), name)
@@ -0,0 +1,82 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock
+
+from core.src.world.components.attributes import AttributesComponent
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.packed_data_repository import PackedRedisDataRepository
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestPackedDataRepository(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.spread = RedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        self.packed = PackedRedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        self.loop.run_until_complete(self._flush_redis())
+
+    async def _flush_redis(self):
+        await (await self.spread.async_redis()).flushdb()
+
+    @staticmethod
+    def _values(components):
+        return {
+            enum: {k: v.value for k, v in component.current_values.items()} for enum, component in components.items()
+        }
+
+    async def _run_updates(self, sut):
+        await sut.update_entities(
+            Entity(1).set_for_update(
+                AttributesComponent().name.set('sword').keyword.set('sword').description.set('a sword')
+                .collectible.set(True)
+            ),
+            Entity(1).set_for_update(
+                SystemComponent().instance_of.set('sword').created_at.set(10).receive_events.disable()
+            ),
+            Entity(1).set_for_update(InventoryComponent().content.append(2, 3, 4))
+        )
+        await sut.update_entities(
+            Entity(1).set_for_update(SystemComponent().created_at.incr(5).instance_of.set('axe')),
+            Entity(1).set_for_update(InventoryComponent().content.remove(3)),
+            Entity(1).set_for_update(AttributesComponent().description.null())
+        )
+        return await sut.read_struct_components_for_entity(
+            1, AttributesComponent, SystemComponent, InventoryComponent, load_defaults=False
+        )
+
+    def test_same_behaviour(self):
+        self.loop.run_until_complete(self._test_same_behaviour())
+
+    async def _test_same_behaviour(self):
+        spread = self._values(await self._run_updates(self.spread))
+        await self._flush_redis()
+        packed = self._values(await self._run_updates(self.packed))
+        self.assertEqual(spread, packed)
+        self.assertEqual(packed[InventoryComponent.enum]['content'], [2, 4])
+        self.assertEqual(packed[SystemComponent.enum]['created_at'], 15)
+        self.assertEqual(
+            await self.packed.get_entity_ids_with_components_having_value((SystemComponent, 'instance_of', 'axe')),
+            [1]
+        )
+        self.assertEqual(
+            await self.packed.get_entity_ids_with_components_having_value((SystemComponent, 'instance_of', 'sword')),
+            []
+        )
+
+    def test_bounds_and_delete(self):
+        self.loop.run_until_complete(self._test_bounds_and_delete())
+
+    async def _test_bounds_and_delete(self):
+        await self.packed.save_entity(Entity().set_for_update(InventoryComponent().content.append(2, 3)))
+        inventory = InventoryComponent(content=[2, 3]).content.remove(2)
+        self.assertEqual(await self.packed.update_entities(Entity(1).set_for_update(inventory)), 1)
+        inventory = InventoryComponent(content=[3]).content.remove(2)
+        self.assertEqual(await self.packed.update_entities(Entity(1).set_for_update(inventory)), 0)
+        self.assertTrue(await self.packed.delete_entity(1))
+        self.assertFalse(await (await self.packed.async_redis()).exists('e:1:p'))
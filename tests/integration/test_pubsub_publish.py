@@ -0,0 +1,37 @@
+import asyncio
+from unittest import TestCase
+
+from core.src.world.builder import pubsub_manager
+from core.src.world.services.codecs import decode_message
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestPubSubPublish(TestCase):
+    """
+    Publishing a position event to many listeners channels with a single pipeline.
+    """
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.message = {
+            "en": 1, "entity_type": 0, "reason": "movement", "ev": 1, "curr": [1, 2, 0], "prev": [1, 1, 0]
+        }
+
+    def test(self):
+        self.loop.run_until_complete(self.asyncio_test())
+
+    async def asyncio_test(self):
+        redis = await get_redis_factory(RedisType.QUEUES)()
+        names = ['chan:{}'.format(i) for i in range(0, 10)]
+        channels = await redis.subscribe(*names)
+        try:
+            await pubsub_manager.publish_many(names, self.message)
+            await pubsub_manager.publish_many(names[:1], self.message)
+            await pubsub_manager.publish_many([], self.message)
+            for channel in channels:
+                self.assertEqual(decode_message(await channel.get()), self.message)
+            self.assertEqual(decode_message(await channels[0].get()), self.message)
+        finally:
+            await redis.unsubscribe(*names)
@@ -0,0 +1,78 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock
+
+from core.src.world.components.attributes import AttributesComponent
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.components.position import PositionComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.read_plans import ComponentsReadPlan
+
+
+class FakePipeline:
+    """
+    Replies with canned values.
+    """
+    def __init__(self):
+        self.replies = []
+        self.keys = []
+
+    def hmget(self, key, *fields):
+        self.keys.append(key)
+        self.replies.append([b'1'] * len(fields))
+
+    def zrange(self, key, start, stop):
+        self.replies.append([b'1', b'2'])
+
+    def hgetall(self, key):
+        self.replies.append({b'k': b'v'})
+
+    async def execute(self):
+        return self.replies
+
+
+class FakeRedis:
+    def __init__(self):
+        self.last_pipeline = None
+
+    def pipeline(self):
+        self.last_pipeline = FakePipeline()
+        return self.last_pipeline
+
+
+class TestReadPlans(TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.sut = RedisDataRepository(Mock(), Mock(), Mock())
+        self.sut._async_redis = FakeRedis()
+        self.query = ((SystemComponent, 'connection'), PositionComponent, InventoryComponent)
+
+    def test_plan_is_cached_by_query(self):
+        plan = self.sut._get_read_plan(self.query)
+        self.assertIs(plan, self.sut._get_read_plan(self.query))
+        self.assertIs(plan, self.sut._get_read_plan([list(self.query[0]), PositionComponent, InventoryComponent]))
+        self.assertFalse(plan.has_defaults)
+        self.assertTrue(self.sut._get_read_plan((AttributesComponent, )).has_defaults)
+
+    def test_resolve(self):
+        res = self.loop.run_until_complete(self.sut.read_struct_components_for_entities([1, 2], *self.query))
+        self.assertEqual(res[2][SystemComponent.enum].connection, '1')
+        self.assertEqual(res[2][PositionComponent.enum].parent_of, 1)
+        self.assertEqual(res[2][InventoryComponent.enum].content, [1, 2])
+        res = self.loop.run_until_complete(self.sut.read_struct_components_for_entity(1, *self.query))
+        self.assertEqual(res[SystemComponent.enum].connection, '1')
+        self.assertEqual(res[InventoryComponent.enum].content, [1, 2])
+        self.assertEqual(res[InventoryComponent.enum].current_weight, 1)
+
+    def test_entity_types_are_cached(self):
+        query = ((AttributesComponent, 'name'), )
+        res = self.loop.run_until_complete(self.sut.read_struct_components_for_entities([1, 2], *query))
+        self.assertEqual(res[1][AttributesComponent.enum].name, '1')
+        self.assertIn(ComponentsReadPlan.instance_of_key, self.sut._async_redis.last_pipeline.keys)
+        self.assertEqual(self.sut.entity_types.get_many([1, 2]), {1: '1', 2: '1'})
+        self.loop.run_until_complete(self.sut.read_struct_components_for_entity(2, *query))
+        self.assertNotIn(ComponentsReadPlan.instance_of_key, self.sut._async_redis.last_pipeline.keys)
+        self.sut.entity_types.forget(2)
+        self.loop.run_until_complete(self.sut.read_struct_components_for_entities([1, 2], *query))
+        self.assertIn(ComponentsReadPlan.instance_of_key, self.sut._async_redis.last_pipeline.keys)
@@ -0,0 +1,50 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock
+
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.services.system_utils import get_redis_factory, RedisType
+from etc import settings
+
+
+class TestRedisLUAPipeline(TestCase):
+    def setUp(self):
+        assert settings.INTEGRATION_TESTS
+        assert settings.RUNNING_TESTS
+        self.loop = asyncio.get_event_loop()
+        self.sut = RedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        self.loop.run_until_complete(self._flush_redis())
+
+    async def _flush_redis(self):
+        redis = await self.sut.async_redis()
+        await redis.flushdb()
+        await redis.script_flush()
+
+    def test_bounds(self):
+        self.loop.run_until_complete(self._test_bounds())
+
+    async def _test_bounds(self):
+        entity = Entity(1).set_for_update(InventoryComponent().content.append(2, 3))
+        self.assertEqual(await self.sut.update_entities(entity), 1)
+        inventory = InventoryComponent(content=[2, 3]).content.remove(2, 3)
+        self.assertEqual(await self.sut.update_entities(Entity(1).set_for_update(inventory)), 1)
+        inventory = InventoryComponent(content=[2]).content.remove(2)
+        self.assertEqual(await self.sut.update_entities(Entity(1).set_for_update(inventory)), 0)
+
+    def test_merge_updates_per_tick(self):
+        self.loop.run_until_complete(self._test_merge_updates_per_tick())
+
+    async def _test_merge_updates_per_tick(self):
+        self.sut.merge_updates_per_tick = True
+        updates = [
+            self.sut.update_entities(Entity(1).set_for_update(SystemComponent().connection.set('conn-{}'.format(i))))
+            for i in range(0, 10)
+        ]
+        self.assertEqual(await asyncio.gather(*updates), [1] * 10)
+        self.assertEqual(self.sut.updates_stats.scripts_executed, 1)
+        self.assertEqual(self.sut.updates_stats.actions_saved, 9)
+        redis = await self.sut.async_redis()
+        self.assertEqual(await redis.hget('c:{}:d:connection'.format(SystemComponent.key), 1), b'conn-9')
@@ -47,6 +47,11 @@ class TestStructComponent(TestCase):
         loop.run_until_complete(self._test_selective_repo_queries())
         self.assertTrue(self.test_success)
 
+    def test_bulk_loader(self):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self._test_bulk_loader())
+        self.assertTrue(self.test_success)
+
     async def _test_save_struct_component(self):
         entity = Entity(555)
         entity2 = Entity(556)
@@ -181,3 +186,36 @@ class TestStructComponent(TestCase):
         self.assertEqual(r.boolean, False)
         self.assertEqual(r.a, {})
         self.test_success = True
+
+    async def _test_bulk_loader(self):
+        class TestComponent(StructComponent):
+            enum = ComponentTypeEnum.INVENTORY
+            meta = (
+                ('weirdstuff', str),
+                ('manystuffhere', list),
+                ('integerrr', int),
+                ('boolean', bool),
+                ('a', dict)
+            )
+
+        entities = []
+        for entity_id in range(1, 51):
+            c = TestComponent().weirdstuff.set('stuff %s' % entity_id).integerrr.set(entity_id)
+            if entity_id % 2:
+                c.manystuffhere.append(entity_id, entity_id + 1000).a.set('key', 'value %s' % entity_id)
+            entities.append(Entity(entity_id).set_for_update(c))
+        await self.sut.update_entities(*entities)
+        entity_ids = list(range(1, 52))
+        queries = (TestComponent, ), ((TestComponent, 'a', 'integerrr'), ), ((TestComponent, 'manystuffhere'), )
+        for query in queries:
+            expected = await self.sut.read_struct_components_for_entities(entity_ids, *query)
+            res = await self.sut.bulk_read_struct_components_for_entities(entity_ids, *query)
+            for entity_id in entity_ids:
+                self.assertEqual(
+                    expected[entity_id][TestComponent.enum].value, res[entity_id][TestComponent.enum].value
+                )
+        res = await self.sut.bulk_read_struct_components_for_entities([3], TestComponent)
+        self.assertEqual(res[3][TestComponent.enum].manystuffhere, [3, 1003])
+        self.assertEqual(res[3][TestComponent.enum].a, {'key': 'value 3'})
+        self.assertEqual(res[3][TestComponent.enum].weirdstuff, 'stuff 3')
+        self.test_success = True
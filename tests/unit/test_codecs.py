@@ -0,0 +1,35 @@
+import json
+import unittest
+
+from core.src.world.services.codecs import get_codec, decode_message, MESSAGES_KEYS
+
+MESSAGE = {"en": 12, "entity_type": 0, "reason": "movement", "ev": 1, "curr": [1, 2, 0], "prev": [1, 1, 0]}
+
+
+class TestCodecs(unittest.TestCase):
+    def test_roundtrip(self):
+        for name in ('json', 'msgpack'):
+            codec = get_codec(name)
+            for message in (MESSAGE, {'w': 'a', 'k': ['c:1:2']}, 42, {'p': {'en': 1}, 'other': None}):
+                self.assertEqual(decode_message(codec.encode(message)), message)
+                self.assertEqual(codec.decode(codec.encode(message)), message)
+
+    def test_int_keys(self):
+        codec = get_codec('msgpack')
+        for message in ({0: 'a', 3: 'b', 'en': 1}, {1: {2: 'c'}, -1: None, 2 ** 40: 'd'}, {True: 'e'}):
+            self.assertEqual(codec.decode(codec.encode(message)), message)
+            self.assertEqual(decode_message(codec.encode(message)), message)
+
+    def test_untagged_json(self):
+        self.assertEqual(decode_message(json.dumps(MESSAGE)), MESSAGE)
+        self.assertEqual(decode_message(json.dumps(MESSAGE).encode()), MESSAGE)
+
+    def test_compact_keys(self):
+        data = get_codec('msgpack').encode(MESSAGE)
+        self.assertEqual(data[:1], b'\x01')
+        self.assertLess(len(data), len(get_codec('json').encode(MESSAGE)) / 2)
+        self.assertEqual(len(MESSAGES_KEYS), len(set(MESSAGES_KEYS)))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec('xml')
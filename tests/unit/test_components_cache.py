@@ -0,0 +1,50 @@
+import unittest
+
+from core.src.world.components.base.structcomponent import StructSubtypeIntIncrAction, StructSubtypeListAction, \
+    StructSubTypeSetNull, StructSubtypeStrSetAction
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.components.position import PositionComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.repositories.components_cache import ComponentsCache
+from core.src.world.repositories.read_plans import ComponentsReadPlan
+
+
+class TestComponentsCache(unittest.TestCase):
+    def test_lru(self):
+        sut = ComponentsCache(max_size=2)
+        sut.set(1, SystemComponent, 'connection', 'a')
+        sut.set(2, SystemComponent, 'connection', 'b')
+        sut.get(1, SystemComponent, 'connection')
+        sut.set(3, SystemComponent, 'connection', 'c')
+        self.assertEqual(sut.get(1, SystemComponent, 'connection'), 'a')
+        self.assertEqual(sut.get(3, SystemComponent, 'connection'), 'c')
+        self.assertNotEqual(sut.get(2, SystemComponent, 'connection'), 'b')
+        self.assertEqual(sut.stats(), {'size': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'invalidations': 0})
+
+    def test_read_and_write_through(self):
+        sut = ComponentsCache(components=[SystemComponent, InventoryComponent])
+        plan = ComponentsReadPlan(((SystemComponent, 'connection'), (InventoryComponent, 'content')))
+        self.assertIsNone(sut.get_components(plan, 1))
+        components = {
+            SystemComponent.enum: SystemComponent(connection='conn'),
+            InventoryComponent.enum: InventoryComponent(content=[2, 3])
+        }
+        version = sut.version
+        sut.set_components(plan, 1, components, version)
+        sut.apply_changes(1, InventoryComponent, {'content': [StructSubtypeListAction('append', [4])]})
+        sut.apply_changes(1, SystemComponent, {'connection': [StructSubtypeStrSetAction('conn2')]})
+        response = sut.get_components(plan, 1)
+        self.assertEqual(response[SystemComponent.enum].connection, 'conn2')
+        self.assertEqual(response[InventoryComponent.enum].content, [2, 3, 4])
+
+        sut.set_components(plan, 2, components, version)
+        self.assertIsNone(sut.get_components(plan, 2), 'a read concurrent with a write must not be cached')
+
+        sut.apply_changes(1, SystemComponent, {'connection': [StructSubTypeSetNull()]})
+        self.assertIsNone(sut.get_components(plan, 1))
+
+    def test_components_enablement(self):
+        sut = ComponentsCache(components=[SystemComponent])
+        self.assertFalse(sut.is_cached_query(ComponentsReadPlan((SystemComponent, PositionComponent))))
+        sut.apply_changes(1, PositionComponent, {'coord': [StructSubtypeIntIncrAction(1)]})
+        self.assertEqual(len(sut), 0)
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from unittest.mock import patch, AsyncMock
+
+from core.src.world.components.position import PositionComponent
+from core.src.world.services.connected_positions import ConnectedPositionsTable, ConnectedMapEncodingsTable
+from core.src.world.services.redis_pubsub_events_observer import PubSubObserver
+from core.src.world.services.redis_pubsub_publisher_service import PubSubEventType
+from core.src.world.utils.world_types import MapEncodingEnum
+
+
+def _position(x, y, z=0):
+    return PositionComponent().set_list_coordinates([x, y, z])
+
+
+class TestConnectedPositionsTable(unittest.TestCase):
+    def test_track(self):
+        sut = ConnectedPositionsTable()
+        sut.update(1, _position(1, 1))
+        self.assertNotIn(1, sut)
+        sut.track(1, _position(1, 2))
+        sut.track(2, PositionComponent())
+        self.assertEqual(sut.size, 1)
+        sut.update(1, _position(1, 3))
+        position = sut.get(1)
+        self.assertEqual(position.list_coordinates, [1, 3, 0])
+        position.list_coordinates.append(9)
+        self.assertEqual(sut.get(1).coord.value, '1,3,0')
+        sut.untrack(1)
+        self.assertIsNone(sut.get(1))
+
+
+class TestConnectedMapEncodingsTable(unittest.TestCase):
+    def test_track(self):
+        sut = ConnectedMapEncodingsTable()
+        self.assertIsNone(sut.get(1))
+        sut.track(1, MapEncodingEnum.RLE)
+        sut.track(1, MapEncodingEnum.BASE64)
+        self.assertEqual(sut.get(1), MapEncodingEnum.BASE64)
+        sut.untrack(1)
+        sut.untrack(2)
+        self.assertNotIn(1, sut)
+
+
+class TestPubSubObserverPositions(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.positions = ConnectedPositionsTable()
+        self.sut = PubSubObserver(None, loop=self.loop, positions=self.positions)
+        self.message = {'en': 2, 'entity_type': 0, 'reason': 'connect', 'ev': PubSubEventType.ENTITY_APPEAR.value}
+
+    def _on_event(self, room):
+        async def load_components(entity, *_):
+            return entity.set_component(_position(10, 10))
+
+        path = 'core.src.world.services.redis_pubsub_events_observer.'
+        with patch(path + 'load_components', AsyncMock(side_effect=load_components)) as load, \
+                patch(path + 'emit_sys_msg', AsyncMock()) as emit:
+            self.loop.run_until_complete(self.sut.on_event(1, dict(self.message, curr=room), room, 't1'))
+            self.loop.run_until_complete(asyncio.sleep(0))
+        return load, emit
+
+    def test_tracked_listener(self):
+        self.positions.track(1, _position(10, 10))
+        load, emit = self._on_event([11, 12, 0])
+        load.assert_not_called()
+        self.assertEqual(emit.call_args[0][2]['event'], 'entity_add')
+        load, emit = self._on_event([40, 40, 0])
+        load.assert_not_called()
+        emit.assert_not_called()
+
+    def test_untracked_listener(self):
+        load, _ = self._on_event([11, 12, 0])
+        load.assert_called_once()
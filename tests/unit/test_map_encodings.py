@@ -0,0 +1,16 @@
+import base64
+import unittest
+
+from core.src.world.utils.serialization import serialize_map_terrains, run_length_encode
+from core.src.world.utils.world_types import MapEncodingEnum
+
+
+class TestMapEncodings(unittest.TestCase):
+    def test_encodings(self):
+        terrains = bytes([0, 0, 0, 1, 2, 2, 2, 2, 1])
+        self.assertEqual(serialize_map_terrains(terrains, MapEncodingEnum.JSON), [0, 0, 0, 1, 2, 2, 2, 2, 1])
+        self.assertEqual(serialize_map_terrains(terrains, MapEncodingEnum.BINARY), terrains)
+        self.assertEqual(base64.b64decode(serialize_map_terrains(terrains, MapEncodingEnum.BASE64)), terrains)
+        self.assertEqual(serialize_map_terrains(terrains, MapEncodingEnum.RLE), [0, 3, 1, 1, 2, 4, 1, 1])
+        self.assertEqual(run_length_encode(bytes(961)), [0, 961])
+        self.assertEqual(run_length_encode(b''), [])
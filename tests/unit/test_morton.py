@@ -0,0 +1,27 @@
+import random
+import unittest
+
+from core.src.world.utils import morton
+
+
+class TestMorton(unittest.TestCase):
+    def test_encode_decode(self):
+        self.assertEqual(morton.encode(0, 0) + 1, morton.encode(1, 0))
+        self.assertEqual(morton.encode(0, 0) + 2, morton.encode(0, 1))
+        for x, y in ((0, 0), (-5, 77), (32767, -32768), (131, 67)):
+            self.assertEqual(morton.decode(morton.encode(x, y)), (x, y))
+
+    def test_ranges_cover_the_rectangle(self):
+        for _ in range(200):
+            min_x, min_y = random.randint(-200, 200), random.randint(-200, 200)
+            max_x, max_y = min_x + random.randint(0, 40), min_y + random.randint(0, 40)
+            max_ranges = random.choice((1, 4, 8))
+            ranges = morton.ranges(min_x, min_y, max_x, max_y, max_ranges=max_ranges)
+            self.assertLessEqual(len(ranges), max_ranges)
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    code = morton.encode(x, y)
+                    self.assertTrue(any(start <= code <= end for start, end in ranges), (x, y, ranges))
+
+    def test_aligned_square_is_one_range(self):
+        self.assertEqual(morton.ranges(8, 8, 15, 15), [(morton.encode(8, 8), morton.encode(15, 15))])
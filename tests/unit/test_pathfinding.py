@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from core.src.world.components.position import PositionComponent
+from core.src.world.repositories.map_repository import MapMetadata
+from core.src.world.systems.pathfinding.manager import PathfindingManager
+from core.src.world.utils.pathfinding import label_components, find_path
+
+# Row major from the bottom left room, (0, 0).
+GRID = [
+    '..#..',
+    '.##..',
+    '...#.',
+    '##.#.',
+]
+
+
+def _walkable(rows):
+    return bytes(c == '.' for row in rows for c in row)
+
+
+class _GridMapRepository:
+    def __init__(self, rows):
+        self.walkable = _walkable(rows)
+        self.metadata = MapMetadata(
+            min_x=0, min_y=0, max_x=len(rows[0]) - 1, max_y=len(rows) - 1, layers=(0,), version=1,
+            snapshot='', snapshot_version=0
+        )
+        self.min_x, self.min_y, self.max_x, self.max_y = 0, 0, self.metadata.max_x, self.metadata.max_y
+        self.terrains_cache = None
+        self.reads = 0
+
+    async def get_walkable_grid(self, min_x, min_y, max_x, max_y, z):
+        self.reads += 1
+        width = self.max_x + 1
+        return b''.join(self.walkable[y * width + min_x:y * width + max_x + 1] for y in range(min_y, max_y + 1))
+
+
+def _position(x, y):
+    return PositionComponent().set_list_coordinates([x, y, 0])
+
+
+class TestPathfinding(unittest.TestCase):
+    def test_labels(self):
+        labels = label_components(_walkable(GRID), 5)
+        self.assertEqual(labels[0], labels[1])
+        self.assertEqual(labels[0], labels[12])
+        self.assertEqual(labels[3], labels[19])
+        self.assertNotEqual(labels[0], labels[3])
+        self.assertEqual(labels[2], 0)
+        self.assertEqual(len(set(labels)), 3)
+
+    def test_find_path(self):
+        walkable = _walkable(GRID)
+        self.assertEqual(find_path(walkable, 5, 0, 0), [])
+        self.assertEqual(find_path(walkable, 5, 0, 12), [5, 10, 11, 12])
+        self.assertEqual(find_path(walkable, 5, 3, 19), [4, 9, 14, 19])
+        self.assertIsNone(find_path(walkable, 5, 0, 19))
+        self.assertIsNone(find_path(_walkable(['.' * 30]), 30, 0, 29, max_expanded=10))
+
+
+class TestPathfindingManager(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.repository = _GridMapRepository(GRID)
+        self.sut = PathfindingManager(self.repository)
+
+    def _find_path(self, start, goal):
+        path = self.loop.run_until_complete(self.sut.find_path(_position(*start), _position(*goal)))
+        return path and [(p.x, p.y) for p in path]
+
+    def test_paths(self):
+        self.loop.run_until_complete(self.sut.load())
+        self.assertEqual(self.repository.reads, 1)
+        self.assertEqual(self._find_path((0, 0), (2, 2)), [(0, 1), (0, 2), (1, 2), (2, 2)])
+        self.assertIsNone(self._find_path((0, 0), (4, 3)))
+        self.assertIsNone(self._find_path((0, 0), (9, 9)))
+        self.assertEqual(self._find_path((0, 0), (0, 0)), [])
+        self.assertEqual(self.repository.reads, 1)
+
+    def test_version_change(self):
+        self.assertIsNone(self._find_path((0, 0), (4, 3)))
+        self.repository.walkable = _walkable(['.....'] + GRID[1:])
+        self.assertIsNone(self._find_path((0, 0), (4, 3)))
+        self.repository.metadata = self.repository.metadata._replace(version=2)
+        self.assertEqual(len(self._find_path((0, 0), (4, 3))), 7)
+        self.assertEqual(self.repository.reads, 2)
+
+    def test_regions(self):
+        self.sut.max_region_size, self.sut.margin = 8, 1
+        self.assertEqual(self._find_path((0, 0), (0, 2)), [(0, 1), (0, 2)])
+        self.assertIsNone(self._find_path((0, 0), (4, 3)))
+        self.assertEqual(self.repository.reads, 1)
+
+    def test_max_expanded(self):
+        self.sut.max_expanded = 3
+        self.assertEqual(self._find_path((0, 0), (0, 2)), [(0, 1), (0, 2)])
+        self.assertIsNone(self._find_path((0, 0), (2, 2)))
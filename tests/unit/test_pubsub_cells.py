@@ -0,0 +1,142 @@
+import asyncio
+import unittest
+
+from core.src.world.components.position import PositionComponent
+from core.src.world.components.system import SystemComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.services.connected_positions import ConnectedPositionsTable
+from core.src.world.services.redis_pubsub_publisher_service import RedisPubSubEventsPublisherService, \
+    get_cell_channel, get_cells_channels_in_square
+from core.src.world.services.redis_pubsub_subscriber_service import RedisPubSubEventsSubscriberService
+
+
+class _PubSub:
+    def __init__(self):
+        self.queues = {}
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append(channel)
+        for queue in self.queues.get(channel, ()):
+            queue.put_nowait(message)
+
+    async def publish_many(self, channels, message):
+        for channel in channels:
+            await self.publish(channel, message)
+
+    async def subscribe(self, channel):
+        queue = asyncio.Queue()
+        self.queues.setdefault(channel, set()).add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.queues[channel].discard(queue)
+            self.queues[channel] or self.queues.pop(channel)
+
+
+class _Observer:
+    def __init__(self):
+        self.events = []
+
+    async def on_event(self, entity_id, message, room, transport):
+        self.events.append((entity_id, message['en'], message['ev']))
+
+
+def _position(x, y, z=0, previous=None):
+    position = PositionComponent().set_list_coordinates([x, y, z])
+    previous and position.add_previous_position(previous)
+    return position
+
+
+class TestCellsChannels(unittest.TestCase):
+    def test_channels(self):
+        self.assertEqual(get_cell_channel(7, 8, 1, 8), 'cell:0.1.1')
+        self.assertEqual(get_cell_channel(-1, -9, 0, 8), 'cell:-1.-2.0')
+        self.assertEqual(get_cells_channels_in_square(4, 4, 0, 3, 8), {'cell:0.0.0'})
+        self.assertEqual(
+            get_cells_channels_in_square(0, 12, 0, 4, 8), {'cell:-1.1.0', 'cell:0.1.0', 'cell:-1.2.0', 'cell:0.2.0'}
+        )
+
+
+class TestSpatialCellsPubSub(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.pubsub = _PubSub()
+        self.publisher = RedisPubSubEventsPublisherService(self.pubsub, cell_size=8)
+        self.positions = ConnectedPositionsTable()
+        self.sut = RedisPubSubEventsSubscriberService(
+            self.pubsub, loop=self.loop, cell_size=8, positions=self.positions
+        )
+        self.observer = _Observer()
+
+    def tearDown(self):
+        for entity_id in list(self.sut._transports_by_entity_id):
+            self.positions.untrack(entity_id)
+            self._run(self.sut.unsubscribe_all(Entity(entity_id)))
+
+    def _run(self, coroutine):
+        self.loop.run_until_complete(coroutine)
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+
+    def _connect(self, entity_id, x, y):
+        entity = Entity(entity_id).set_component(SystemComponent().connection.set('c{}'.format(entity_id)))
+        self.sut.add_observer_for_entity_id(entity_id, self.observer)
+        self.positions.track(entity_id, _position(x, y))
+        self._run(self.sut.subscribe_events(entity))
+        return entity
+
+    def test_fan_out(self):
+        self._connect(1, 1, 0)
+        self._connect(2, 4, 4)
+        self._connect(3, 30, 30)
+        self.assertEqual(set(self.pubsub.queues), {
+            'chan:1', 'chan:2', 'chan:3', 'cell:-1.-1.0', 'cell:-1.0.0', 'cell:0.-1.0', 'cell:0.0.0', 'cell:1.0.0',
+            'cell:0.1.0', 'cell:1.1.0', 'cell:-1.1.0', 'cell:1.-1.0', 'cell:3.3.0', 'cell:3.4.0', 'cell:4.3.0',
+            'cell:4.4.0'
+        })
+        self._run(self.publisher.on_entity_change_position(
+            Entity(2), _position(5, 4, previous=_position(4, 4)), 'movement'
+        ))
+        self.assertEqual(self.pubsub.published, ['cell:0.0.0', 'chan:2'])
+        self.assertEqual(self.observer.events, [(1, 2, 1)])
+        self.assertEqual(self.positions.get_coordinates(2), [5, 4, 0])
+
+    def test_follow_and_unsubscribe(self):
+        entity = self._connect(1, 0, 0)
+        self._connect(2, 0, 1)
+        self._run(self.publisher.on_entity_appear_position(Entity(1), _position(20, 20), 'teleport', targets=[]))
+        self.assertEqual(self.sut._cells_by_entity_id[1], get_cells_channels_in_square(20, 20, 0, 5, 8))
+        self.assertEqual(self.sut._entities_by_cell['cell:-1.-1.0'], {2})
+        self._run(self.publisher.on_entity_disappear_position(Entity(2), _position(0, 1), 'disconnect', []))
+        self.assertEqual(self.observer.events, [])
+        self.positions.untrack(1)
+        self._run(self.sut.unsubscribe_all(entity))
+        self.assertNotIn(1, self.sut._cells_by_entity_id)
+        self.assertNotIn('cell:2.2.0', self.pubsub.queues)
+        self.assertIn('cell:0.0.0', self.pubsub.queues)
+
+    def test_walk_out_of_view(self):
+        self._connect(1, 10, 0)
+        self._connect(3, 14, 0)
+        self._run(self.publisher.on_entity_change_position(
+            Entity(2), _position(16, 0, previous=_position(15, 0)), 'movement'
+        ))
+        self.assertEqual(self.pubsub.published, ['cell:2.0.0', 'cell:1.0.0', 'chan:2'])
+        self.assertEqual(sorted(self.observer.events), [(1, 2, 1), (3, 2, 1)])
+        self._run(self.publisher.on_entity_change_position(
+            Entity(2), _position(17, 0, previous=_position(16, 0)), 'movement'
+        ))
+        self.assertEqual(sorted(self.observer.events), [(1, 2, 1), (3, 2, 1), (3, 2, 1)])
+
+    def test_untracked_listener(self):
+        self._connect(1, 1, 0)
+        self._connect(3, 2, 0)
+        self.positions.untrack(1)
+        self._run(self.publisher.on_entity_change_position(
+            Entity(2), _position(5, 4, previous=_position(4, 4)), 'movement'
+        ))
+        self._run(self.publisher.on_entity_change_position(
+            Entity(2), _position(5, 5, previous=_position(5, 4)), 'movement'
+        ))
+        self.assertEqual(self.observer.events, [(3, 2, 1), (3, 2, 1)])
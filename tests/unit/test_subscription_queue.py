@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from core.src.world.services.redis_pubsub_publisher_service import get_position_event_key, \
+    coalesce_position_events, PubSubEventType
+from core.src.world.services.subscription_queue import SubscriptionQueue, OverflowPolicy, ChannelStats
+
+
+def _move(entity_id, x):
+    return {'en': entity_id, 'ev': PubSubEventType.ENTITY_CHANGE_POS.value, 'curr': [x, 0, 0], 'prev': [x - 1, 0, 0]}
+
+
+class TestSubscriptionQueue(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.stats = ChannelStats()
+
+    def _queue(self, maxsize, policy):
+        queue = SubscriptionQueue(
+            maxsize, policy, get_position_event_key, coalesce_position_events, stats=self.stats
+        )
+        self.stats.subscriptions.add(queue)
+        return queue
+
+    def _drain(self, queue):
+        return [self.loop.run_until_complete(queue.get()) for _ in range(queue.qsize())]
+
+    def test_block(self):
+        queue = self._queue(2, OverflowPolicy.BLOCK)
+        self.loop.run_until_complete(queue.put(1))
+        self.loop.run_until_complete(queue.put(2))
+        put = self.loop.create_task(queue.put(3))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertFalse(put.done())
+        self.assertEqual(self.loop.run_until_complete(queue.get()), 1)
+        self.loop.run_until_complete(put)
+        self.assertEqual(self._drain(queue), [2, 3])
+
+    def test_drop_oldest(self):
+        queue = self._queue(2, OverflowPolicy.DROP_OLDEST)
+        for i in range(5):
+            self.loop.run_until_complete(queue.put(i))
+        self.assertEqual(self._drain(queue), [3, 4])
+        self.assertEqual(self.stats.dropped, 3)
+
+    def test_coalesce(self):
+        queue = self._queue(2, OverflowPolicy.COALESCE)
+        for x in range(1, 1001):
+            for entity_id in (1, 2):
+                self.loop.run_until_complete(queue.put(_move(entity_id, x)))
+        self.assertEqual(self.stats.as_dict(), {
+            'subscribers': 1, 'depth': 2, 'max_depth': 2, 'dropped': 0, 'coalesced': 1998
+        })
+        messages = self._drain(queue)
+        self.assertEqual([(m['en'], m['prev'], m['curr']) for m in messages], [
+            (1, [0, 0, 0], [1000, 0, 0]), (2, [0, 0, 0], [1000, 0, 0])
+        ])
+        self.loop.run_until_complete(queue.put(_move(1, 5)))
+        self.loop.run_until_complete(queue.put('other'))
+        self.assertEqual(self._drain(queue)[0]['prev'], [4, 0, 0])
+
+    def test_coalesce_not_full(self):
+        queue = self._queue(3, OverflowPolicy.COALESCE)
+        self.loop.run_until_complete(queue.put(_move(1, 1)))
+        self.loop.run_until_complete(queue.put(_move(1, 2)))
+        self.assertEqual([m['curr'] for m in self._drain(queue)], [[1, 0, 0], [2, 0, 0]])
+        self.assertEqual(self.stats.coalesced, 0)
+
+    def test_coalesce_barriers(self):
+        queue = self._queue(4, OverflowPolicy.COALESCE)
+        for message in (
+            _move(1, 1),
+            {'en': 1, 'ev': PubSubEventType.ENTITY_DISAPPEAR.value, 'curr': [1, 0, 0]},
+            {'en': 1, 'ev': PubSubEventType.ENTITY_APPEAR.value, 'curr': [9, 9, 0]},
+            dict(_move(1, 9), prev=[9, 9, 0], curr=[9, 8, 0]),
+            dict(_move(1, 9), prev=[9, 8, 0], curr=[9, 7, 0])
+        ):
+            self.loop.run_until_complete(queue.put(message))
+        put = self.loop.create_task(
+            queue.put({'en': 1, 'ev': PubSubEventType.ENTITY_DISAPPEAR.value, 'curr': [9, 7, 0]})
+        )
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertFalse(put.done())
+        self.assertEqual(self.loop.run_until_complete(queue.get())['curr'], [1, 0, 0])
+        self.loop.run_until_complete(put)
+        self.assertEqual([(m['ev'], m.get('prev'), m['curr']) for m in self._drain(queue)], [
+            (2, None, [1, 0, 0]), (3, None, [9, 9, 0]), (1, [9, 9, 0], [9, 7, 0]), (2, None, [9, 7, 0])
+        ])
+
+    def test_coalesce_full(self):
+        queue = self._queue(1, OverflowPolicy.COALESCE)
+        self.loop.run_until_complete(queue.put('other'))
+        put = self.loop.create_task(queue.put(_move(1, 1)))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertFalse(put.done())
+        self.assertEqual(self.loop.run_until_complete(queue.get()), 'other')
+        self.loop.run_until_complete(put)
+        self.loop.run_until_complete(queue.put(_move(1, 2)))
+        self.assertEqual(self._drain(queue)[0]['curr'], [2, 0, 0])
@@ -0,0 +1,61 @@
+import unittest
+
+from core.src.world.repositories.terrains_cache import TerrainsCache, TerrainsChunk
+from core.src.world.utils.world_types import TerrainEnum
+from core.src.world.utils.world_utils import is_terrain_walkable
+
+
+class TestTerrainsChunk(unittest.TestCase):
+    def setUp(self):
+        self.sut = TerrainsChunk(bytes([1, 2, 3]))
+
+    def test_reads(self):
+        self.assertEqual(self.sut.get_terrain(1), TerrainEnum.PATH)
+        self.assertIsNone(self.sut.get_terrain(3))
+        self.assertEqual(self.sut.get_terrains(1, 4), bytes([2, 3, 0, 0]))
+        self.assertEqual(
+            [self.sut.is_walkable(offset) for offset in range(3)],
+            [is_terrain_walkable(TerrainEnum(t)) for t in (1, 2, 3)]
+        )
+        self.assertFalse(self.sut.is_walkable(10))
+
+    def test_write(self):
+        self.sut.set_terrain(5, TerrainEnum.GRASS.value)
+        self.sut.set_terrain(0, TerrainEnum.PATH.value)
+        self.assertEqual(self.sut.get_terrains(0, 6), bytes([2, 2, 3, 0, 0, 3]))
+        self.assertTrue(self.sut.is_walkable(0))
+        self.assertFalse(self.sut.is_walkable(4))
+        self.assertTrue(self.sut.is_walkable(5))
+
+
+class TestTerrainsCache(unittest.TestCase):
+    def setUp(self):
+        self.sut = TerrainsCache(max_chunks=2)
+        self.sut.reset(3)
+
+    def test_lru(self):
+        self.sut.set_chunks({(0, 0, 0): b'\x01', (0, -1, 0): b'\x02'}, 3)
+        self.assertEqual(list(self.sut.get_chunks([(0, 0, 0), (1, 0, 0)])), [(0, 0, 0)])
+        chunks = self.sut.set_chunks({(1, 0, 0): None}, 3)
+        self.assertEqual(chunks[(1, 0, 0)].get_terrain(0), None)
+        self.assertEqual(self.sut.size, 2)
+        self.assertEqual(self.sut.evictions, 1)
+        self.assertNotIn((0, -1, 0), self.sut)
+        self.assertIn((0, 0, 0), self.sut)
+
+    def test_stale_read_not_cached(self):
+        chunks = self.sut.set_chunks({(0, 0, 0): b'\x01'}, 2)
+        self.assertEqual(chunks[(0, 0, 0)].get_terrain(0), 1)
+        self.assertEqual(self.sut.size, 0)
+
+    def test_versions(self):
+        self.sut.set_chunks({(0, 0, 0): b'\x01', (0, 1, 0): b'\x02'}, 3)
+        self.sut.set_terrain((0, 0, 0), 1, TerrainEnum.GRASS.value)
+        self.sut.set_terrain((0, 5, 5), 1, TerrainEnum.GRASS.value)
+        self.assertEqual(self.sut.get_chunks([(0, 0, 0)])[(0, 0, 0)].get_terrains(0, 2), bytes([1, 3]))
+        self.assertFalse(self.sut.on_version(3, [(0, 0, 0)]))
+        self.assertTrue(self.sut.on_version(4, [(0, 0, 0)]))
+        self.assertEqual(list(self.sut.get_chunks([(0, 0, 0), (0, 1, 0)])), [(0, 1, 0)])
+        self.assertTrue(self.sut.on_version(6, []))
+        self.assertEqual(self.sut.size, 0)
+        self.assertEqual(self.sut.version, 6)
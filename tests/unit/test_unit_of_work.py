@@ -0,0 +1,79 @@
+import unittest
+
+from core.src.world.components.attributes import AttributesComponent
+from core.src.world.components.base.structcomponent import StructSubtypeListAction, StructSubtypeIntIncrAction, \
+    StructSubtypeIntSetAction, StructSubtypeStrSetAction, StructSubTypeSetNull, StructSubTypeDictSetKeyValueAction, \
+    StructSubTypeDictRemoveKeyValueAction
+from core.src.world.components.inventory import InventoryComponent
+from core.src.world.domain.entity import Entity
+from core.src.world.repositories.unit_of_work import coalesce_actions, EntitiesUnitOfWork
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def test_coalesce_int(self):
+        self.assertEqual(
+            coalesce_actions(int, [StructSubtypeIntIncrAction(2), StructSubtypeIntIncrAction(-5)]),
+            [StructSubtypeIntIncrAction(-3)]
+        )
+        self.assertEqual(
+            coalesce_actions(int, [StructSubtypeIntSetAction(10), StructSubtypeIntIncrAction(2)]),
+            [StructSubtypeIntSetAction(12)]
+        )
+        self.assertEqual(
+            coalesce_actions(
+                int, [StructSubtypeIntIncrAction(2), StructSubTypeSetNull(), StructSubtypeIntIncrAction(3)]
+            ),
+            [StructSubtypeIntSetAction(3)]
+        )
+
+    def test_coalesce_str(self):
+        self.assertEqual(
+            coalesce_actions(
+                str, [StructSubtypeStrSetAction('a'), StructSubTypeSetNull(), StructSubtypeStrSetAction('b')]
+            ),
+            [StructSubtypeStrSetAction('b')]
+        )
+
+    def test_coalesce_dict(self):
+        self.assertEqual(
+            coalesce_actions(dict, [
+                StructSubTypeDictSetKeyValueAction('a', 1),
+                StructSubTypeDictSetKeyValueAction('b', 2),
+                StructSubTypeDictRemoveKeyValueAction('a')
+            ]),
+            [StructSubTypeDictSetKeyValueAction('b', 2), StructSubTypeDictRemoveKeyValueAction('a')]
+        )
+
+    def test_coalesce_list(self):
+        self.assertEqual(
+            coalesce_actions(list, [
+                StructSubtypeListAction('append', [1, 2]),
+                StructSubtypeListAction('remove', [2, 3]),
+                StructSubtypeListAction('append', [3, 4])
+            ]),
+            [StructSubtypeListAction('remove', [2]), StructSubtypeListAction('append', [1, 3, 4])]
+        )
+        self.assertEqual(
+            coalesce_actions(list, [
+                StructSubtypeListAction('append', [1]),
+                StructSubtypeListAction('overwrite', [5, 6]),
+                StructSubtypeListAction('remove', [5]),
+                StructSubtypeListAction('append', [7])
+            ]),
+            [StructSubtypeListAction('overwrite', [6, 7])]
+        )
+
+    def test_unit_of_work(self):
+        unit_of_work = EntitiesUnitOfWork()
+        unit_of_work.add(Entity(1).set_for_update(AttributesComponent().name.set('a').keyword.set('k')))
+        unit_of_work.add(Entity(1).set_for_update(AttributesComponent().name.set('b')))
+        unit_of_work.add(Entity(2).set_for_update(InventoryComponent().content.append(3).content.remove(3)))
+        components = list(unit_of_work.components())
+        self.assertEqual([(e.entity_id, c.key) for e, c, _ in components], [
+            (1, AttributesComponent.key), (2, InventoryComponent.key)
+        ])
+        self.assertEqual(components[0][2], {
+            'name': [StructSubtypeStrSetAction('b')], 'keyword': [StructSubtypeStrSetAction('k')]
+        })
+        self.assertEqual(components[1][2], {'content': [StructSubtypeListAction('remove', [3])]})
+        self.assertEqual((unit_of_work.actions_received, unit_of_work.actions_emitted), (5, 3))
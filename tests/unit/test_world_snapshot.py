@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from core.src.world.repositories.world_snapshot import WorldSnapshotWriter, WorldSnapshot, TERRAINS_TAG, \
+    KEYS_TAGS, pack_record
+
+
+class TestWorldSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.filename = tempfile.mktemp()
+        # 3x2 rooms from (-1, -1) on z=0, only the z=1 room (1, 0) is not blank.
+        writer = WorldSnapshotWriter(self.filename, -1, -1, 1, 0, 7)
+        with writer.section(TERRAINS_TAG, 0) as write:
+            write(bytes([1, 2, 3]))
+            write(bytes([0, 2, 1]))
+        with writer.section(TERRAINS_TAG, 1) as write:
+            write(bytes(5) + bytes([3]))
+        with writer.section(KEYS_TAGS['library']) as write:
+            write(pack_record(b'library', b'\x00dump'))
+            write(pack_record(b'library:index', b''))
+        writer.close()
+        self.sut = WorldSnapshot(self.filename)
+
+    def tearDown(self):
+        self.sut.close()
+        os.remove(self.filename)
+
+    def test_header(self):
+        self.assertEqual(
+            (self.sut.min_x, self.sut.min_y, self.sut.max_x, self.sut.max_y, self.sut.map_version), (-1, -1, 1, 0, 7)
+        )
+        self.assertEqual(self.sut.layers, (0, 1))
+        self.assertEqual(self.sut.tags, {TERRAINS_TAG, KEYS_TAGS['library']})
+
+    def test_terrains(self):
+        self.assertEqual(self.sut.get_terrains(-1, -1, 2, 0), bytes([1, 2, 3]))
+        self.assertEqual(self.sut.get_terrains(0, -3, 3, 0), bytes([0, 0, 0, 2, 1, 0]))
+        self.assertEqual(self.sut.get_terrains(1, -1, 2, 0), bytes(3))
+        self.assertEqual(self.sut.get_terrains(0, 5, 7, 0), bytes(2))
+        self.assertEqual(self.sut.get_terrains(0, -1, 2, 2), bytes(3))
+
+    def test_chunks(self):
+        # The rooms with negative coordinates are at the end of the chunk rows of the chunk -1.
+        self.assertEqual(self.sut.get_chunk(0, -1, -1, chunk_size=4), bytes(15) + bytes([1]))
+        self.assertEqual(self.sut.get_chunk(0, 0, -1, chunk_size=4), bytes(12) + bytes([2, 3]))
+        self.assertEqual(self.sut.get_chunk(0, 0, 0, chunk_size=4), bytes([2, 1]))
+        self.assertEqual(self.sut.get_chunk(1, 0, 0, chunk_size=4), bytes([0, 3]))
+        self.assertEqual(self.sut.get_chunk(1, -1, -1, chunk_size=4), b'')
+
+    def test_records(self):
+        records = [(key, bytes(value)) for key, value in self.sut.iter_records(KEYS_TAGS['library'])]
+        self.assertEqual(records, [(b'library', b'\x00dump'), (b'library:index', b'')])
+        self.assertEqual(list(self.sut.iter_records(KEYS_TAGS['entities'])), [])
+
+    def test_snapshot_id(self):
+        filename = tempfile.mktemp()
+        writer = WorldSnapshotWriter(filename, -1, -1, 1, 0, 8)
+        with writer.section(TERRAINS_TAG, 0) as write:
+            write(bytes([1, 2, 3, 0, 2, 1]))
+        with writer.section(TERRAINS_TAG, 1) as write:
+            write(bytes(5) + bytes([4]))
+        writer.close()
+        other = WorldSnapshot(filename)
+        try:
+            self.assertEqual(len(self.sut.snapshot_id), 32)
+            self.assertNotEqual(other.snapshot_id, self.sut.snapshot_id)
+        finally:
+            other.close()
+            os.remove(filename)
+
+    def test_invalid(self):
+        with open(self.filename, 'r+b') as f:
+            f.write(b'XXXX')
+        with self.assertRaises(ValueError):
+            WorldSnapshot(self.filename)
@@ -0,0 +1,340 @@
+"""
+Microbenchmarks of the world hot paths:
+
+    python tools/benchmarks.py [read_plans] [write_path] [storage] [spatial_index] [getmap] [codecs] [publish]
+
+With no names, all of them run. Each one measures the current tree against the former implementation, when
+it is kept here, and reports its timings. The Redis benchmarks flush the Redis test db: run them with the
+integration tests settings, on a Redis of their own.
+
+The read_plans and codecs benchmarks use the public APIs only, to compare a change with its parent revision:
+
+    git worktree add /tmp/before <revision>^ && cp tools/benchmarks.py /tmp/before/tools/
+    (cd /tmp/before && python tools/benchmarks.py read_plans)
+"""
+import sys
+
+sys.path.insert(0, './')
+
+import asyncio
+import json
+import random
+import time
+import typing
+from unittest.mock import Mock
+
+from etc import settings
+
+
+class _FakePipeline:
+    """
+    Replies with canned values, so the per-call overhead is measured and not the I/O.
+    """
+    def __init__(self):
+        self.replies = []
+
+    def hmget(self, key, *fields):
+        self.replies.append([b'1'] * len(fields))
+
+    def zrange(self, key, start, stop):
+        self.replies.append([b'1', b'2'])
+
+    def hgetall(self, key):
+        self.replies.append({b'k': b'v'})
+
+    async def execute(self):
+        return self.replies
+
+
+class _FakeRedis:
+    def pipeline(self):
+        return _FakePipeline()
+
+
+def _elapsed_ms(start: float, iterations: int) -> float:
+    return (time.time() - start) / iterations * 1000
+
+
+async def read_plans(calls=50):
+    from core.src.world.components.inventory import InventoryComponent
+    from core.src.world.components.position import PositionComponent
+    from core.src.world.components.system import SystemComponent
+    from core.src.world.repositories.data_repository import RedisDataRepository
+    query = ((SystemComponent, 'connection'), PositionComponent, InventoryComponent)
+    print('Components reads, canned replies, {} calls:'.format(calls))
+    for entities in (1, 50, 500):
+        repository = RedisDataRepository(Mock(), Mock(), Mock())
+        repository._async_redis = _FakeRedis()
+        entity_ids = list(range(1, entities + 1))
+        start = time.time()
+        await repository.read_struct_components_for_entities(entity_ids, *query)
+        first = _elapsed_ms(start, 1)
+        start = time.time()
+        for _ in range(0, calls):
+            await repository.read_struct_components_for_entities(entity_ids, *query)
+        print('  {} entities: first call {:.3f} ms, next calls {:.3f} ms'.format(
+            entities, first, _elapsed_ms(start, calls)
+        ))
+
+
+async def write_path(updates=5000):
+    from core.src.world.components.system import SystemComponent
+    from core.src.world.domain.entity import Entity
+    from core.src.world.repositories import data_repository
+    from core.src.world.repositories.redis_lua_pipeline import RedisLUAPipeline
+    from core.src.world.services.system_utils import get_redis_factory, RedisType
+
+    class InlinedLUAPipeline(RedisLUAPipeline):
+        """
+        The former pipeline: a new script, with keys and values inlined, evaluated on every execution.
+        Renders plain commands only: no bounds, no valued indexes.
+        """
+        async def execute(self, return_value_at_exit=1):
+            script, k, a = "", 0, 0
+            while a < len(self.args):
+                op, n = self.args[a], self.args[a + 1]
+                values = ", ".join("'{}'".format(v) for v in self.args[a + 2:a + 2 + n])
+                script += "redis.call('{}', '{}'{})\n".format(op, self.keys[k], values and ', ' + values)
+                k, a = k + 1, a + 2 + n
+            script += "return {}".format(return_value_at_exit)
+            return await self.redis.eval(script)
+
+    repository = data_repository.RedisDataRepository(get_redis_factory(RedisType.DATA), Mock(), Mock())
+    redis = await repository.async_redis()
+
+    async def run():
+        await redis.script_flush()
+        start = time.time()
+        for i in range(0, updates):
+            await repository.update_entities(Entity(i % 100 + 1).set_for_update(
+                SystemComponent().connection.set('conn-{}'.format(i)).created_at.set(int(time.time()) + i)
+            ))
+        info = (await redis.execute(b'INFO', b'memory')).decode()
+        scripts_memory = [line for line in info.split('\r\n') if line.startswith('used_memory_scripts')]
+        return updates / (time.time() - start), scripts_memory
+
+    await redis.flushdb()
+    print('Write path throughput, {} updates:'.format(updates))
+    data_repository.RedisLUAPipeline = InlinedLUAPipeline
+    try:
+        print('  inlined scripts: {:.2f} updates/s, {}'.format(*await run()))
+    finally:
+        data_repository.RedisLUAPipeline = RedisLUAPipeline
+    print('  preloaded script: {:.2f} updates/s, {}'.format(*await run()))
+
+
+async def storage(entities=2000):
+    from core.src.world.components.attributes import AttributesComponent
+    from core.src.world.components.inventory import InventoryComponent
+    from core.src.world.components.system import SystemComponent
+    from core.src.world.domain.entity import Entity
+    from core.src.world.repositories.data_repository import RedisDataRepository
+    from core.src.world.repositories.packed_data_repository import PackedRedisDataRepository
+    from core.src.world.services.system_utils import get_redis_factory, RedisType
+
+    async def used_memory(redis) -> int:
+        info = (await redis.execute(b'INFO', b'memory')).decode()
+        return int([line for line in info.split('\r\n') if line.startswith('used_memory:')][0].split(':')[1])
+
+    print('Components storage engines, {} entities with Attributes, System and Inventory:'.format(entities))
+    for name, engine in (('spread', RedisDataRepository), ('packed', PackedRedisDataRepository)):
+        repository = engine(get_redis_factory(RedisType.DATA), Mock(), Mock())
+        redis = await repository.async_redis()
+        await redis.flushdb()
+        memory = await used_memory(redis)
+        start = time.time()
+        for i in range(1, entities + 1):
+            await repository.update_entities(
+                Entity(i).set_for_update(
+                    AttributesComponent().name.set('n%s' % i).keyword.set('k%s' % i).description.set('d%s' % i)
+                    .collectible.set(True)
+                ),
+                Entity(i).set_for_update(
+                    SystemComponent().instance_of.set('item').created_at.set(i).user_id.set('u%s' % i)
+                ),
+                Entity(i).set_for_update(InventoryComponent().content.append(i + 1, i + 2, i + 3))
+            )
+        write = _elapsed_ms(start, entities)
+        memory = (await used_memory(redis) - memory) / entities
+        start = time.time()
+        for i in range(1, entities + 1):
+            await repository.read_struct_components_for_entity(
+                i, AttributesComponent, SystemComponent, InventoryComponent, load_defaults=False
+            )
+        print('  {}: {:.0f} bytes/entity, write {:.3f} ms/entity, read {:.3f} ms/entity'.format(
+            name, memory, write, _elapsed_ms(start, entities)
+        ))
+
+
+async def spatial_index(iterations=500):
+    from core.src.world.builder import map_repository
+    from core.src.world.components.position import PositionComponent
+    from core.src.world.domain.area import Area
+    from core.src.world.domain.entity import Entity
+    from core.src.world.repositories.map_repository import RedisMapRepository
+    from core.src.world.services.system_utils import get_redis_factory, RedisType
+    morton = RedisMapRepository(get_redis_factory(RedisType.DATA), morton_index=True)
+    redis = await map_repository.redis()
+
+    async def union(area):
+        # The former implementation, a ZUNIONSTORE over every room of the area.
+        pipeline = redis.pipeline()
+        coordinates = area.make_coordinates().rooms_and_peripherals_coordinates
+        pipeline.zunionstore('temp:q', *(map_repository.get_room_key(*r) for r in coordinates))
+        pipeline.zrange('temp:q', 0, -1)
+        pipeline.delete('temp:q')
+        return (await pipeline.execute())[1]
+
+    print('Entities in a 9x9 area, {} iterations:'.format(iterations))
+    for entities in (10000, 100000):
+        await redis.flushdb()
+        await map_repository.set_metadata(0, 0, 199, 199, layers=(0, 1))
+        await morton.load_metadata()
+        pipeline = redis.pipeline()
+        for entity_id in range(1, entities + 1):
+            position = PositionComponent().set_list_coordinates(
+                [random.randint(0, 199), random.randint(0, 199), random.choice((0, 1))]
+            )
+            map_repository.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+            morton.update_map_position_for_entity(position, Entity(entity_id), pipeline)
+            if not entity_id % 5000:
+                await pipeline.execute()
+                pipeline = redis.pipeline()
+        await pipeline.execute()
+        areas = [
+            Area(PositionComponent().set_list_coordinates([random.randint(0, 199), random.randint(0, 199), 0]))
+            for _ in range(iterations)
+        ]
+        timings = []
+        for query in (union, map_repository.get_all_entity_ids_in_area, morton.get_all_entity_ids_in_area):
+            start = time.time()
+            for area in areas:
+                await query(area)
+            timings.append(_elapsed_ms(start, iterations))
+        print('  {} entities: ZUNIONSTORE {:.3f} ms, buckets {:.3f} ms, morton {:.3f} ms'.format(entities, *timings))
+
+
+async def getmap(iterations=200):
+    from core.src.world.builder import map_repository
+    from core.src.world.components.position import PositionComponent
+    from core.src.world.domain.area import Area
+    from core.src.world.domain.room import Room
+    from core.src.world.utils.world_types import TerrainEnum, MapEncodingEnum
+    max_x, max_y = 99, 79
+    await (await map_repository.redis()).flushdb()
+    await map_repository.set_metadata(0, 0, max_x, max_y)
+    await map_repository.set_rooms(
+        *(
+            Room(
+                position=PositionComponent(coord='{},{},0'.format(x, y)),
+                terrain=random.choice([TerrainEnum.WALL_OF_BRICKS, TerrainEnum.PATH, TerrainEnum.GRASS])
+            )
+            for x in range(0, max_x + 1) for y in range(0, max_y + 1)
+        )
+    )
+
+    async def rows(center, size):
+        # The former Area.populate_rooms, a round trip per row.
+        rooms = []
+        from_x, to_x = max(center.x - size // 2, map_repository.min_x), min(center.x + size // 2, map_repository.max_x)
+        for y in range(center.y + size // 2, center.y - size // 2 - 1, -1):
+            rooms.extend(await map_repository.get_rooms_on_y(y, from_x, to_x + 1, center.z))
+        return rooms
+
+    center = PositionComponent(coord='50,40,0')
+    print('getmap latency, {} iterations:'.format(iterations))
+    for size in (9, 15, 31):
+        start = time.time()
+        for _ in range(0, iterations):
+            await rows(center, size)
+        by_rows = _elapsed_ms(start, iterations)
+        start = time.time()
+        for _ in range(0, iterations):
+            await Area(center, square_size=size).get_map()
+        print('  {}x{}: a round trip per row {:.3f} ms, window {:.3f} ms'.format(
+            size, size, by_rows, _elapsed_ms(start, iterations)
+        ))
+        for encoding in MapEncodingEnum:
+            base = (await Area(center, square_size=size).get_map(encoding=encoding))['base']
+            print('    {}: base {} bytes'.format(
+                encoding.value, len(base) if isinstance(base, (str, bytes)) else len(json.dumps(base))
+            ))
+
+
+async def codecs(rounds=20000):
+    from core.src.world.services.codecs import get_codec, decode_message
+    from core.src.world.services.redis_pubsub_publisher_service import PubSubEventType
+    messages = {
+        'change_pos': {
+            "en": 1024, "entity_type": 0, "reason": "movement", "ev": PubSubEventType.ENTITY_CHANGE_POS.value,
+            "curr": [120, 43, 0], "prev": [120, 42, 0]
+        },
+        'public_action': {
+            "p": {"event": "emote", "text": "sorride"}, "entity_type": 0, "en": 1024,
+            "ev": PubSubEventType.ENTITY_DO_PUBLIC_ACTION.value, "target": 2048, "curr": [120, 43, 0]
+        },
+        'cmd': {
+            'n': 'ba5e2c0e-77f5-4a6e-9a1c-6f2f3c1a9e01', 'e_id': 1024, 'd': 'look spada', 't': 1580000000, 'c': 'cmd'
+        }
+    }
+    print('Messages codecs, {} rounds:'.format(rounds))
+    for name, message in messages.items():
+        for codec_name in ('json', 'msgpack'):
+            codec = get_codec(codec_name)
+            start = time.time()
+            for _ in range(rounds):
+                data = codec.encode(message)
+            encoding = _elapsed_ms(start, rounds)
+            start = time.time()
+            for _ in range(rounds):
+                decode_message(data)
+            print('  {} {}: {} bytes, encode {:.2f}us, decode {:.2f}us'.format(
+                name, codec_name, len(data), encoding * 1000, _elapsed_ms(start, rounds) * 1000
+            ))
+
+
+async def publish(rounds=20):
+    from core.src.world.builder import pubsub_manager
+    message = {"en": 1, "entity_type": 0, "reason": "movement", "ev": 1, "curr": [1, 2, 0], "prev": [1, 1, 0]}
+    print('Position event publishing, {} rounds:'.format(rounds))
+    for listeners in (1, 10, 100, 1000):
+        channels = ['chan:{}'.format(i) for i in range(listeners)]
+        start = time.time()
+        for _ in range(rounds):
+            for channel in channels:
+                await pubsub_manager.publish(channel, message)
+        one_by_one = _elapsed_ms(start, rounds)
+        start = time.time()
+        for _ in range(rounds):
+            await pubsub_manager.publish_many(channels, message)
+        print('  {} listeners: {:.3f} ms one by one, {:.3f} ms pipelined'.format(
+            listeners, one_by_one, _elapsed_ms(start, rounds)
+        ))
+
+
+BENCHMARKS: typing.Dict[str, typing.Callable] = {
+    'read_plans': read_plans,
+    'write_path': write_path,
+    'storage': storage,
+    'spatial_index': spatial_index,
+    'getmap': getmap,
+    'codecs': codecs,
+    'publish': publish
+}
+REDIS_BENCHMARKS = ('write_path', 'storage', 'spatial_index', 'getmap', 'publish')
+
+
+async def main(names: typing.List[str]):
+    from core.src.world.services.system_utils import connection_pools
+    for name in names:
+        await BENCHMARKS[name]()
+    for key, pool in connection_pools.items():
+        pool.close()
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    assert set(names) <= set(BENCHMARKS), __doc__
+    assert settings.INTEGRATION_TESTS or not set(names) & set(REDIS_BENCHMARKS), \
+        'The Redis benchmarks flush the db: run them with the integration tests settings'
+    asyncio.get_event_loop().run_until_complete(main(names))
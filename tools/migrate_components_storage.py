@@ -0,0 +1,104 @@
+"""
+Migrates the struct components of all the entities between the storage engines:
+
+    python tools/migrate_components_storage.py packed   # spread -> packed
+    python tools/migrate_components_storage.py spread   # packed -> spread
+
+Entities are read from the entities bitmap and migrated in batches, each batch with a single LUA pipeline,
+so the values of an entity are never found in both the formats, or in none.
+Indexes and components bitmaps are shared by the engines and are left untouched.
+Stop the workers before migrating, and switch `components_storage` in settings.conf after.
+"""
+import sys
+
+sys.path.insert(0, './')
+
+import asyncio
+import time
+import typing
+
+from core.src.world.builder import async_redis_data, library_repository, map_repository
+from core.src.world.components.factory import get_all_components
+from core.src.world.repositories.data_repository import RedisDataRepository
+from core.src.world.repositories.packed_data_repository import PackedRedisDataRepository, pack_values
+from core.src.world.repositories.redis_lua_pipeline import RedisLUAPipeline
+from core.src.world.services.system_utils import connection_pools
+
+
+async def iter_entity_ids(redis, bitmap_key: str, batch_size: int, chunk_size=4096):
+    """
+    Yields batches of the entity ids set into the bitmap, reading it by chunks.
+    """
+    batch = []
+    offset = 0
+    while True:
+        chunk = await redis.getrange(bitmap_key, offset, offset + chunk_size - 1)
+        if not chunk:
+            break
+        for i, byte in enumerate(chunk):
+            for bit in range(0, 8):
+                if byte & (0x80 >> bit):
+                    entity_id = (offset + i) * 8 + bit
+                    entity_id and batch.append(entity_id)
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+        offset += chunk_size
+    batch and (yield batch)
+
+
+def write_spread_values(pipeline: RedisLUAPipeline, entity_id: int, component, values: typing.Dict):
+    score = int(time.time() * 100000)
+    for field, subtype in component.meta:
+        value = values.get(field)
+        if value is None:
+            continue
+        if subtype is list:
+            payload = []
+            for i, v in enumerate(value):
+                payload.extend((score + i, v))
+            payload and pipeline.zadd('c:{}:zs:e:{}:{}'.format(component.key, entity_id, field), *payload)
+        elif subtype is dict:
+            for k, v in value.items():
+                pipeline.hset('c:{}:d:{}:{}'.format(component.key, field, k), entity_id, v)
+                pipeline.hset('e:{}:c:{}:{}'.format(entity_id, component.key, field), k, v)
+        else:
+            value = int(value) if isinstance(value, bool) else value
+            pipeline.hset('c:{}:d:{}'.format(component.key, field), entity_id, value)
+            pipeline.hset('e:{}:c:{}'.format(entity_id, component.key), field, value)
+
+
+def write_packed_values(pipeline: RedisLUAPipeline, entity_id: int, component, values: typing.Dict):
+    blob = pack_values(component, values)
+    blob and pipeline.hset(PackedRedisDataRepository.packed_key_template.format(entity_id), component.key, blob)
+
+
+async def migrate(target: str, batch_size=500):
+    spread = RedisDataRepository(async_redis_data, library_repository, map_repository)
+    packed = PackedRedisDataRepository(async_redis_data, library_repository, map_repository)
+    source, write_values = {
+        'packed': (spread, write_packed_values),
+        'spread': (packed, write_spread_values)
+    }[target]
+    components = get_all_components()
+    redis = await source.async_redis()
+    migrated, start = 0, time.time()
+    async for entity_ids in iter_entity_ids(redis, source.entities_bitmap_key, batch_size):
+        data = await source.read_struct_components_for_entities(entity_ids, *components, load_defaults=False)
+        pipeline = RedisLUAPipeline(redis)
+        for entity_id in entity_ids:
+            for component in components:
+                values = data[entity_id][component.enum]
+                source._remove_component_values(pipeline, entity_id, component, values)
+                write_values(pipeline, entity_id, component, {k: v.value for k, v in values.current_values.items()})
+        await pipeline.execute()
+        migrated += len(entity_ids)
+        print('{} entities migrated, {:.2f} entities/s'.format(migrated, migrated / (time.time() - start)))
+    for key, pool in connection_pools.items():
+        pool.close()
+
+
+if __name__ == '__main__':
+    assert len(sys.argv) in (2, 3) and sys.argv[1] in ('packed', 'spread'), __doc__
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(migrate(sys.argv[1], *(int(x) for x in sys.argv[2:])))
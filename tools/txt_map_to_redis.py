@@ -1,14 +1,27 @@
-import sys
+"""
+Imports text maps into the map repository, one file per z layer:
 
-from core.src.world.components.position import PositionComponent
-from core.src.world.services.system_utils import connection_pools
+    python -m tools.txt_map_to_redis                                   # ./tools/mappa_prova_1 on z=0
+    python -m tools.txt_map_to_redis ground.txt:0 dungeon.txt:-1 [pipeline_size]
+
+The first line of a file is the top row of its layer, the rooms are placed from (0, 0) at the bottom left.
+Files are streamed line by line, twice: once for the map bounds, once to write the rows.
+Each row is encoded into a terrains span with a single translate, and written with a SETRANGE per chunk crossed,
+in pipelines of at most pipeline_size commands: the memory used does not depend on the map size.
+"""
+import sys
 
 sys.path.insert(0, './')
 
 import asyncio
+import functools
+import time
+import typing
 
+from core.src.auth.logging_factory import LOGGER
 from core.src.world.builder import map_repository
-from core.src.world.domain.room import Room
+from core.src.world.repositories.map_repository import RedisMapRepository
+from core.src.world.services.system_utils import connection_pools
 from core.src.world.utils.world_types import TerrainEnum
 
 terrains = {
@@ -18,41 +31,91 @@ terrains = {
     " ": None
 }
 
-done = 0
+# Map characters to terrains bytes, blank rooms to zero.
+TERRAINS_TABLE = bytes.maketrans(
+    ''.join(terrains).encode(), bytes(terrain and terrain.value or 0 for terrain in terrains.values())
+)
+TERRAINS_CHARS = ''.join(terrains).encode()
+
+
+def read_lines(filename: str) -> typing.Iterator[bytes]:
+    with open(filename, 'rb') as f:
+        yield from f
+
+
+def encode_row(line: bytes) -> bytes:
+    line = line.rstrip()
+    if line.translate(None, TERRAINS_CHARS):
+        raise ValueError('Unknown terrains: {}'.format(set(line.translate(None, TERRAINS_CHARS).decode())))
+    return line.translate(TERRAINS_TABLE)
 
 
-def parse_lines(lines):
-    lines = [l.strip() for l in lines]
-    max_y = len(lines) - 1
-    max_x = max([len(line) for line in lines]) - 1
-    rooms = []
-    for y in range(max_y, -1, -1):
-        for x in range(0, max_x + 1):
-            room_enum = terrains[lines[y][x]]
-            if room_enum:
-                rooms.append(
-                    Room(
-                        position=PositionComponent().set_list_coordinates([x, max_y-y, 0]),
-                        terrain=room_enum
-                    )
-                )
-    return rooms
+def scan_layer(lines: typing.Iterable[bytes]) -> typing.Tuple[int, typing.Optional[typing.Tuple[int, ...]]]:
+    """
+    The rows of the layer, and the (min_x, min_row, max_x, max_row) of its not blank rooms, rows from the top.
+    """
+    rows, bounds = 0, None
+    for row, line in enumerate(lines):
+        rows += 1
+        terrains = encode_row(line)
+        end = len(terrains.rstrip(b'\x00'))
+        if not end:
+            continue
+        start = end - len(terrains[:end].lstrip(b'\x00'))
+        bounds = bounds and (min(bounds[0], start), bounds[1], max(bounds[2], end - 1), row) or \
+            (start, row, end - 1, row)
+    return rows, bounds
 
 
-def parse(filename):
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-    return lines
+async def import_layers(
+        repository: RedisMapRepository,
+        layers: typing.Dict[int, typing.Callable[[], typing.Iterable[bytes]]],
+        pipeline_size=1000
+) -> int:
+    """
+    layers: the z layers, each with a callable returning the iterable of its lines.
+    Returns the rooms imported.
+    """
+    rows, min_x, min_y, max_x, max_y = {}, [], [], [], []
+    for z, lines in layers.items():
+        rows[z], bounds = scan_layer(lines())
+        if bounds:
+            min_x.append(bounds[0])
+            max_x.append(bounds[2])
+            min_y.append(rows[z] - 1 - bounds[3])
+            max_y.append(rows[z] - 1 - bounds[1])
+    assert min_x, 'The map is empty'
+    await repository.set_metadata(min(min_x), min(min_y), max(max_x), max(max_y), layers=list(layers))
+    redis = await repository.redis()
+    imported, start = 0, time.time()
+    for z, lines in layers.items():
+        pipeline, commands = redis.pipeline(), 0
+        for row, line in enumerate(lines()):
+            terrains = encode_row(line)
+            commands += repository.enqueue_terrains_row(pipeline, 0, rows[z] - 1 - row, z, terrains)
+            imported += len(terrains) - terrains.count(b'\x00')
+            if commands >= pipeline_size:
+                await pipeline.execute()
+                pipeline, commands = redis.pipeline(), 0
+                LOGGER.core.info('%s rooms imported, %.2f rooms/s', imported, imported / (time.time() - start))
+        commands and await pipeline.execute()
+    await repository.terrains_bulk_written()
+    LOGGER.core.info('%s rooms imported, %.2f rooms/s', imported, imported / (time.time() - start))
+    return imported
 
 
-async def set_rooms(c):
-    await map_repository.set_rooms(*c)
+async def import_files(files: typing.List[str], pipeline_size=1000):
+    layers = {}
+    for value in files:
+        filename, _, z = value.partition(':')
+        layers[int(z or 0)] = functools.partial(read_lines, filename)
+    await import_layers(map_repository, layers, pipeline_size=pipeline_size)
     for key, pool in connection_pools.items():
         pool.close()
 
 
 if __name__ == '__main__':
-    lines = parse('./tools/mappa_prova_1')
-    content = parse_lines(lines)
+    args = sys.argv[1:]
+    size = args and args[-1].isdigit() and [int(args.pop())] or []
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(set_rooms(content))
+    loop.run_until_complete(import_files(args or ['./tools/mappa_prova_1'], *size))
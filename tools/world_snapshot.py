@@ -0,0 +1,159 @@
+"""
+Exports the world into a binary snapshot file, and restores it:
+
+    python -m tools.world_snapshot export world.pmws [rooms] [library] [entities]
+    python -m tools.world_snapshot restore world.pmws
+
+The snapshot has the map bounds and version, the raw terrains grid of each z layer, and optionally the keys
+of the rooms contents and positions indexes, of the library, and of the entities components, as DUMP payloads:
+restore them on a Redis of the same or a newer version. Restore with the workers stopped.
+
+The restore bumps the map version over both the current and the snapshot ones, and saves the snapshot
+hash with it: workers may map the snapshot (map_snapshot in settings.conf) and load the terrains chunks from it,
+until the map is written.
+"""
+import sys
+
+sys.path.insert(0, './')
+
+import asyncio
+import time
+import typing
+
+from core.src.world.builder import map_repository
+from core.src.world.repositories.world_snapshot import WorldSnapshotWriter, WorldSnapshot, TERRAINS_TAG, \
+    KEYS_TAGS, pack_record
+from core.src.world.services.system_utils import connection_pools
+
+KEYS_PATTERNS = {
+    'rooms': [
+        map_repository.room_content_key.format('*'),
+        map_repository.buckets_key.format('*'),
+        map_repository.morton_key.format('*'),
+        map_repository.positions_index_key,
+        'positions'
+    ],
+    'library': ['library', 'library:index'],
+    'entities': ['e:*', 'c:*', 'i:*']
+}
+
+
+async def _export_terrains(redis, writer: WorldSnapshotWriter, z: int):
+    """
+    Reads the chunks a band of chunk_size rows at time, with a round trip per band.
+    """
+    size = map_repository.chunk_size
+    min_cx, max_cx = writer.min_x // size, writer.max_x // size
+    with writer.section(TERRAINS_TAG, z) as write:
+        for cy in range(writer.min_y // size, writer.max_y // size + 1):
+            pipeline = redis.pipeline()
+            for cx in range(min_cx, max_cx + 1):
+                pipeline.get(map_repository.get_chunk_key(z, cx, cy))
+            chunks = [(chunk or b'').ljust(size * size, b'\x00') for chunk in await pipeline.execute()]
+            start = writer.min_x - min_cx * size
+            for y in range(max(cy * size, writer.min_y), min(cy * size + size - 1, writer.max_y) + 1):
+                offset = (y - cy * size) * size
+                row = b''.join(chunk[offset:offset + size] for chunk in chunks)
+                write(row[start:start + writer.max_x - writer.min_x + 1])
+
+
+async def _export_keys(redis, writer: WorldSnapshotWriter, group: str, batch_size: int):
+    async def dump(keys):
+        pipeline = redis.pipeline()
+        for key in keys:
+            pipeline.dump(key)
+        for key, value in zip(keys, await pipeline.execute()):
+            value is not None and write(pack_record(key, value))
+
+    with writer.section(KEYS_TAGS[group]) as write:
+        batch = []
+        for pattern in KEYS_PATTERNS[group]:
+            async for key in redis.iscan(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    await dump(batch)
+                    batch = []
+        batch and await dump(batch)
+
+
+async def export_world(filename: str, groups: typing.List[str], batch_size=1000):
+    start = time.time()
+    metadata = await map_repository.load_metadata()
+    redis = await map_repository.redis()
+    writer = WorldSnapshotWriter(
+        filename, metadata.min_x, metadata.min_y, metadata.max_x, metadata.max_y, metadata.version
+    )
+    for z in metadata.layers:
+        await _export_terrains(redis, writer, z)
+    for group in groups:
+        await _export_keys(redis, writer, group, batch_size)
+    writer.close()
+    print('World exported in {:.2f}s'.format(time.time() - start))
+
+
+async def restore_world(filename: str, pipeline_size=1000):
+    start = time.time()
+    snapshot = WorldSnapshot(filename)
+    metadata = await map_repository.load_metadata()
+    redis = await map_repository.redis()
+    version = max(metadata.version, snapshot.map_version) + 1
+    size = map_repository.chunk_size
+    pipeline, enqueued, written = redis.pipeline(), 0, 0
+
+    async def enqueue(*commands: typing.Tuple):
+        nonlocal pipeline, enqueued, written
+        for command, *args in commands:
+            getattr(pipeline, command)(*args)
+        enqueued += len(commands)
+        if enqueued >= pipeline_size:
+            await pipeline.execute()
+            pipeline, enqueued, written = redis.pipeline(), 0, written + enqueued
+
+    async for key in redis.iscan(match=map_repository.terrains_chunk_key.format('*', '*', '*')):
+        await enqueue(('delete', key))
+    for z in snapshot.layers:
+        for cy in range(snapshot.min_y // size, snapshot.max_y // size + 1):
+            for cx in range(snapshot.min_x // size, snapshot.max_x // size + 1):
+                chunk = snapshot.get_chunk(z, cx, cy, chunk_size=size)
+                chunk and await enqueue(('set', map_repository.get_chunk_key(z, cx, cy), chunk))
+    for tag in KEYS_TAGS.values():
+        for key, value in snapshot.iter_records(tag):
+            await enqueue(('delete', key), ('restore', key, 0, bytes(value)))
+            value.release()
+    await enqueue(
+        (
+            'hmset_dict',
+            map_repository.metadata_key,
+            {
+                'min_x': snapshot.min_x,
+                'min_y': snapshot.min_y,
+                'max_x': snapshot.max_x,
+                'max_y': snapshot.max_y,
+                'layers': ','.join(str(z) for z in snapshot.layers),
+                'version': version,
+                'snapshot': snapshot.snapshot_id,
+                'snapshot_version': version
+            }
+        )
+    )
+    await pipeline.execute()
+    written += enqueued
+    snapshot.close()
+    elapsed = time.time() - start
+    print('World restored in {:.2f}s, {} commands, {:.2f} commands/s'.format(elapsed, written, written / elapsed))
+
+
+async def main(command: str, filename: str, *args):
+    if command == 'export':
+        assert set(args) <= set(KEYS_PATTERNS), __doc__
+        await export_world(filename, list(args))
+    else:
+        await restore_world(filename)
+    for key, pool in connection_pools.items():
+        pool.close()
+
+
+if __name__ == '__main__':
+    assert len(sys.argv) >= 3 and sys.argv[1] in ('export', 'restore'), __doc__
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main(*sys.argv[1:]))